@@ -1,11 +1,18 @@
+import os
+
 from aiflow.flow.logger import root_logger as logger
 
 from aiflow.flow.launcher import Launcher
 from aiflow.flow.mui import mui
 
-launcher = Launcher()  
+# AIFLOW_HEADLESS=1 imports aiflow without starting the server, client or browser.
+# Worker processes (execution.workers) import it this way and attach their own client.
+headless = os.environ.get("AIFLOW_HEADLESS") == "1"
+
+launcher = None if headless else Launcher()
 
 from aiflow.flow.events import event_base  # Import run from events package, not from event_base
+from aiflow.flow.cache import cache_render, cache_data
 
 # Expose the events dictionary references
 events = event_base.events
@@ -27,13 +34,14 @@ def init(wait_timeout=30):
         launcher.force_exit()
         return False
 
-try:
-    if init():
-        pass
-    else:
-        logger.error("aiflow initialization failed, starting event base")
-except KeyboardInterrupt:
-    logger.info("KeyboardInterrupt received during module loading, shutting down...")
-    launcher.force_exit()
+if not headless:
+    try:
+        if init():
+            pass
+        else:
+            logger.error("aiflow initialization failed, starting event base")
+    except KeyboardInterrupt:
+        logger.info("KeyboardInterrupt received during module loading, shutting down...")
+        launcher.force_exit()
 
-__all__ = ['mui', 'events', 'events_store', 'state', 'logger']
\ No newline at end of file
+__all__ = ['mui', 'events', 'events_store', 'state', 'logger', 'cache_render', 'cache_data']
\ No newline at end of file
@@ -0,0 +1,4 @@
+from aiflow.flow.cache.render_cache import cache_render
+from aiflow.flow.cache.data_cache import cache_data
+
+__all__ = ['cache_render', 'cache_data']
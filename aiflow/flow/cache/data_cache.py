@@ -0,0 +1,175 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiflow.flow.cache.hashing import Unhashable, fingerprint, function_fingerprint
+from aiflow.flow.logger import setup_logger
+
+logger = setup_logger('DataCache')
+
+# Keyed by function definition so decorators re-applied on every rerun share a cache
+_caches: Dict[Tuple, "DataCache"] = {}
+_caches_lock = threading.Lock()
+
+
+class DataCache:
+    """Process-wide result cache with TTL, an entry limit and a byte budget"""
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        size = estimate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.warning(f"Result of {size} bytes exceeds the cache budget of {self.max_bytes} bytes, not cached")
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, (_, _, expires) in self._entries.items() if expires is not None and expires <= now]:
+            self._remove(key)
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate memory footprint of a cached result in bytes"""
+    pd = sys.modules.get("pandas")
+    if pd is not None:
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        if isinstance(value, (pd.Series, pd.Index)):
+            return int(value.memory_usage(deep=True))
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if _depth < 2:
+        if isinstance(value, dict):
+            size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
+
+
+def cache_data(
+    func: Optional[Callable] = None,
+    *,
+    ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+):
+    """Cache a function's return value across reruns and sessions.
+
+    Arguments are hashed by content, including pandas and numpy objects, so a
+    new DataFrame with the same data hits the cache. Cached values are shared
+    between callers and should be treated as read-only.
+
+    Usage::
+
+        @aiflow.cache_data(ttl=600, max_bytes=512 * 1024 * 1024)
+        def load(path):
+            return pd.read_csv(path)
+
+        load.cache_info()  # {'hits': ..., 'misses': ..., 'bytes': ...}
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache = _cache_for(func, ttl, max_entries, max_bytes)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = fingerprint((args, kwargs))
+            except Unhashable as e:
+                logger.debug(f"Not caching {func.__qualname__}: {e}")
+                return func(*args, **kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_info = cache.info
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _cache_for(func: Callable, ttl, max_entries, max_bytes) -> DataCache:
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return DataCache(ttl, max_entries, max_bytes)
+    try:
+        key = (code.co_filename, func.__qualname__, function_fingerprint(func), ttl, max_entries, max_bytes)
+    except Unhashable:
+        # A default or captured value without content: this definition gets a cache of its own
+        return DataCache(ttl, max_entries, max_bytes)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = DataCache(ttl, max_entries, max_bytes)
+        return cache
@@ -0,0 +1,151 @@
+import hashlib
+import pickle
+import sys
+import types
+from typing import Any, Callable
+
+_PRIMITIVES = (type(None), bool, int, float, complex, str, bytes)
+
+
+class Unhashable(TypeError):
+    """A value with no content to hash, such as a lock or a connection.
+
+    Its id() is no substitute: ids are reused once objects are freed, so a
+    new object could take a dead one's cache entry. Callers skip the cache.
+    """
+
+
+def fingerprint(value: Any) -> str:
+    """Stable content hash for cache keys; raises Unhashable for values that cannot be pickled"""
+    hasher = hashlib.blake2b(digest_size=16)
+    _update(hasher, value)
+    return hasher.hexdigest()
+
+
+def function_fingerprint(func: Callable) -> str:
+    """Hash of a function's code for cache keys, so editing it starts a new cache.
+
+    Covers the bytecode, constants and names of the function and of the
+    functions nested in it, its default arguments and the values its closure
+    captured: co_code alone stays the same when only a literal such as a
+    number or query string changes, and closures made by one definition
+    share their code. Raises Unhashable for a default or captured value that
+    cannot be hashed.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    _update_function(hasher, func, set())
+    return hasher.hexdigest()
+
+
+def _update_function(hasher, func: Callable, seen: set) -> None:
+    # seen guards against closures that capture themselves, as recursive nested functions do
+    seen.add(id(func))
+    _update_code(hasher, func.__code__)
+    _update(hasher, (func.__defaults__, func.__kwdefaults__))
+    closure = func.__closure__ or ()
+    hasher.update(f"closure[{len(closure)}".encode())
+    for cell in closure:
+        try:
+            value = cell.cell_contents
+        except ValueError:
+            # A variable not assigned yet
+            hasher.update(b"empty;")
+            continue
+        if isinstance(value, types.FunctionType):
+            if id(value) in seen:
+                hasher.update(b"recursive;")
+            else:
+                _update_function(hasher, value, seen)
+        elif isinstance(value, types.ModuleType):
+            hasher.update(f"module:{value.__name__};".encode())
+        else:
+            _update(hasher, value)
+    hasher.update(b"]")
+
+
+def _update_code(hasher, code: types.CodeType) -> None:
+    hasher.update(code.co_code)
+    _update(hasher, (code.co_names, code.co_varnames, code.co_freevars, code.co_cellvars))
+    hasher.update(f"consts[{len(code.co_consts)}".encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code(hasher, const)
+        else:
+            _update(hasher, const)
+    hasher.update(b"]")
+
+
+def _update(hasher, value: Any) -> None:
+    if isinstance(value, _PRIMITIVES):
+        hasher.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}[{len(value)}".encode())
+        for item in value:
+            _update(hasher, item)
+        hasher.update(b"]")
+    elif isinstance(value, dict):
+        hasher.update(f"dict[{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            _update(hasher, key)
+            _update(hasher, value[key])
+        hasher.update(b"]")
+    elif isinstance(value, (set, frozenset)):
+        hasher.update(f"set[{len(value)}".encode())
+        for item in sorted(value, key=repr):
+            _update(hasher, item)
+        hasher.update(b"]")
+    elif _update_pandas(hasher, value) or _update_numpy(hasher, value) or _update_upload(hasher, value):
+        pass
+    else:
+        _update_pickled(hasher, value)
+
+
+def _update_pickled(hasher, value: Any) -> None:
+    try:
+        hasher.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        raise Unhashable(f"Cannot hash {type(value).__qualname__} for a cache key: {e}") from e
+
+
+def _update_pandas(hasher, value: Any) -> bool:
+    """Hash DataFrames, Series and Indexes by content; pandas is only used if already imported"""
+    pd = sys.modules.get("pandas")
+    if pd is None or not isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return False
+    hasher.update(f"{type(value).__name__}{value.shape}".encode())
+    if isinstance(value, pd.DataFrame):
+        hasher.update(repr(list(zip(value.columns, value.dtypes))).encode())
+    else:
+        hasher.update(f"{value.name!r}:{value.dtype}".encode())
+    try:
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells such as lists
+        _update_pickled(hasher, value)
+    return True
+
+
+def _update_upload(hasher, value: Any) -> bool:
+    """Hash file uploads by identity and progress rather than pickling their contents"""
+    uploads = sys.modules.get("aiflow.flow.network.uploads")
+    if uploads is None or not isinstance(value, uploads.FileUpload):
+        return False
+    hasher.update(f"FileUpload:{value.upload_id!r}:{value.size}:{value.available};".encode())
+    return True
+
+
+def _update_numpy(hasher, value: Any) -> bool:
+    np = sys.modules.get("numpy")
+    if np is None:
+        return False
+    if isinstance(value, np.generic):
+        hasher.update(f"{value.dtype}:{value!r};".encode())
+        return True
+    if not isinstance(value, np.ndarray):
+        return False
+    hasher.update(f"ndarray{value.shape}{value.dtype}".encode())
+    if value.dtype.hasobject:
+        _update_pickled(hasher, value)
+    else:
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    return True
@@ -0,0 +1,206 @@
+import functools
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiflow.flow.cache.hashing import Unhashable, fingerprint, function_fingerprint
+from aiflow.flow.config import config
+from aiflow.flow.events.session import SessionMapping, current_session
+
+_MISSING = object()
+
+# Scripts re-run top to bottom and re-apply their decorators, so caches are
+# kept per function definition rather than per decorated object
+_caches: Dict[Tuple, "RenderCache"] = {}
+_caches_lock = threading.Lock()
+
+
+class RenderEntry:
+    """A recorded call: the dicts it sent, the components it attached and what it read"""
+
+    __slots__ = ("components", "roots", "end_position", "result", "reads")
+
+    def __init__(self, components, roots, end_position, result, reads):
+        self.components: List[Dict[str, Any]] = components
+        self.roots: List[Any] = roots
+        self.end_position: Tuple[int, int] = end_position
+        self.result: Any = result
+        self.reads: Dict[Any, str] = reads
+
+
+class RenderCache:
+    """Per-session LRU of rendered subtrees for one function"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or config.render.memo_max_entries
+        self._sessions: Dict[Optional[str], "OrderedDict[Tuple, RenderEntry]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, builder, func: Callable, args: tuple, kwargs: dict, global_names: Tuple[str, ...] = ()) -> Any:
+        position = builder._render_position()
+        try:
+            key = (fingerprint((args, kwargs)), _globals_fingerprint(func, global_names), position)
+        except Unhashable:
+            # Rendered as if it were not cached
+            return func(*args, **kwargs)
+        session = current_session()
+        events = session.events
+
+        with self._lock:
+            entries = self._sessions.setdefault(session.sender_id, OrderedDict())
+            entry = entries.get(key)
+            if entry is not None and self._reads_match(entry, events):
+                entries.move_to_end(key)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is not None:
+            builder._replay_render(entry.components, entry.roots, entry.end_position)
+            return entry.result
+
+        parent = builder._stack[-1] if builder._stack else None
+        first_root = len(parent.children) if parent is not None else 0
+        reads = set()
+        sink = builder._start_recording()
+        try:
+            with events.recording(reads):
+                result = func(*args, **kwargs)
+        finally:
+            builder._stop_recording(sink)
+
+        try:
+            read_values = {read: fingerprint(dict.get(events, read, _MISSING)) for read in reads}
+        except Unhashable:
+            # A read that cannot be compared later could never be trusted to match
+            return result
+        entry = RenderEntry(
+            components=sink,
+            roots=list(parent.children[first_root:]) if parent is not None else [],
+            end_position=builder._render_position()[:2],
+            result=result,
+            reads=read_values,
+        )
+        with self._lock:
+            entries = self._sessions.setdefault(session.sender_id, OrderedDict())
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _reads_match(entry: RenderEntry, events) -> bool:
+        try:
+            return all(
+                fingerprint(dict.get(events, read, _MISSING)) == value
+                for read, value in entry.reads.items()
+            )
+        except Unhashable:
+            return False
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "sessions": len(self._sessions),
+                "entries": sum(len(entries) for entries in self._sessions.values()),
+            }
+
+
+def cache_render(func: Optional[Callable] = None, *, max_entries: Optional[int] = None):
+    """Cache the components a function renders and replay them on later reruns.
+
+    A call is replayed instead of executed when its arguments, its position in
+    the tree, the module globals it names and every ``events`` key it read are
+    unchanged. Globals are compared by content; modules, functions, classes,
+    ``state`` and values that cannot be pickled are not tracked, so pass what
+    the block depends on from those as arguments. Other side effects of the
+    function (e.g. writes to ``state``) are not replayed.
+
+    Usage::
+
+        @mui.memo
+        def skills_list(skills):
+            with mui.Stack():
+                for skill in skills:
+                    mui.Chip(label=skill)
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache = _cache_for(func, max_entries)
+        global_names = _global_names(func.__code__) if hasattr(func, "__code__") else ()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.call(current_session().builder, func, args, kwargs, global_names)
+
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_info = cache.info
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _cache_for(func: Callable, max_entries: Optional[int]) -> RenderCache:
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return RenderCache(max_entries)
+    try:
+        key = (code.co_filename, func.__qualname__, function_fingerprint(func))
+    except Unhashable:
+        # A default or captured value without content: this definition gets a cache of its own
+        return RenderCache(max_entries)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = RenderCache(max_entries)
+        return cache
+
+
+def _global_names(code: types.CodeType) -> Tuple[str, ...]:
+    """Names a function and the functions nested in it may look up as globals"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return tuple(sorted(names))
+
+
+def _globals_fingerprint(func: Callable, names: Tuple[str, ...]) -> Optional[str]:
+    """Hash of the data globals a function names, leaving out the ones that are not tracked"""
+    if not names:
+        return None
+    namespace = getattr(func, "__globals__", {})
+    values = {}
+    for name in names:
+        value = namespace.get(name, _MISSING)
+        if value is _MISSING or callable(value) or isinstance(value, (types.ModuleType, SessionMapping)):
+            continue
+        try:
+            values[name] = fingerprint(value)
+        except Unhashable:
+            continue
+    return fingerprint(values)
+
+
+def forget_session(session_id: Optional[str]) -> None:
+    """Drop a closed session's entries from every render cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.clear(session_id)
@@ -14,6 +14,27 @@ class WebSocketConfig:
     max_connections: int = 100
     keepalive_interval: float = 30.0
     development_mode: bool = True
+    # "relay" runs ws_server.py as a subprocess; "embedded" runs it on the launcher's loop
+    mode: str = "relay"
+    batch_updates: bool = False
+    batch_max_size: int = 100
+    batch_flush_interval: float = 0.05
+    compression: bool = False
+    compression_level: int = 6
+    compression_threshold: int = 128
+    chunk_outbound: bool = False
+    chunk_size: int = 512 * 1024
+    upload_spool_size: int = 64 * 1024 * 1024
+    # Largest upload accepted; bigger ones are rejected before any memory or disk is allocated
+    upload_max_size: int = 2 * 1024 * 1024 * 1024
+    stream_uploads: bool = True
+    upload_stall_timeout: float = 60.0
+    reassembly_max_bytes: int = 1024 * 1024 * 1024
+    reassembly_max_bytes_per_sender: int = 512 * 1024 * 1024
+    reassembly_max_age: float = 300.0
+    reassembly_sweep_interval: float = 30.0
+    # "auto" picks orjson, then ujson, then the json module
+    serializer: str = "auto"
 
 @dataclass
 class SecurityConfig:
@@ -31,11 +52,33 @@ class LoggingConfig:
     max_size: int = 10485760  # 10MB
     backup_count: int = 5
 
+@dataclass
+class RenderConfig:
+    incremental: bool = False
+    memo_max_entries: int = 128
+    # "json" (protocol 1), "compact" or "msgpack" (protocol 2, see network/wire.py)
+    wire_format: str = "json"
+    # Send datagrid pages as columnarRows, which only a rebuilt frontend expands; rows otherwise
+    grid_columnar_rows: bool = False
+
+@dataclass
+class ExecutionConfig:
+    watch_scripts: bool = True
+    watch_interval: float = 0.5
+    max_sessions: int = 100
+    # Seconds without a message after which a browser's session is dropped; 0 keeps them
+    session_idle_ttl: float = 1800.0
+    workers: int = 0
+    # Seconds a worker process has to connect after it is started
+    worker_start_timeout: float = 30.0
+
 @dataclass
 class Config:
     websocket: WebSocketConfig = field(default_factory=WebSocketConfig)
     security: SecurityConfig = field(default_factory=SecurityConfig)
     logging: LoggingConfig = field(default_factory=LoggingConfig)
+    render: RenderConfig = field(default_factory=RenderConfig)
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
     
     @classmethod
     def load(cls, config_path: str = None) -> 'Config':
@@ -50,10 +93,14 @@ class Config:
         ws_config = WebSocketConfig(**data.get('websocket', {}))
         security_config = SecurityConfig(**data.get('security', {}))
         logging_config = LoggingConfig(**data.get('logging', {}))
+        render_config = RenderConfig(**data.get('render', {}))
+        execution_config = ExecutionConfig(**data.get('execution', {}))
         return cls(
             websocket=ws_config,
             security=security_config,
-            logging=logging_config
+            logging=logging_config,
+            render=render_config,
+            execution=execution_config
         )
 
 # Global configuration instance
@@ -0,0 +1,106 @@
+import os
+import threading
+from types import CodeType
+from typing import Dict, Optional, Tuple
+
+from aiflow.flow.logger import setup_logger
+
+logger = setup_logger('CodeCache')
+
+
+class CodeCache:
+    """Compiled code objects for scripts, keyed by path, mtime and size.
+
+    Paths registered with watch() are polled by a background thread that
+    recompiles them as soon as they change, so reruns skip the stat call.
+    Other paths are validated with os.stat on every lookup.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], CodeType]] = {}
+        self._watched: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.compiles = 0
+
+    def get(self, file_path: str) -> CodeType:
+        path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(path)
+            watched = path in self._watched
+        if entry is not None and watched:
+            return entry[1]
+        signature = self._signature(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        return self._compile(path, signature)
+
+    def invalidate(self, file_path: Optional[str] = None) -> None:
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def watch(self, file_path: str, interval: float = 0.5) -> None:
+        """Recompile the file in the background whenever it changes on disk"""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if path in self._watched:
+                return
+            self._watched[path] = None
+            start = self._watcher is None
+            if start:
+                self._watcher = threading.Thread(
+                    target=self._watch_loop, args=(interval,), name="CodeCacheWatcher", daemon=True
+                )
+        self._poll(path)
+        if start:
+            self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            with self._lock:
+                paths = list(self._watched)
+            for path in paths:
+                self._poll(path)
+
+    def _poll(self, path: str) -> None:
+        try:
+            signature = self._signature(path)
+        except OSError:
+            return
+        with self._lock:
+            previous = self._watched.get(path)
+            self._watched[path] = signature
+        if previous == signature:
+            return
+        if previous is not None:
+            logger.info(f"Script changed, recompiling {path}")
+        try:
+            self._compile(path, signature)
+        except SyntaxError as e:
+            # Without an entry the next rerun compiles again and reports the error
+            logger.error(f"Failed to compile {path}: {e}")
+            self.invalidate(path)
+
+    def _compile(self, path: str, signature: Tuple[int, int]) -> CodeType:
+        with open(path, 'rb') as f:
+            source = f.read()
+        code = compile(source, path, 'exec', dont_inherit=True)
+        with self._lock:
+            self._entries[path] = (signature, code)
+            self.compiles += 1
+        return code
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+
+code_cache = CodeCache()
@@ -1,10 +1,65 @@
+import asyncio
 import time
+from collections import deque
 from aiflow.flow.logger import setup_logger
+from aiflow.flow.config import config
+from aiflow.flow.events.scheduler import RerunInterrupted, checkpoint
+from aiflow.flow.events.session import SessionContext, SessionMapping, current_session, set_default_session
+from aiflow.flow.network import wire
 import threading
 from datetime import datetime
 
 logger = setup_logger('EventBase')
 
+class ComponentBatcher:
+    """Collects component_update payloads and flushes them as a single component_batch message"""
+
+    def __init__(self, send, max_size=100, flush_interval=0.05):
+        self._send = send
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._components = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, component_dict):
+        with self._lock:
+            self._components.append(component_dict)
+            if len(self._components) >= self.max_size:
+                self._flush_locked()
+            elif self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        # Sending under the lock keeps batches in creation order
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._components:
+            return
+        components, self._components = self._components, []
+        try:
+            self._send(components)
+        except Exception as e:
+            logger.error(f"Failed to flush component batch: {e}")
+
+    def discard(self):
+        """Drop queued components without sending them"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._components = []
+
+    def __len__(self):
+        return len(self._components)
+
 class EventBase:
     _instance = None
 
@@ -20,32 +75,141 @@ class EventBase:
         self.session_id = None
         self._ws_client = None
         self.caller_file = None
-        self.events = {}
-        self.events_store = {}
-        self.paired = False
         self._processing = False
         self._ready = threading.Event()
-        self.state = {}
+        self._pending_messages = deque(maxlen=1000)
+        self._dropped_messages = 0
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._worker_pool = None
+        # Serves code running outside a rerun and is adopted by the first browser to pair
+        self.default_session = self._new_session(None)
+        set_default_session(self.default_session)
+        # Resolve to the session of the rerun that reads them
+        self.events = SessionMapping("events")
+        self.events_store = SessionMapping("events_store")
+        self.state = SessionMapping("state")
 
     def set_ws_client(self, client):
         self._ws_client = client
+        if client and self._dropped_messages:
+            logger.warning(f"{self._dropped_messages} messages were dropped while no WebSocket client was attached")
+            self._dropped_messages = 0
+        # Deliver anything sent before a client was attached
+        while client and self._pending_messages:
+            self.send_response_sync(*self._pending_messages.popleft())
+
+    def queue_message(self, payload, target=None):
+        """Hold a message until a WebSocket client is attached; past the limit the oldest are dropped.
+
+        A headless import, as in a worker process, sends before its client is attached.
+        """
+        if len(self._pending_messages) == self._pending_messages.maxlen:
+            if not self._dropped_messages:
+                logger.warning(f"{self._pending_messages.maxlen} messages are waiting for a WebSocket client, dropping the oldest")
+            self._dropped_messages += 1
+        self._pending_messages.append((payload, target))
+
+    @property
+    def sessions(self):
+        return dict(self._sessions)
+
+    def get_session(self, sender_id, adopt=False):
+        """Session for a browser, created on first contact.
+
+        With adopt, the first browser takes over the default session, which the
+        script rendered into while it waited for that browser to pair.
+        """
+        with self._sessions_lock:
+            session = self._sessions.get(sender_id)
+            if session is None:
+                if adopt and self.default_session.sender_id is None:
+                    session = self.default_session
+                    session.sender_id = sender_id
+                else:
+                    session = self._new_session(sender_id)
+                self._sessions[sender_id] = session
+            session.touch()
+            self._evict_sessions()
+            return session
+
+    def _new_session(self, sender_id):
+        return SessionContext(sender_id, self._rerun, self._make_batcher)
+
+    def _make_batcher(self, session):
+        return ComponentBatcher(
+            lambda components: self._send_component_batch(components, session),
+            max_size=config.websocket.batch_max_size,
+            flush_interval=config.websocket.batch_flush_interval,
+        )
+
+    def _evict_sessions(self):
+        """Drop idle sessions past execution.session_idle_ttl, then the least recently
+        active ones beyond execution.max_sessions"""
+        idle = sorted(
+            (session for session in self._sessions.values()
+             if session is not self.default_session and not session.scheduler.running),
+            key=lambda session: session.last_active,
+        )
+        ttl = config.execution.session_idle_ttl
+        expired = 0
+        if ttl > 0:
+            cutoff = time.monotonic() - ttl
+            while expired < len(idle) and idle[expired].last_active < cutoff:
+                expired += 1
+        excess = max(expired, len(self._sessions) - config.execution.max_sessions)
+        for session in idle[:excess]:
+            self._release_session(session)
+            logger.debug(f"Evicted idle session {session.sender_id}")
+
+    def release_session(self, sender_id):
+        """Drop a browser's session, e.g. once the browser has disconnected"""
+        with self._sessions_lock:
+            session = self._sessions.get(sender_id)
+            if session is not None:
+                self._release_session(session)
+                logger.debug(f"Released session {sender_id}")
+
+    def _release_session(self, session):
+        del self._sessions[session.sender_id]
+        session.batcher.discard()
+        from aiflow.flow.cache.render_cache import forget_session
+        forget_session(session.sender_id)
+        if self._worker_pool is not None:
+            self._worker_pool.release(session.sender_id)
 
     def set_caller_file(self, caller_file):
         self.caller_file = caller_file
+        if caller_file and config.execution.watch_scripts:
+            from aiflow.flow.events.code_cache import code_cache
+            code_cache.watch(caller_file, interval=config.execution.watch_interval)
+        if caller_file and config.execution.workers > 0 and self._worker_pool is None:
+            from aiflow.flow.events.worker_pool import WorkerPool, in_worker
+            if not in_worker():
+                self._worker_pool = WorkerPool(caller_file, config.execution.workers, self.send_response_sync)
+                self._worker_pool.start()
+
+    def stop_workers(self):
+        if self._worker_pool is not None:
+            self._worker_pool.stop()
+            self._worker_pool = None
 
     async def handle_message(self, message):
+        received_at = time.perf_counter()
         try:
+            if message.get("type") == "client_disconnected":
+                # The relay reports a closed browser connection under its client_id
+                self.release_session(message.get("client_id"))
+                return
+
             self.last_message = message.get("payload")
-            self.previous_sender_id = self.sender_id
             self.sender_id = message.get("sender_id")
             self.session_id = message.get("client_id")
 
-            if self.previous_sender_id and self.previous_sender_id != self.sender_id:
-                self.events_store.clear()  
-                self.events.clear()        
-                self.state.clear()
-
             if self.sender_id:
+                pairing = message.get("type") == "pair"
+                session = self.get_session(self.sender_id, adopt=pairing)
+                session.session_id = self.session_id
                 response = {
                     "type": "paired",
                     "payload": {
@@ -57,93 +221,138 @@ class EventBase:
                 }
 
                 # Use the async version since we're in an async context
-                await self.send_response_async(response)
-
-                if self.paired:
-                    if message.get("type") == "events":
-                        self.events_store["payload"] = message.get("payload")
-                        # Store event values by ID for easy retrieval
-                        form_events = self.events_store.get('payload').get("formEvents", [])
-                        if form_events:
-                            for event_id in form_events:
-                                event_data = form_events[event_id]
-                                if "value" in event_data:
-                                    self.events[event_id] = event_data["value"]
-
-                        file_event = self.events_store.get('payload').get("fileEvent", [])
-                        if file_event:
-                            event_id = self.events_store.get('payload').get("key")
-                            self.events[event_id] = file_event
-
-
-                    # Reset MUI state before running the module again
-                    self.reset_mui_state()
-                    # Run the caller file when already paired and do not reexecute it for the first time
-                    if self.caller_file:
-                        # Run in a separate thread to avoid event loop conflicts
-                        self.is_rerun = True
-                        self._run_module_in_thread(self.caller_file)
-                else:
-                    self.paired = True
+                await self.send_response_async(response, session.sender_id)
+
+                adopted = pairing and not session.paired and session is self.default_session
+                session.paired = True
+                # The script itself renders the adopted session once the first browser is ready;
+                # any other session gets its first render from a rerun
+                if not adopted:
+                    # Sessions served by a worker process rerun there, with their state
+                    if self._worker_pool is None or not self._worker_pool.dispatch(message):
+                        self.process_message(session, message, received_at)
 
                 # Mark as ready after first message is processed
                 self._ready.set()
         except Exception as e:
             logger.error(f"Error handling message: {e}")
 
-    def _run_module_in_thread(self, module_path):
-        """Run the module in a separate thread to avoid event loop conflicts"""
+    def process_message(self, session, message, received_at=None):
+        """Apply a browser message to its session and schedule a rerun"""
+        if message.get("type") == "events":
+            session.events_store["payload"] = message.get("payload")
+            # Store event values by ID for easy retrieval
+            form_events = session.events_store.get('payload').get("formEvents", [])
+            if form_events:
+                for event_id in form_events:
+                    event_data = form_events[event_id]
+                    if "value" in event_data:
+                        session.events[event_id] = event_data["value"]
+
+            file_event = session.events_store.get('payload').get("fileEvent", [])
+            if file_event:
+                event_id = session.events_store.get('payload').get("key")
+                session.events[event_id] = file_event
+
+        # Run the caller file when already paired and do not reexecute it for the first time
+        if self.caller_file:
+            # Reruns happen on the session's scheduler thread, so sessions run concurrently
+            self.is_rerun = True
+            session.scheduler.request_rerun(received_at)
+
+    def _rerun(self, session, received_at=None):
+        """Run the caller file once for a session; called on its scheduler thread"""
+        from aiflow.flow.events.run import run_module
+
+        module_path = self.caller_file
         try:
-            def _run():
+            with session.active():
+                # Reset MUI state before running the module again
+                session.builder.reset()
                 try:
-                    from aiflow.flow.events.run import run_module
-
-                    run_module(module_path, method="importlib")
-
-                    response = {
-                        "type": "paired",
-                        "payload": {
-                            "message": "stream_end",
-                            "client_id": self.sender_id,
-                            "session_id": self.session_id,
-                            "time_stamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
-                        },
-                    }
-                    self.send_response_sync(response)
-                except Exception as e:
-                    logger.error(f"Error running module {module_path}: {e}")
-
-            # Start a new thread to run the module
-            thread = threading.Thread(target=_run, name="ModuleRunner", daemon=True)
-            thread.start()
+                    completed = run_module(module_path, method="importlib")
+                except RerunInterrupted:
+                    # The follow-up rerun renders afresh; nothing of this one may reach the browser
+                    session.batcher.discard()
+                    session.builder.abort_render()
+                    raise
+                # A script that failed part way did not render what follows the error, which must
+                # keep its state and stay on screen: no finish hooks, removals or pruning
+                removed = session.builder.finish_render() if completed else []
+                session.batcher.flush()
+            if removed:
+                self.send_response_sync({"type": "component_patch", "payload": {"remove": removed}}, session.sender_id)
+
+            response = {
+                "type": "paired",
+                "payload": {
+                    "message": "stream_end",
+                    "client_id": session.sender_id,
+                    "session_id": session.session_id,
+                    "time_stamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
+                    # Unchanged components were not re-sent, so the browser must not prune by time_stamp
+                    "incremental": removed is not None,
+                },
+            }
+            self.send_response_sync(response, session.sender_id)
+            if received_at is not None:
+                logger.debug(f"Rerun took {(time.perf_counter() - received_at) * 1000:.1f} ms from event to stream_end")
         except Exception as e:
-            logger.error(f"Error creating thread for module {module_path}: {e}")
+            logger.error(f"Error running module {module_path}: {e}")
+
+    def checkpoint(self):
+        """Raise RerunInterrupted in a rerun that a newer event has superseded"""
+        checkpoint()
 
-    def send_response_sync(self, payload):
-        """Send a response synchronously, for use from synchronous code"""
+    def send_response_sync(self, payload, target=None):
+        """Send a response synchronously, to the current session's browser unless a target is given"""
+        if target is None:
+            target = current_session().sender_id
         if self._ws_client:
             self._processing = True
             try:
-                self._ws_client.send_sync(payload, self.sender_id)
+                future = self._ws_client.send_sync(payload, target)
+                if future is not None:
+                    # The client loop writes it later; failures land on the future
+                    future.add_done_callback(self._log_send_failure)
             except Exception as e:
                 logger.error(f"Failed to send response synchronously: {e}")
             finally:
                 self._processing = False
         else:
-            self.queue_message(payload)
+            self.queue_message(payload, target)
 
-    async def send_response_async(self, payload):
+    @staticmethod
+    def _log_send_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Failed to send response synchronously: {future.exception()}")
+
+    async def send_response_async(self, payload, target=None):
+        """Queue a message from the client loop without waiting for it to be written.
+
+        The write can wait behind the target's outbound stream, and awaiting it
+        here would stop the client reading frames from every browser meanwhile.
+        """
+        if target is None:
+            target = current_session().sender_id
         try:
-            await self._ws_client.send(payload, self.sender_id)
+            # Go through the outbound queue so ordering with sync sends is kept
+            future = self._ws_client.send_sync(payload, target)
+            if future is not None:
+                future.add_done_callback(self._log_send_failure)
         except Exception as e:
             logger.error(f"Failed to send response asynchronously: {e}")
 
-    def send_component_update(self, component_dict):
-        payload = {
-            "type": "component_update",
-            "payload": {"component": component_dict, "timestamp": time.time()},
-        }
-        self.send_response(payload)
+    def send_component_update(self, component_dict, session=None):
+        session = session or current_session()
+        if config.websocket.batch_updates:
+            session.batcher.add(component_dict)
+            return
+        if wire.compact_enabled():
+            inner = dict(wire.encode_components([component_dict]), timestamp=time.time())
+        else:
+            inner = {"component": component_dict, "timestamp": time.time()}
+        self.send_response_sync({"type": "component_update", "payload": inner}, session.sender_id)
 
     async def send_component_update_async(self, component_dict):
         payload = {
@@ -154,6 +363,17 @@ class EventBase:
         }
         await self.send_response_async(payload)
 
+    def flush_component_updates(self):
+        """Send any batched component updates immediately"""
+        current_session().batcher.flush()
+
+    def _send_component_batch(self, components, session):
+        if wire.compact_enabled():
+            inner = dict(wire.encode_components(components), timestamp=time.time())
+        else:
+            inner = {"components": components, "timestamp": time.time()}
+        self.send_response_sync({"type": "component_batch", "payload": inner}, session.sender_id)
+
     def send_response(self, payload):
         self.send_response_sync(payload)
 
@@ -171,7 +391,9 @@ class EventBase:
         return self._ready.is_set()
 
     def reset_mui_state(self):
-        from aiflow.flow.mui import mui
-        mui.reset()
+        current_session().builder.reset()
+
+    def finish_render(self):
+        return current_session().builder.finish_render()
 
 event_base = EventBase()
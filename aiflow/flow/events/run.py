@@ -3,11 +3,39 @@ import os
 import sys
 import subprocess
 import runpy
+import threading
 from aiflow.flow.logger import setup_logger
 from aiflow.flow.events import event_base
+from aiflow.flow.events.code_cache import code_cache
 
 logger = setup_logger('RunModule')
 
+# Reruns of different sessions overlap; the real __main__ and argv are saved by
+# the first one in and restored by the last one out
+_main_lock = threading.Lock()
+_main_users = 0
+_saved_main = None
+_saved_argv = None
+
+def _enter_main(module, file_path):
+    global _main_users, _saved_main, _saved_argv
+    with _main_lock:
+        if _main_users == 0:
+            _saved_main = sys.modules.get('__main__')
+            _saved_argv = sys.argv.copy()
+        _main_users += 1
+        sys.modules['__main__'] = module
+        sys.argv[0] = file_path  # Set argv[0] to the script path
+
+def _exit_main():
+    global _main_users
+    with _main_lock:
+        _main_users -= 1
+        if _main_users == 0:
+            if _saved_main:
+                sys.modules['__main__'] = _saved_main
+            sys.argv = _saved_argv
+
 def run_module_subprocess(file_path):
     """Run a Python module as a subprocess."""
     try:
@@ -49,17 +77,14 @@ def run_module_runpy(file_path):
         return False
 
 def run_module_importlib(file_path):
-    """Run a Python module using importlib (original method)."""
+    """Run a Python module using importlib, executing cached compiled code in a fresh namespace."""
     try:
         # Get the module name from the file path
         module_name = os.path.basename(file_path)
         if (module_name.endswith('.py')):
             module_name = module_name[:-3]
         
-        # Save original __main__ and sys.argv
-        original_main = sys.modules.get('__main__')
-        original_argv = sys.argv.copy()
-        
+        entered = False
         try:
             # Make the target module appear as __main__ to itself
             spec = importlib.util.spec_from_file_location('__main__', file_path)
@@ -68,20 +93,19 @@ def run_module_importlib(file_path):
                 return False
                 
             module = importlib.util.module_from_spec(spec)
-            sys.modules['__main__'] = module
-            sys.argv[0] = file_path  # Set argv[0] to the script path
+            _enter_main(module, file_path)
+            entered = True
             
-            # Execute the module as if run directly
-            spec.loader.exec_module(module)
+            # Execute the module as if run directly; the code object is compiled once per file version
+            exec(code_cache.get(file_path), module.__dict__)
             return True
         except RuntimeError as e:
             logger.error(f"Runtime error: {str(e)}")
             return False
         finally:
             # Restore original __main__ and sys.argv
-            if original_main:
-                sys.modules['__main__'] = original_main
-            sys.argv = original_argv
+            if entered:
+                _exit_main()
             
     except Exception as e:
         logger.error(f"Error running module with importlib {file_path}: {str(e)}")
@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from aiflow.flow.logger import setup_logger
+
+logger = setup_logger('RerunScheduler')
+
+_current = threading.local()
+
+
+class RerunInterrupted(BaseException):
+    """Raised at a checkpoint when a newer event supersedes the running rerun.
+
+    Derives from BaseException so `except Exception` blocks in user scripts do
+    not swallow it.
+    """
+
+
+def checkpoint() -> None:
+    """Abort the calling rerun if its scheduler has a newer event waiting"""
+    scheduler = getattr(_current, "scheduler", None)
+    if scheduler is not None and scheduler._cancel.is_set():
+        raise RerunInterrupted()
+
+
+class RerunScheduler:
+    """Runs at most one rerun at a time, coalescing events that arrive meanwhile.
+
+    A request while a rerun is in progress marks it for cancellation at its
+    next checkpoint; all requests queued by then are served by a single
+    follow-up rerun. An interrupted rerun is not rolled back: side effects it
+    made before the checkpoint, such as state increments, are kept and seen by
+    the follow-up rerun.
+    """
+
+    def __init__(self, run: Callable[[Optional[float]], None], name: str = "ModuleRunner"):
+        self._run = run
+        self._name = name
+        self._lock = threading.Lock()
+        self._pending: Optional[float] = None
+        self._running = False
+        self._cancel = threading.Event()
+        self.runs = 0
+        self.coalesced = 0
+        self.interrupted = 0
+
+    def request_rerun(self, received_at: Optional[float] = None) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = received_at if received_at is not None else time.perf_counter()
+            if self._running:
+                self._cancel.set()
+                return
+            self._running = True
+        thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+        thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _loop(self) -> None:
+        _current.scheduler = self
+        try:
+            while True:
+                with self._lock:
+                    received_at = self._pending
+                    if received_at is None:
+                        self._running = False
+                        return
+                    self._pending = None
+                    self._cancel.clear()
+                self.runs += 1
+                try:
+                    self._run(received_at)
+                except RerunInterrupted:
+                    self.interrupted += 1
+                    logger.debug("Rerun interrupted by a newer event")
+                except Exception as e:
+                    logger.error(f"Rerun failed: {e}")
+        finally:
+            _current.scheduler = None
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from aiflow.flow.events.scheduler import RerunScheduler
+
+_read_recorders = threading.local()
+
+# Session of the rerun executing in this thread; unset outside reruns
+_current_session: ContextVar[Optional["SessionContext"]] = ContextVar("aiflow_session", default=None)
+_default_session: Optional["SessionContext"] = None
+
+
+class ReadTrackingDict(dict):
+    """dict that reports keys read through [], get() and `in` to recorders active on this thread"""
+
+    def __getitem__(self, key):
+        self._record(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._record(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self._record(key)
+        return super().__contains__(key)
+
+    @contextmanager
+    def recording(self, keys):
+        """Collect the keys read on this thread into the given set"""
+        recorders = getattr(_read_recorders, "stack", None)
+        if recorders is None:
+            recorders = _read_recorders.stack = []
+        recorders.append(keys)
+        try:
+            yield keys
+        finally:
+            recorders.remove(keys)
+
+    @staticmethod
+    def _record(key):
+        for keys in getattr(_read_recorders, "stack", ()):
+            keys.add(key)
+
+
+class SessionContext:
+    """Builder, events, state and rerun scheduler of one browser session"""
+
+    def __init__(
+        self,
+        sender_id: Optional[str],
+        run: Callable[["SessionContext", Optional[float]], None],
+        make_batcher: Callable[["SessionContext"], Any],
+    ):
+        self.sender_id = sender_id
+        self.session_id: Optional[str] = None
+        self.events = ReadTrackingDict()
+        self.events_store = {}
+        self.state = {}
+        self.batcher = make_batcher(self)
+        self.scheduler = RerunScheduler(lambda received_at: run(self, received_at))
+        self.last_active = time.monotonic()
+        # Set once the browser's first message has been handled
+        self.paired = False
+        self._builder = None
+
+    @property
+    def builder(self):
+        if self._builder is None:
+            from aiflow.flow.mui.mui_builder import MUIBuilder
+
+            self._builder = MUIBuilder(session=self)
+        return self._builder
+
+    @contextmanager
+    def active(self):
+        """Make this the session that mui, events and state resolve to in the current context"""
+        token = _current_session.set(self)
+        try:
+            yield self
+        finally:
+            _current_session.reset(token)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+def current_session() -> SessionContext:
+    """Session of the running rerun, or the default session outside of reruns"""
+    session = _current_session.get()
+    return session if session is not None else _default_session
+
+
+def set_default_session(session: SessionContext) -> None:
+    global _default_session
+    _default_session = session
+
+
+class SessionMapping(MutableMapping):
+    """Module-level events/events_store/state that forward to the current session's dict"""
+
+    __slots__ = ("_attr",)
+
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def _target(self) -> dict:
+        return getattr(current_session(), self._attr)
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __setitem__(self, key, value):
+        self._target()[key] = value
+
+    def __delitem__(self, key):
+        del self._target()[key]
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self):
+        return len(self._target())
+
+    def __contains__(self, key):
+        return key in self._target()
+
+    def get(self, key, default=None):
+        return self._target().get(key, default)
+
+    def clear(self):
+        self._target().clear()
+
+    def copy(self):
+        return dict(self._target())
+
+    def __eq__(self, other):
+        return self._target() == other
+
+    def __repr__(self):
+        return repr(self._target())
+
+    def __getattr__(self, name):
+        # e.g. events.recording()
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._target(), name)
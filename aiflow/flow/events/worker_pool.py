@@ -0,0 +1,240 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Connection, answer_challenge, deliver_challenge
+from typing import Dict, List, Optional
+
+from aiflow.flow.config import config
+from aiflow.flow.logger import setup_logger
+from aiflow.flow.network.uploads import FileUpload
+
+logger = setup_logger('WorkerPool')
+
+AUTHKEY_ENV = "AIFLOW_WORKER_AUTHKEY"
+WORKER_ENV = "AIFLOW_WORKER"
+
+
+def in_worker() -> bool:
+    return os.environ.get(WORKER_ENV) == "1"
+
+
+class _Worker:
+    """One warm worker process and the connection to it"""
+
+    def __init__(self, index: int, process: subprocess.Popen, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.sessions = 0
+        self._send_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.conn is not None and self.process.poll() is None
+
+    def send(self, message) -> None:
+        with self._send_lock:
+            self.conn.send(message)
+
+
+class WorkerPool:
+    """Runs reruns in warm worker processes, one sticky worker per session.
+
+    Each worker imports aiflow headless, compiles and runs the caller script
+    once to warm its imports, then reruns sessions on its own schedulers.
+    Components the workers send are relayed to the WebSocket client by a
+    reader thread per worker.
+    """
+
+    def __init__(self, script: str, size: int, relay):
+        self.script = script
+        self.size = size
+        self._relay = relay
+        self._authkey = os.urandom(16)
+        self._listener: Optional[socket.socket] = None
+        self._workers: List[_Worker] = []
+        self._assigned: Dict[str, _Worker] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        # A plain socket rather than a Listener, whose accept() cannot time out
+        self._listener = socket.create_server(("localhost", 0))
+        self._listener.settimeout(0.1)
+        threading.Thread(target=self._spawn_all, name="WorkerPool", daemon=True).start()
+
+    def _spawn_all(self) -> None:
+        for index in range(self.size):
+            try:
+                self._workers.append(self._spawn(index))
+            except Exception as e:
+                logger.error(f"Failed to start worker {index}: {e}")
+        logger.info(f"{len(self._workers)} of {self.size} workers started")
+        self._ready.set()
+
+    def _spawn(self, index: int) -> _Worker:
+        env = dict(os.environ, AIFLOW_HEADLESS="1", **{WORKER_ENV: "1", AUTHKEY_ENV: self._authkey.hex()})
+        # Make aiflow importable in the worker even when it is not installed
+        package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+        host, port = self._listener.getsockname()[:2]
+        process = subprocess.Popen(
+            [sys.executable, "-m", "aiflow.flow.events.worker_pool", host, str(port), self.script],
+            env=env,
+        )
+        conn = self._accept(process)
+        worker = _Worker(index, process, conn)
+        threading.Thread(target=self._read, args=(worker,), name=f"WorkerReader-{index}", daemon=True).start()
+        return worker
+
+    def _accept(self, process: subprocess.Popen):
+        """The connection of a just started worker; raises if it exits or does not connect in time"""
+        timeout = config.execution.worker_start_timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+                break
+            except socket.timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"exited with code {process.returncode} before connecting")
+                if time.monotonic() > deadline:
+                    process.kill()
+                    process.wait()
+                    raise TimeoutError(f"did not connect within {timeout:g} s")
+        sock.setblocking(True)
+        conn = Connection(sock.detach())
+        # The handshake Listener.accept() does, matching the worker's Client()
+        try:
+            deliver_challenge(conn, self._authkey)
+            answer_challenge(conn, self._authkey)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _read(self, worker: _Worker) -> None:
+        """Relay sends from a worker until its pipe closes"""
+        while True:
+            try:
+                payload, target = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                self._relay(payload, target)
+            except Exception as e:
+                logger.error(f"Failed to relay message from worker {worker.index}: {e}")
+        worker.conn = None
+        if self._listener is not None:
+            logger.error(f"Worker {worker.index} exited, its sessions will be moved")
+
+    def wait_until_ready(self, timeout: float = 30) -> bool:
+        return self._ready.wait(timeout)
+
+    def dispatch(self, message: dict) -> bool:
+        """Hand a session's message to its worker; False if no worker can take it yet"""
+        if not self._ready.is_set():
+            return False
+        sender_id = message.get("sender_id")
+        with self._lock:
+            worker = self._assigned.get(sender_id)
+            if worker is None or not worker.alive:
+                live = [worker for worker in self._workers if worker.alive]
+                if not live:
+                    return False
+                previous = self._assigned.get(sender_id)
+                if previous is not None:
+                    previous.sessions -= 1
+                worker = min(live, key=lambda worker: worker.sessions)
+                worker.sessions += 1
+                self._assigned[sender_id] = worker
+        try:
+            worker.send(message)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to dispatch to worker {worker.index}: {e}")
+            return False
+        upload = (message.get("payload") or {}).get("fileEvent")
+        if isinstance(upload, FileUpload):
+            # The worker's copy now removes the spooled file
+            upload.hand_over()
+        return True
+
+    def release(self, sender_id: str) -> None:
+        """Forget a released session's worker, so the worker's count drops and it drops the session too"""
+        with self._lock:
+            worker = self._assigned.pop(sender_id, None)
+            if worker is not None:
+                worker.sessions -= 1
+        if worker is not None and worker.alive:
+            try:
+                worker.send({"type": "client_disconnected", "client_id": sender_id})
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to release session on worker {worker.index}: {e}")
+
+    def stop(self) -> None:
+        listener, self._listener = self._listener, None
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.close()
+                except OSError:
+                    pass
+        for worker in self._workers:
+            try:
+                worker.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+        if listener is not None:
+            listener.close()
+
+
+class PipeClient:
+    """Stands in for the WebSocket client inside a worker, sending over the pipe"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def send_sync(self, payload, target, wait=False):
+        with self._lock:
+            self._conn.send((payload, target))
+
+
+class _DiscardClient:
+    def send_sync(self, payload, target, wait=False):
+        pass
+
+
+def worker_main(host: str, port: int, script: str) -> None:
+    from aiflow.flow.events import event_base
+
+    conn = Client((host, port), authkey=bytes.fromhex(os.environ.pop(AUTHKEY_ENV)))
+    # Local imports in the script resolve as they do when it is run directly
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    event_base.set_caller_file(script)
+
+    # Run the script once so its imports and caches are warm for the first session
+    started = time.perf_counter()
+    event_base.set_ws_client(_DiscardClient())
+    event_base._rerun(event_base._new_session(None))
+    logger.info(f"Worker {os.getpid()} warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    event_base.set_ws_client(PipeClient(conn))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message.get("type") == "client_disconnected":
+            event_base.release_session(message.get("client_id"))
+            continue
+        session = event_base.get_session(message.get("sender_id"))
+        session.session_id = message.get("client_id")
+        event_base.process_message(session, message, time.perf_counter())
+
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1], int(sys.argv[2]), sys.argv[3])
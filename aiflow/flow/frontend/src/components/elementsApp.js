@@ -67,11 +67,19 @@ const handleFileEvent = async (event, key, socketService, clientId, setLoadingSt
   try {
     if (!event?.target?.files?.length) return;
     const file = event.target.files[0];
-    const reader = new FileReader();
 
     // Set loading to true at the start of file reading
     setLoadingState(true);
 
+    if (socketService?.sendFile) {
+      // Stream the raw bytes in binary frames; Python exposes them as a FileUpload
+      const sessionId = new URLSearchParams(window.location.search).get('session_id');
+      await socketService.sendFile(file, { key, target: sessionId, senderId: clientId });
+      setLoadingState(false);
+      return;
+    }
+
+    const reader = new FileReader();
     reader.onload = () => {
       send({
         key: key,
@@ -273,7 +281,8 @@ const ElementsApp = ({ args, theme }) => {
             setStreamingStart(payload.time_stamp);
             console.warn('New streaming session started:', payload.time_stamp);
           } else if (payload.message === 'stream_end') {
-            setStreamingEnd(payload.time_stamp);
+            // Incremental renders only re-send changed components; removals arrive as component_patch
+            if (!payload.incremental) setStreamingEnd(payload.time_stamp);
             console.warn('Streaming session ended:', payload.time_stamp);
           }
         }
@@ -293,6 +302,34 @@ const ElementsApp = ({ args, theme }) => {
     return unsub;
   }, [socketService]);
 
+  // WebSocket listener for batched component updates, applied as one state change
+  useEffect(() => {
+    const unsub = socketService.addListener('component_batch', (payload) => {
+      if (!payload?.components?.length) return;
+      setComponentsMap(prevMap => {
+        const newMap = { ...prevMap };
+        payload.components.forEach(component => {
+          newMap[component.id] = { ...component, timestamp: payload.timestamp };
+        });
+        return newMap;
+      });
+    });
+    return unsub;
+  }, [socketService]);
+
+  // WebSocket listener for incremental render patches
+  useEffect(() => {
+    const unsub = socketService.addListener('component_patch', (payload) => {
+      if (!payload?.remove?.length) return;
+      setComponentsMap(prevMap => {
+        const newMap = { ...prevMap };
+        payload.remove.forEach(id => delete newMap[id]);
+        return newMap;
+      });
+    });
+    return unsub;
+  }, [socketService]);
+
   useEffect(() => {
     if (Object.keys(componentsMap).length > 0 && streamingStart) {
       setPreviousComponentsMap(componentsMap);
@@ -1,5 +1,35 @@
 import React from 'react';
 
+// Epoch milliseconds of a naive datetime's wall time, shown as that same wall time here
+const localDate = (ms) => {
+  const utc = new Date(ms);
+  return new Date(
+    utc.getUTCFullYear(), utc.getUTCMonth(), utc.getUTCDate(),
+    utc.getUTCHours(), utc.getUTCMinutes(), utc.getUTCSeconds(), utc.getUTCMilliseconds()
+  );
+};
+
+// Rows sent column by column ({ids, fields, values, dates}) as row objects, with Date objects for datetimes
+export const expandColumnarRows = ({ ids = [], fields = [], values = [], dates = {} }) => {
+  const rows = new Array(ids.length);
+  for (let i = 0; i < ids.length; i++) {
+    rows[i] = {};
+  }
+  fields.forEach((field, j) => {
+    const column = values[j] || [];
+    const toDate = dates[field] === 'utc' ? (ms) => new Date(ms) : dates[field] === 'local' ? localDate : null;
+    for (let i = 0; i < ids.length; i++) {
+      const value = column[i];
+      rows[i][field] = toDate && value != null ? toDate(value) : value;
+    }
+  });
+  // Set last, as the row id always came from the server rather than an 'id' column
+  for (let i = 0; i < ids.length; i++) {
+    rows[i].id = ids[i];
+  }
+  return rows;
+};
+
 export const createDataGridComponent = (module) => {
   return (props) => {
     // Extract server-side related props
@@ -14,18 +44,25 @@ export const createDataGridComponent = (module) => {
       page = 0,
       pageSize = 25,
       pageSizeOptions = [25], // Add default value
+      columnarRows,
       ...otherProps
     } = props;
 
+    const rows = React.useMemo(
+      () => (columnarRows ? expandColumnarRows(columnarRows) : otherProps.rows),
+      [columnarRows, otherProps.rows]
+    );
+
     const isServerPagination = onPaginationModelChange ? 'server' : 'client';
     
     // Calculate rowCount - if server pagination, rowCount is required
     const rowCount = isServerPagination === 'server' 
       ? (providedRowCount || 0)  // Provide default value for server mode
-      : (otherProps.rows || []).length;  // Use rows length for client mode
+      : (rows || []).length;  // Use rows length for client mode
 
     const finalProps = {
       ...otherProps,
+      rows: rows || [],
       // Enable server-side features if handlers are provided
       filterMode: onFilterModelChange ? 'server' : 'client',
       sortingMode: onSortModelChange ? 'server' : 'client',
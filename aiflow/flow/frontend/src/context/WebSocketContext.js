@@ -1,10 +1,36 @@
 import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
+import { decode as decodeMsgpack } from '@msgpack/msgpack';
+import { decodePayload } from './wire';
 
 const WebSocketContext = createContext(null);
 const WS_URL = 'ws://localhost:8888/ws';
 // Add max chunk size constant (1MB)
 const MAX_CHUNK_SIZE = 3 * 1024 * 1024; 
 
+// Prefix the routing envelope so the relay can route without parsing the JSON body
+const frame = (message, target) => `@${target || ''}\n${JSON.stringify(message)}`;
+
+// Python emits NaN/Infinity, which JSON.parse rejects
+const parseMessage = (text) => JSON.parse(text.replace(/:\s*NaN\s*([,}])/g, ': null$1')
+                                              .replace(/:\s*Infinity\s*([,}])/g, ': null$1')
+                                              .replace(/:\s*-Infinity\s*([,}])/g, ': null$1'));
+
+// Binary uploads: 1MB slices, each framed as envelope + 4-byte header length + JSON header + bytes
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_MAX_BUFFERED = 8 * UPLOAD_CHUNK_SIZE;
+const encoder = new TextEncoder();
+
+const uploadFrame = (target, header, bytes) => {
+  const envelope = encoder.encode(`@${target || ''}\n`);
+  const headerBytes = encoder.encode(JSON.stringify(header));
+  const frameBytes = new Uint8Array(envelope.length + 4 + headerBytes.length + bytes.byteLength);
+  frameBytes.set(envelope, 0);
+  new DataView(frameBytes.buffer).setUint32(envelope.length, headerBytes.length);
+  frameBytes.set(headerBytes, envelope.length + 4);
+  frameBytes.set(new Uint8Array(bytes), envelope.length + 4 + headerBytes.length);
+  return frameBytes;
+};
+
 // Helper function to determine if a message needs to be chunked
 const shouldChunkMessage = (data) => {
   if (typeof data !== 'object' || !data) return false;
@@ -43,6 +69,8 @@ export const WebSocketProvider = ({ children }) => {
   const [connectionError, setConnectionError] = useState(null);
   const [clientId, setClientId] = useState(null);
   const wsRef = useRef(null);
+  // Partially received chunked messages, by messageId
+  const chunkBuffersRef = useRef({});
 
   const connect = useCallback(() => {
     if (!wsRef.current || wsRef.current.readyState === WebSocket.CLOSED) {
@@ -51,6 +79,8 @@ export const WebSocketProvider = ({ children }) => {
         const sessionId = urlParams.get('session_id');
 
         const socket = new WebSocket(WS_URL);
+        // render.wire_format 'msgpack' sends component messages as binary frames
+        socket.binaryType = 'arraybuffer';
         wsRef.current = socket;
 
         socket.onopen = () => {
@@ -62,18 +92,28 @@ export const WebSocketProvider = ({ children }) => {
         socket.onmessage = (event) => {
           try {
             if (!event.data) return console.warn('Received empty message');
-            let data = typeof event.data === 'string'
-              ? JSON.parse(event.data.replace(/:\s*NaN\s*([,}])/g, ': null$1')
-                                  .replace(/:\s*Infinity\s*([,}])/g, ': null$1')
-                                  .replace(/:\s*-Infinity\s*([,}])/g, ': null$1'))
-              : event.data;
+            let data = typeof event.data === 'string' ? parseMessage(event.data) : decodeMsgpack(new Uint8Array(event.data));
+            if (data.type === 'chunked_message' && data.data !== undefined) {
+              // Large messages arrive as string slices of their JSON, interleaved with other messages
+              const buffers = chunkBuffersRef.current;
+              const buffer = buffers[data.messageId] || (buffers[data.messageId] = { parts: [], received: 0 });
+              buffer.parts[data.chunkIndex] = data.data;
+              buffer.received += 1;
+              if (buffer.received < data.totalChunks) return;
+              delete buffers[data.messageId];
+              data = parseMessage(buffer.parts.join(''));
+            }
             if (data.type === 'connection') {
               console.log('Connection established with ID:', data.client_id);
               setClientId(data.client_id);
-              sessionId && socket.send(JSON.stringify({ type: 'pair', client_id: sessionId, sender_id: data.client_id, payload: 'Connection established' }));
+              sessionId && socket.send(frame({ type: 'pair', client_id: sessionId, sender_id: data.client_id, payload: 'Connection established' }, sessionId));
               return console.log('Pair message sent:', data.client_id);
             } else if (data.type === 'component_update' && data.payload) {
-              return socket.dispatchEvent(new CustomEvent('component_update', { detail: data.payload }));
+              return socket.dispatchEvent(new CustomEvent('component_update', { detail: decodePayload(data.type, data.payload) }));
+            } else if (data.type === 'component_batch' && data.payload) {
+              return socket.dispatchEvent(new CustomEvent('component_batch', { detail: decodePayload(data.type, data.payload) }));
+            } else if (data.type === 'component_patch' && data.payload) {
+              return socket.dispatchEvent(new CustomEvent('component_patch', { detail: data.payload }));
             } else if (data.from && data.content !== undefined) {
               if (data.content === null) return console.warn('Received null content from server');
               return socket.dispatchEvent(new CustomEvent('message', { detail: data.content }));
@@ -81,7 +121,7 @@ export const WebSocketProvider = ({ children }) => {
               return socket.dispatchEvent(new CustomEvent('message', { detail: data.payload }));
             } else if (data.type === 'paired') {
               return socket.dispatchEvent(new CustomEvent('component_update', { detail: data.payload }));
-            } else if (['chunk_ack', 'chunks_complete_ack'].includes(data.type)) {
+            } else if (['chunk_ack', 'chunks_complete_ack', 'client_disconnected'].includes(data.type)) {
               return;
             } else if (data.type === 'chunked_message_complete') {
               return console.log(`Completed sending all chunks ${data.messageId}`);
@@ -132,7 +172,7 @@ export const WebSocketProvider = ({ children }) => {
   const sendChunk = async (chunk) => {
     if (ws?.readyState === WebSocket.OPEN) {
       try {
-        ws.send(JSON.stringify(chunk));
+        ws.send(frame(chunk, chunk.payload.client_id));
         return true;
       } catch (error) {
         console.error("Error sending chunk:", error);
@@ -179,8 +219,29 @@ export const WebSocketProvider = ({ children }) => {
       } else {
         const message = typeof data === 'string' ? 
           { type: 'message', payload: data } : data;
-        ws.send(JSON.stringify(message));
+        ws.send(frame(message, message.client_id));
+      }
+    },
+    sendFile: async (file, { key, target, senderId }) => {
+      if (!ws || ws.readyState !== WebSocket.OPEN) {
+        console.warn("WebSocket not open, skipping upload");
+        return false;
+      }
+      const uploadId = Date.now().toString() + Math.random().toString(36).substring(2, 15);
+      for (let offset = 0; offset < file.size || offset === 0; offset += UPLOAD_CHUNK_SIZE) {
+        // Let the socket drain instead of queueing the whole file in memory
+        while (ws.bufferedAmount > UPLOAD_MAX_BUFFERED) {
+          await new Promise((resolve) => setTimeout(resolve, 10));
+        }
+        const bytes = await file.slice(offset, offset + UPLOAD_CHUNK_SIZE).arrayBuffer();
+        ws.send(uploadFrame(target, {
+          uploadId, key, offset,
+          name: file.name, mime: file.type, size: file.size,
+          client_id: target, sender_id: senderId, timestamp: Date.now()
+        }, bytes));
+        if (file.size === 0) break;
       }
+      return true;
     },
     addListener: (event, callback) => {
       if (!ws) return () => {};
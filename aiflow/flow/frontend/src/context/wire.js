@@ -0,0 +1,40 @@
+// Protocol 2 component messages (aiflow/flow/network/wire.py): a string table plus nodes encoded as
+// [type, id, module, props, parent, content, time_stamp, children, extra] with trailing empties dropped
+export const PROTOCOL_VERSION = 2;
+
+const decodeNode = (strings, encoded, parentId, decoded) => {
+  const [typeIndex, encodedId, moduleIndex, props, parent, content, timeStamp, children, extra] = encoded;
+  const type = strings[typeIndex];
+  const id = typeof encodedId === 'number' ? `${type}_${encodedId}` : encodedId;
+  const component = { type, id };
+  if (moduleIndex !== undefined && moduleIndex !== null) component.module = strings[moduleIndex];
+  if (props) {
+    component.props = {};
+    for (let i = 0; i < props.length; i += 2) component.props[strings[props[i]]] = props[i + 1];
+  }
+  // Nested children without a parent field inherit the container's id; otherwise it points at an
+  // earlier node or an interned id, and [] means no parent
+  if (typeof parent === 'number') parentId = decoded[parent].id;
+  else if (Array.isArray(parent)) parentId = parent.length ? strings[parent[0]] : null;
+  component.parentId = parentId;
+  if (content !== undefined && content !== null) component.content = content;
+  if (timeStamp !== undefined && timeStamp !== null) component.time_stamp = timeStamp;
+  if (children) component.children = children.map(child => decodeNode(strings, child, id, decoded));
+  if (extra) Object.assign(component, extra);
+  return component;
+};
+
+export const decodeComponents = ({ strings, nodes }) => {
+  const decoded = [];
+  nodes.forEach(node => decoded.push(decodeNode(strings, node, null, decoded)));
+  return decoded;
+};
+
+// Rewrite a protocol 2 payload into the protocol 1 shape the listeners expect
+export const decodePayload = (type, payload) => {
+  if (!payload || payload.v !== PROTOCOL_VERSION) return payload;
+  const components = decodeComponents(payload);
+  return type === 'component_update'
+    ? { component: components[0], timestamp: payload.timestamp }
+    : { components, timestamp: payload.timestamp };
+};
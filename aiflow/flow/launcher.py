@@ -42,6 +42,7 @@ class Launcher:
         self.running = True
         self.processes: Dict[str, subprocess.Popen] = {}
         self.threads: List[threading.Thread] = []
+        self._server = None
         self.caller_file = self._get_caller_info()
         logger.info("Starting server monitoring thread")
         self._start_server_monitor()
@@ -121,6 +122,13 @@ class Launcher:
                     )
             except Exception as e:
                 logger.error(f"Error closing WebSocket client: {e}", exc_info=True)
+        if self._server is not None:
+            try:
+                logger.info("Stopping embedded WebSocket server")
+                asyncio.run_coroutine_threadsafe(self._server.stop(), self._loop).result(timeout=3)
+            except Exception as e:
+                logger.error(f"Error stopping embedded server: {e}", exc_info=True)
+        event_base.stop_workers()
         self._terminate_processes()
         self._shutdown_event_loop()
         if not is_restart:
@@ -293,6 +301,8 @@ class Launcher:
     def _start_server(self):
         import socket
 
+        if config.websocket.mode == "embedded":
+            return self._start_embedded_server()
         try:
             with socket.create_connection(
                 ("localhost", config.websocket.port), timeout=1
@@ -305,17 +315,37 @@ class Launcher:
             os.path.dirname(__file__), "network", "ws_server.py"
         )
         cmd = [sys.executable, "-Xfrozen_modules=off", server_script]
-        process = self._start_process("Server", cmd)
+        env = dict(
+            os.environ,
+            AIFLOW_WS_COMPRESSION="1" if config.websocket.compression else "0",
+            AIFLOW_WS_COMPRESSION_LEVEL=str(config.websocket.compression_level),
+            AIFLOW_WS_COMPRESSION_THRESHOLD=str(config.websocket.compression_threshold),
+            AIFLOW_WS_SERIALIZER=config.websocket.serializer,
+        )
+        process = self._start_process("Server", cmd, env=env)
         if not process:
             logger.error("Failed to start WebSocket server process")
             raise RuntimeError("Failed to start WebSocket server")
         self._wait_for_server(timeout=15)
         return process
 
-    def _start_process(self, name: str, args: list) -> Optional[subprocess.Popen]:
+    def _start_embedded_server(self):
+        """Run the WebSocket server on the launcher's loop instead of a relay process"""
+        from aiflow.flow.network.embedded import create_server
+
+        server = create_server()
+        asyncio.run_coroutine_threadsafe(server.start(config.websocket.port), self._loop).result(timeout=15)
+        if server.server is None:
+            raise RuntimeError(f"Port {config.websocket.port} is in use, cannot start the embedded server")
+        logger.info(f"Embedded server listening on port {config.websocket.port}")
+        self._server = server
+        return server
+
+    def _start_process(self, name: str, args: list, env: Optional[Dict[str, str]] = None) -> Optional[subprocess.Popen]:
         try:
             process = subprocess.Popen(
                 args,
+                env=env,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 bufsize=1,
@@ -388,10 +418,15 @@ class Launcher:
 
     async def _init_client(self):
         try:
-            ws_client = WebSocketClient()
+            if self._server is not None:
+                # Embedded mode: the client shares this loop with the server
+                from aiflow.flow.network.embedded import EmbeddedClient
+
+                ws_client = EmbeddedClient(self._server, self._loop)
+            else:
+                # The client connects on its own loop; the constructor waits for it
+                ws_client = WebSocketClient()
             event_base.set_ws_client(ws_client)
-            await ws_client.connect()
-            await ws_client.wait_for_ready()
             if ws_client.client_id:
                 self._launch_browser(ws_client.client_id)
                 self._client_ready.set()
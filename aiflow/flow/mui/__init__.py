@@ -1,6 +1,6 @@
-from aiflow.flow.mui.mui_builder import MUIBuilder
+from aiflow.flow.mui.mui_builder import SessionBuilder
 
-mui = MUIBuilder()  # Create instance here
+mui = SessionBuilder()  # Resolves to the builder of the session being rendered
 
 __all__ = ['mui']
 
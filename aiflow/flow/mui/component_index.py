@@ -0,0 +1,100 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class ComponentIndex:
+    """Id-keyed index of sent component dicts with parent and child links.
+
+    Besides the top-level dicts, the index remembers the nested copies of a
+    component that are embedded in other dicts' ``children`` arrays, so a
+    parent change can be applied without walking the whole tree.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._parents: Dict[str, Optional[str]] = {}
+        self._children: Dict[str, List[str]] = {}
+        # Embedded copies by component id, keyed by the top-level dict holding them,
+        # so re-adding a dict replaces its copies instead of piling up more
+        self._nested: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._nested_in: Dict[str, List[str]] = {}
+
+    def add(self, node: Dict[str, Any]) -> None:
+        """Add or replace a component dict, indexing its nested children"""
+        node_id = node["id"]
+        self._nodes[node_id] = node
+        self._link(node_id, node.get("parentId"))
+        self._unregister_nested(node_id)
+        self._register_nested(node_id, node.get("children") or ())
+
+    def get(self, node_id: str) -> Optional[Dict[str, Any]]:
+        return self._nodes.get(node_id)
+
+    def parent(self, node_id: str) -> Optional[str]:
+        return self._parents.get(node_id)
+
+    def children(self, node_id: str) -> List[str]:
+        return list(self._children.get(node_id, ()))
+
+    def set_parent(self, node_id: str, parent_id: str, nested: bool = False) -> bool:
+        """Point a component at a new parent; with nested=True embedded copies follow"""
+        node = self._nodes.get(node_id)
+        if node is None:
+            return False
+        node["parentId"] = parent_id
+        self._link(node_id, parent_id)
+        if nested:
+            for copy in self._nested.get(node_id, {}).values():
+                copy["parentId"] = parent_id
+        return True
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._nodes.values())
+
+    def clear(self) -> None:
+        self._nodes.clear()
+        self._parents.clear()
+        self._children.clear()
+        self._nested.clear()
+        self._nested_in.clear()
+
+    def _link(self, node_id: str, parent_id: Optional[str]) -> None:
+        previous = self._parents.get(node_id)
+        if node_id in self._parents and previous == parent_id:
+            return
+        if previous is not None:
+            siblings = self._children.get(previous)
+            if siblings and node_id in siblings:
+                siblings.remove(node_id)
+        self._parents[node_id] = parent_id
+        if parent_id is not None:
+            self._children.setdefault(parent_id, []).append(node_id)
+
+    def _register_nested(self, owner_id: str, children) -> None:
+        owned = []
+        stack = list(children)
+        while stack:
+            child = stack.pop()
+            if not isinstance(child, dict) or "id" not in child:
+                continue
+            self._nested.setdefault(child["id"], {})[owner_id] = child
+            owned.append(child["id"])
+            stack.extend(child.get("children") or ())
+        if owned:
+            self._nested_in[owner_id] = owned
+
+    def _unregister_nested(self, owner_id: str) -> None:
+        for child_id in self._nested_in.pop(owner_id, ()):
+            copies = self._nested.get(child_id)
+            if copies is not None:
+                copies.pop(owner_id, None)
+                if not copies:
+                    del self._nested[child_id]
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._nodes)
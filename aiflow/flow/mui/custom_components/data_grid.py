@@ -1,32 +1,82 @@
-import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+import numpy as np
 from aiflow import mui, events_store, state
+from aiflow.flow.config import config
+from aiflow.flow.events.session import current_session
+from aiflow.flow.mui.custom_components.grid_columns import column_defs, overrides_key, schema_key
+from aiflow.flow.mui.custom_components.grid_filter import filter_positions
+from aiflow.flow.mui.custom_components.grid_index import GridIndex
+from aiflow.flow.mui.custom_components.grid_rows import encode_page, page_records
+
+
+# Single-grid state keys used before grids were keyed by grid_id
+_LEGACY_KEYS = (
+    '__df', '__last_grid_event', '__grid_filter', '__grid_page', '__grid_page_size', '__grid_sort_field',
+    '__grid_sort_dir', '__grid_index', '__grid_filtered', '__grid_positions',
+)
+
+
+@dataclass
+class GridState:
+    """What one grid keeps between reruns: its models and row positions, never frame copies"""
+    filter_model: Optional[dict] = None
+    sort_field: Optional[str] = None
+    sort_dir: Optional[str] = None
+    page: int = 0
+    page_size: int = 25
+    last_event: Optional[tuple] = None
+    # Row positions into the frame after filtering, and after sorting; None means all rows in order
+    filtered: Optional[np.ndarray] = None
+    positions: Optional[np.ndarray] = None
+    index: Optional[GridIndex] = None
+    # Column definitions and the schema and overrides they were built for
+    columns: Optional[list] = None
+    columns_key: Optional[tuple] = None
+    initial_state: Optional[dict] = None
+    # Id of the DataGrid component rendered last, to tell when the grid left the tree
+    component_id: Optional[str] = None
+
+
+def _grid_states(_state) -> Dict[str, GridState]:
+    grids = _state.get('__grids')
+    if grids is None:
+        grids = _state['__grids'] = {}
+        for key in _LEGACY_KEYS:
+            _state.pop(key, None)
+    return grids
+
+
+def _release_unrendered(grids: Dict[str, GridState], rendered_ids: Set[str]) -> None:
+    """Drop the state of grids that the last rerun did not render"""
+    for grid_id in [grid_id for grid_id, grid in grids.items() if grid.component_id not in rendered_ids]:
+        del grids[grid_id]
+
+
+def datagrid(df, grid_id="my-grid", columns=None, version=None, **grid_props):
+    """Server-side paginated, sorted and filtered MUI DataGrid over a DataFrame.
+
+    columns overrides the generated column definitions: a mapping of fields
+    to colDef props (width, type, renderCell, ...) or a list of colDefs.
+    version marks edits made to df in place: pass a new value (a counter, a
+    timestamp) after changing cells, as the grid hashes a frame object only
+    the first time it sees it. A new frame object needs no version.
+    """
+    grids = _grid_states(state)
+    grid = grids.get(grid_id)
+    if grid is None:
+        grid = grids[grid_id] = GridState()
+    builder = current_session().builder
+    builder.on_finish_render('datagrid', lambda rendered_ids: _release_unrendered(grids, rendered_ids))
 
-def datagrid(df, grid_id="my-grid", **grid_props):
-    _state = state
-    # Initialize state variables for grid events
-    if '__last_grid_event' not in _state:
-        _state['__last_grid_event'] = None
-    if '__grid_filter' not in _state:
-        _state['__grid_filter'] = None
-    if '__grid_page' not in _state:
-        _state['__grid_page'] = 0
-    if '__grid_page_size' not in _state:
-        _state['__grid_page_size'] = 25
-    if '__grid_sort_field' not in _state:
-        _state['__grid_sort_field'] = None
-    if '__grid_sort_dir' not in _state:
-        _state['__grid_sort_dir'] = None
-
-    # Create a copy of the dataframe to avoid modifying the original
     if df is None:
+        grid.component_id = None
         return mui.Typography(
             "No data available to display",
             sx={"textAlign": "center"}
         )
     
-    original_df = df.copy()
-    processed_df = original_df.copy()
-
     # Handle grid events with deduplication
     # Corrected to handle events_store structure with payload
     payload = events_store.get('payload', {})
@@ -36,127 +86,82 @@ def datagrid(df, grid_id="my-grid", **grid_props):
     if payload and payload.get('key') == grid_id:
         grid_event = payload
     
+    # The frame is never copied: positions are recomputed from the stored models when
+    # the frame changes, e.g. after an upload, along with the index that caches sort
+    # permutations, text codes and filter masks per column
+    refilter = grid.index is None or not grid.index.matches(df, version)
+    if refilter:
+        grid.index = GridIndex(df, version)
+    resort = refilter
+    index = grid.index
+
     if grid_event:
         current_event = (grid_event.get('type'), str(grid_event.get('value')))
         
         # Only process if event is different from last one
-        if current_event != _state['__last_grid_event']:
-            _state['__last_grid_event'] = current_event
+        if current_event != grid.last_event:
+            grid.last_event = current_event
             
             if grid_event.get('type') == 'filter-change':
-                filter_model = grid_event['value']
-                _state['__grid_filter'] = filter_model
-                
-                # Apply filtering
-                if filter_model and filter_model.get('items'):
-                    processed_df = original_df.copy()
-                    for filter_item in filter_model['items']:
-                        field = filter_item.get('field')
-                        operator = filter_item.get('operator')
-                        value = filter_item.get('value')
-                        
-                        if field and operator:
-                            # String operators
-                            if operator == 'contains' and isinstance(value, str):
-                                processed_df = processed_df[processed_df[field].astype(str).str.contains(value, na=False)]
-                            elif operator == 'does not contain' and isinstance(value, str):
-                                processed_df = processed_df[~processed_df[field].astype(str).str.contains(value, na=False)]
-                            elif operator == '=' or operator == 'equals':
-                                processed_df = processed_df[processed_df[field] == value]
-                            elif operator == '!=' or operator == 'does not equal':
-                                processed_df = processed_df[processed_df[field] != value]
-                            elif operator == 'starts with' and isinstance(value, str):
-                                processed_df = processed_df[processed_df[field].astype(str).str.startswith(value, na=False)]
-                            elif operator == 'ends with' and isinstance(value, str):
-                                processed_df = processed_df[processed_df[field].astype(str).str.endswith(value, na=False)]
-                            elif operator == 'is empty':
-                                processed_df = processed_df[processed_df[field].isna() | (processed_df[field].astype(str) == '')]
-                            elif operator == 'is not empty':
-                                processed_df = processed_df[processed_df[field].notna() & (processed_df[field].astype(str) != '')]
-                            elif operator == 'is any of' and isinstance(value, list):
-                                processed_df = processed_df[processed_df[field].isin(value)]
-                    
-                    _state['__df'] = processed_df
-                    _state['__grid_page'] = 0
-                else:
-                    _state['__df'] = original_df.copy()
-                    _state['__grid_page'] = 0
+                grid.filter_model = grid_event['value']
+                grid.page = 0
+                refilter = resort = True
 
             elif grid_event.get('type') == 'sort-change':
                 sort_model = grid_event['value']
                 if sort_model and len(sort_model) > 0:
-                    _state['__grid_sort_field'] = sort_model[0].get('field')
-                    _state['__grid_sort_dir'] = sort_model[0].get('sort')
-                    # Apply sorting
-                    if _state['__grid_sort_field'] and _state['__grid_sort_dir']:
-                        sorted_df = original_df.copy() if '__df' not in _state else _state['__df'].copy()
-                        _state['__df'] = sorted_df.sort_values(
-                            by=_state['__grid_sort_field'],
-                            ascending=(_state['__grid_sort_dir'] == 'asc')
-                        )
-                        _state['__grid_page'] = 0
+                    grid.sort_field = sort_model[0].get('field')
+                    grid.sort_dir = sort_model[0].get('sort')
+                else:
+                    grid.sort_field = None
+                    grid.sort_dir = None
+                grid.page = 0
+                resort = True
 
             elif grid_event.get('type') == 'pagination-change':
-                _state['__grid_page'] = grid_event['value'].get('page', 0)
-                _state['__grid_page_size'] = grid_event['value'].get('pageSize', 25)
-
-    # Use processed dataframe if available in state
-    if '__df' in _state:
-        processed_df = _state['__df']
-
-    # Apply pagination
-    row_count = len(processed_df)
-    start_idx = _state['__grid_page'] * _state['__grid_page_size']
-    end_idx = start_idx + _state['__grid_page_size']
-    page_df = processed_df.iloc[start_idx:end_idx]
-
-    # Convert processed DataFrame to rows format
-    rows = page_df.to_dict('records')
-    for i, row in enumerate(rows):
-        row['id'] = i + start_idx
-
-    # Create columns configuration with types
-    columns = [
-        {'field': 'id', 'headerName': 'ID', 'width': 50, 'type': 'number'},
-    ]
-    
-    for col in df.columns:
-        column_def = {
-            'field': col, 
-            'headerName': col.title(), 
-            'width': 100
-        }
-        
-        # Set column type based on dtype
-        if pd.api.types.is_numeric_dtype(df[col].dtype):
-            column_def['type'] = 'number'
-        elif pd.api.types.is_datetime64_any_dtype(df[col].dtype):
-            column_def['type'] = 'dateTime'
-        elif pd.api.types.is_bool_dtype(df[col].dtype):
-            column_def['type'] = 'boolean'
-        
-        columns.append(column_def)
+                grid.page = grid_event['value'].get('page', 0)
+                grid.page_size = grid_event['value'].get('pageSize', 25)
+
+    if refilter:
+        grid.filtered = filter_positions(df, index, grid.filter_model)
+    if resort:
+        positions = grid.filtered
+        if grid.sort_field in df.columns and grid.sort_dir:
+            positions = index.sort_positions(df, positions, grid.sort_field, grid.sort_dir == 'asc')
+        grid.positions = positions
+    positions = grid.positions
+
+    # Apply pagination; only the visible page is encoded, column by column from the arrays
+    row_count = len(df) if positions is None else len(positions)
+    start_idx = grid.page * grid.page_size
+    end_idx = start_idx + grid.page_size
+    page_rows = encode_page(df, positions, start_idx, end_idx)
+    rows_prop = {'columnarRows': page_rows} if config.render.grid_columnar_rows else {'rows': page_records(page_rows)}
+
+    # Column definitions only change with the frame's schema or the overrides passed in
+    columns_key = (schema_key(df), overrides_key(columns))
+    if grid.columns_key != columns_key:
+        grid.columns = column_defs(df, columns)
+        grid.columns_key = columns_key
+    pagination_model = {"pageSize": grid.page_size, "page": grid.page}
+    if grid.initial_state is None or grid.initial_state["pagination"]["paginationModel"] != pagination_model:
+        grid.initial_state = {"pagination": {"paginationModel": pagination_model}}
 
     # Create and return the DataGrid component with server-side features
-    return mui.DataGrid(
+    component = mui.DataGrid(
         id=grid_id,
-        rows=rows,
-        columns=columns,
+        columns=grid.columns,
         checkboxSelection=False,
         paginationMode="server",
         sortingMode="server",
         filterMode="server",
         rowCount=row_count,
         pageSizeOptions=[5, 10, 25, 50],
-        page=_state['__grid_page'],
-        pageSize=_state['__grid_page_size'],
-        initialState={
-            "pagination": {
-                "paginationModel": {
-                    "pageSize": _state['__grid_page_size'],
-                    "page": _state['__grid_page']
-                }
-            }
-        },
+        page=grid.page,
+        pageSize=grid.page_size,
+        initialState=grid.initial_state,
+        **rows_prop,
         **grid_props
     )
+    grid.component_id = f"{component.type}_{component.unique_id}"
+    return component
@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+ColumnOverrides = Union[Dict[str, dict], List[dict], None]
+
+
+def schema_key(df: pd.DataFrame) -> tuple:
+    """What column definitions depend on: column names and dtypes, and the index for row ids"""
+    index = df.index
+    # dtype objects compare directly; formatting them is the costly part on wide frames.
+    # Uniqueness decides whether ids are index labels or row positions.
+    return (tuple(df.columns), tuple(df.dtypes.tolist()), type(index), index.dtype, index.is_unique)
+
+
+def column_defs(df: pd.DataFrame, overrides: ColumnOverrides = None) -> List[dict]:
+    """MUI column definitions for a frame, with user overrides merged in.
+
+    overrides maps fields to colDef props (width, type, renderCell, ...), or
+    is a list of colDefs with a 'field' as MUI takes them. Fields the frame
+    does not have, e.g. action columns, are added after its own.
+    """
+    numeric_ids = isinstance(df.index, pd.RangeIndex) or (
+        pd.api.types.is_integer_dtype(df.index.dtype) and df.index.is_unique
+    )
+    columns = [{'field': 'id', 'headerName': 'ID', 'width': 50}]
+    if numeric_ids:
+        columns[0]['type'] = 'number'
+
+    for col, dtype in df.dtypes.items():
+        column_def = {
+            'field': str(col),
+            'headerName': str(col).title(),
+            'width': 100
+        }
+
+        # Set column type based on dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            column_def['type'] = 'boolean'
+        elif pd.api.types.is_numeric_dtype(dtype):
+            column_def['type'] = 'number'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            column_def['type'] = 'dateTime'
+
+        columns.append(column_def)
+
+    return _merge(columns, overrides)
+
+
+def _merge(columns: List[dict], overrides: ColumnOverrides) -> List[dict]:
+    if not overrides:
+        return columns
+    if isinstance(overrides, dict):
+        overrides = [dict(props, field=str(field)) for field, props in overrides.items()]
+    by_field = {column['field']: column for column in columns}
+    for override in overrides:
+        field = override.get('field')
+        if field is None:
+            continue
+        if field in by_field:
+            by_field[field].update(override)
+        else:
+            column = by_field[field] = dict(override)
+            columns.append(column)
+    return columns
+
+
+def overrides_key(overrides: ColumnOverrides) -> Optional[str]:
+    # Overrides are small, plain data (renderers are sent as code strings), so repr identifies them
+    return None if not overrides else repr(overrides)
@@ -0,0 +1,184 @@
+import re
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aiflow.flow.mui.custom_components.grid_index import GridIndex
+
+# Spellings used before the grid sent MUI's operator names, and other common aliases
+OPERATOR_ALIASES = {
+    'does not contain': 'doesNotContain',
+    'does not equal': 'doesNotEqual',
+    'starts with': 'startsWith',
+    'ends with': 'endsWith',
+    'is empty': 'isEmpty',
+    'is not empty': 'isNotEmpty',
+    'is any of': 'isAnyOf',
+    '=': 'equals',
+    'is': 'equals',
+    '!=': 'doesNotEqual',
+    'not': 'doesNotEqual',
+    'after': '>',
+    'isAfter': '>',
+    'onOrAfter': '>=',
+    'isOnOrAfter': '>=',
+    'before': '<',
+    'isBefore': '<',
+    'onOrBefore': '<=',
+    'isOnOrBefore': '<=',
+}
+
+TEXT_OPERATORS = ('contains', 'doesNotContain', 'startsWith', 'endsWith')
+COMPARISONS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}
+
+
+def filter_positions(df: pd.DataFrame, index: GridIndex, filter_model: Optional[dict]) -> Optional[np.ndarray]:
+    """Positions of the rows matching a MUI filter model, None if nothing is filtered.
+
+    Items combine with the model's logicOperator, quick filter values with
+    quickFilterLogicOperator, and the two with AND. Each item's mask is cached
+    on the index, so editing one item only evaluates that item again.
+    """
+    if not filter_model:
+        return None
+    item_masks = []
+    for item in filter_model.get('items') or ():
+        mask = _cached_item_mask(df, index, item)
+        if mask is not None:
+            item_masks.append(mask)
+    quick_masks = []
+    for value in filter_model.get('quickFilterValues') or ():
+        if value not in (None, ''):
+            quick_masks.append(index.cached_mask(('quick', str(value)), lambda: _quick_filter_mask(df, index, str(value))))
+
+    masks = []
+    if item_masks:
+        masks.append(_combine(item_masks, filter_model.get('logicOperator')))
+    if quick_masks:
+        masks.append(_combine(quick_masks, filter_model.get('quickFilterLogicOperator')))
+    if not masks:
+        return None
+    return np.flatnonzero(_combine(masks, 'and'))
+
+
+def _combine(masks: List[np.ndarray], logic_operator: Optional[str]) -> np.ndarray:
+    combine = np.logical_or if logic_operator == 'or' else np.logical_and
+    result = masks[0].copy()
+    for mask in masks[1:]:
+        combine(result, mask, out=result)
+    return result
+
+
+def _cached_item_mask(df: pd.DataFrame, index: GridIndex, item: dict) -> Optional[np.ndarray]:
+    field = item.get('field')
+    operator = OPERATOR_ALIASES.get(item.get('operator'), item.get('operator'))
+    value = item.get('value')
+    if not field or not operator or field not in df.columns:
+        return None
+    # Items still being typed into do not filter, as in the grid itself
+    if operator not in ('isEmpty', 'isNotEmpty') and (value is None or value == '' or value == []):
+        return None
+    key = ('item', field, operator, repr(value))
+    return index.cached_mask(key, lambda: _item_mask(df, index, field, operator, value))
+
+
+def _item_mask(df: pd.DataFrame, index: GridIndex, field: str, operator: str, value: Any) -> Optional[np.ndarray]:
+    """Boolean mask of one filter item over a full column, or None if the item does not apply"""
+    column = df[field]
+    if operator in TEXT_OPERATORS:
+        # Case-insensitive and literal, like the grid's own string operators; missing values never match
+        needle = str(value).lower()
+        if operator in ('contains', 'doesNotContain'):
+            mask = index.text_mask(df, field, lambda text: text.str.lower().str.contains(needle, regex=False))
+            return ~mask if operator == 'doesNotContain' else mask
+        if operator == 'startsWith':
+            return index.text_mask(df, field, lambda text: text.str.lower().str.startswith(needle))
+        return index.text_mask(df, field, lambda text: text.str.lower().str.endswith(needle))
+    if operator in ('isEmpty', 'isNotEmpty'):
+        codes, _ = index.codes(df, field)
+        empty = (codes < 0) | index.text_mask(df, field, lambda text: text == '')
+        return empty if operator == 'isEmpty' else ~empty
+
+    if operator == 'isAnyOf':
+        if not isinstance(value, list):
+            return None
+        values = [_coerce(column, item) for item in value]
+        values = [item for item in values if item is not None]
+        if column.dtype == object:
+            codes, uniques = index.codes(df, field)
+            wanted = uniques.get_indexer(values)
+            return np.isin(codes, wanted[wanted >= 0])
+        return column.isin(values).to_numpy(dtype=bool)
+
+    target = _coerce(column, value)
+    if target is None:
+        return None
+    values = column
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        # Dates compare at the precision the filter value was given in
+        values = column.dt.floor('D' if _is_date(value) else 'min')
+    if operator in ('equals', 'doesNotEqual'):
+        if column.dtype == object:
+            # Object columns compare codes instead of every Python object
+            codes, uniques = index.codes(df, field)
+            code = uniques.get_indexer([target])[0]
+            equal = codes == code if code >= 0 else np.zeros(len(codes), dtype=bool)
+        else:
+            equal = (values == target).to_numpy(dtype=bool)
+        return equal if operator == 'equals' else ~equal
+    compare = COMPARISONS.get(operator)
+    if compare is None:
+        return None
+    try:
+        return compare(values, target).to_numpy(dtype=bool, na_value=False)
+    except TypeError:
+        # Comparisons between incompatible types, e.g. '>' on a text column
+        return None
+
+
+def _quick_filter_mask(df: pd.DataFrame, index: GridIndex, value: str) -> np.ndarray:
+    """Rows where any text column contains value, or any numeric column equals it"""
+    needle = value.lower()
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    mask = np.zeros(len(df), dtype=bool)
+    for field in df.columns:
+        dtype = df[field].dtype
+        if dtype == object or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            mask |= index.text_mask(df, field, lambda text: text.str.lower().str.contains(needle, regex=False))
+        elif number is not None and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            mask |= (df[field] == number).to_numpy(dtype=bool)
+    return mask
+
+
+_DATE_ONLY = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _is_date(value: Any) -> bool:
+    return isinstance(value, str) and bool(_DATE_ONLY.match(value))
+
+
+def _coerce(column: pd.Series, value: Any) -> Any:
+    """Convert a filter value from the browser to the column's type; None if it does not parse"""
+    if value is None:
+        return None
+    dtype = column.dtype
+    try:
+        if pd.api.types.is_bool_dtype(dtype):
+            return value if isinstance(value, bool) else str(value).lower() == 'true'
+        if pd.api.types.is_numeric_dtype(dtype):
+            return float(value)
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            timestamp = pd.Timestamp(value)
+            tz = getattr(dtype, 'tz', None)
+            if tz is not None:
+                timestamp = timestamp.tz_localize(tz) if timestamp.tzinfo is None else timestamp.tz_convert(tz)
+            elif timestamp.tzinfo is not None:
+                timestamp = timestamp.tz_convert(None)
+            return timestamp
+    except (TypeError, ValueError):
+        return None
+    return value
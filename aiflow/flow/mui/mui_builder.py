@@ -1,10 +1,16 @@
+from collections import deque
 from datetime import datetime
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Set, Optional, Union, Callable, TypeVar
+from typing import List, Dict, Any, Set, Optional, Union, Callable, TypeVar, Deque
 
+from aiflow.flow.mui.component_index import ComponentIndex
 from aiflow.flow.mui.mui_component import MUIComponent
 from aiflow.flow.mui.mui_icons import MUIIcons
 from aiflow.flow.events import event_base
+from aiflow.flow.config import config
+from aiflow.flow.network import serializer
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -38,7 +44,8 @@ class MUIIconAccess:
 
 
 class MUIBuilder:
-    def __init__(self):
+    def __init__(self, session=None):
+        self._session = session
         self.initialized = False
         self._stack: List[MUIComponent] = []
         self._roots: List[MUIComponent] = []
@@ -46,11 +53,19 @@ class MUIBuilder:
         self._id_counter = 1
         self.icon = MUIIconAccess(self)
         self._component_sequence = []
-        self._components = []
+        self._pending_by_type: Dict[str, Deque[dict]] = {}
+        self._sequence_by_name: Dict[str, dict] = {}
+        self._pending_count = 0
+        self._components = ComponentIndex()
         self._order_counter = 0
         self._current_parent_id = 0
         self._component_hierarchy = {}
         self._current_parent = None
+        self._rendered: Dict[str, Optional[str]] = {}
+        self._rendered_ids: Set[str] = set()
+        self._changed_ids: Set[str] = set()
+        self._recorders: List[List[dict]] = []
+        self._finish_hooks: Dict[str, Callable[[Set[str]], None]] = {}
 
     def reset(self):
         """Reset all counters and state of the MUI builder"""
@@ -58,12 +73,17 @@ class MUIBuilder:
         self._roots = []
         self._id_counter = 1
         self._component_sequence = []
-        self._components = []
+        self._pending_by_type = {}
+        self._sequence_by_name = {}
+        self._pending_count = 0
+        self._components.clear()
         self._order_counter = 0
         self._current_parent_id = 0
         self._component_hierarchy = {}
         self._current_parent = None
-        # Keep initialized flag - we're just resetting the counters
+        self._rendered_ids = set()
+        self._changed_ids = set()
+        # Keep initialized flag and the rendered tree - we're just resetting the counters
 
     def init(self):
         """Initialize the MUI system"""
@@ -124,20 +144,22 @@ class MUIBuilder:
         current_parent_id: str,
     ) -> None:
         """Update component in the sequence tracking"""
-        for item in self._component_sequence:
-            if item["type"] == component_type and item["props_updated"] == False:
-                item.update(
-                    {
-                        "props_updated": True,
-                        "props": processed_props,
-                        "children": [child.to_dict() for child in processed_children],
-                        "component_id": component_dict["id"],
-                        "parent_id": current_parent_id,
-                        "text_content": component_dict.get("content"),
-                        "order": self._order_counter,
-                    }
-                )
-                break
+        pending = self._pending_by_type.get(component_type)
+        if not pending:
+            return
+        item = pending.popleft()
+        self._pending_count -= 1
+        item.update(
+            {
+                "props_updated": True,
+                "props": processed_props,
+                "children": [child.to_dict() for child in processed_children],
+                "component_id": component_dict["id"],
+                "parent_id": current_parent_id,
+                "text_content": component_dict.get("content"),
+                "order": self._order_counter,
+            }
+        )
 
     def _component_exists_in_array(
         self, comp: Dict[str, Any], array: List[Dict[str, Any]]
@@ -279,9 +301,7 @@ class MUIBuilder:
     def _update_parent_ids(self, component: MUIComponent) -> None:
         """Recursively update parent IDs for component hierarchy"""
         component_id = self._get_component_id(component)
-        component_dict = next(
-            (c for c in self._components if c.get("id") == component_id), None
-        )
+        component_dict = self._components.get(component_id)
 
         if not component_dict:
             return
@@ -295,32 +315,8 @@ class MUIBuilder:
                     self._update_parent_ids(child)
 
     def _update_child_parent_id(self, child_id: str, parent_id: str) -> None:
-        """Update parentId for a component in the component tree"""
-        # Update in main components list
-        for comp in self._components:
-            if comp.get("id") == child_id:
-                comp["parentId"] = parent_id
-                # Update in children arrays
-                self._update_parent_id_in_children(
-                    self._components, child_id, parent_id
-                )
-                return
-
-    def _update_parent_id_in_children(
-        self, components_list: List[Dict[str, Any]], child_id: str, parent_id: str
-    ) -> None:
-        """Recursively update parentId in component children"""
-        for comp in components_list:
-            if comp.get("children"):
-                for child in comp.get("children"):
-                    if child.get("id") == child_id:
-                        child["parentId"] = parent_id
-
-                    # Recursive update
-                    if child.get("children"):
-                        self._update_parent_id_in_children(
-                            child.get("children"), child_id, parent_id
-                        )
+        """Update parentId for a component and its copies nested in other components"""
+        self._components.set_parent(child_id, parent_id, nested=True)
 
     def _create_wrapped_add_child(
         self, component: MUIComponent
@@ -350,36 +346,32 @@ class MUIBuilder:
     def _update_existing_child(
         self, child_id: str, parent_id: str, child: MUIComponent
     ) -> bool:
-        """Update existing child in components list"""
-        for comp in self._components:
-            if comp.get("id") == child_id:
-                if "props" in comp and hasattr(child, "props"):
-                    # Preserve existing props
-                    pass
-                comp["parentId"] = parent_id
-                return True
-        return False
+        """Update existing child in components index"""
+        # Existing props are preserved, only the parent link changes
+        return self._components.set_parent(child_id, parent_id)
 
     def _add_new_child(self, child: MUIComponent, parent_id: str) -> None:
-        """Add new child to components list"""
+        """Add new child to components index"""
         child_dict = child.to_dict()
         child_dict["parentId"] = parent_id
-        self._components.append(child_dict)
+        self._components.add(child_dict)
 
     def _send_component_update(self, component_id: str) -> None:
         """Send component update event"""
-        for comp in self._components:
-            if comp.get("id") == component_id:
-                # Ensure props are preserved
-                if not comp.get("props") and hasattr(comp, "props"):
-                    comp["props"] = comp.props
+        comp = self._components.get(component_id)
+        if comp is None:
+            return
+        # Ensure props are preserved
+        if not comp.get("props") and hasattr(comp, "props"):
+            comp["props"] = comp.props
 
-                self.send_response_sync(comp)
-                # logger.debug(f"Component {comp['id']} with parent {comp.get('parentId']} sent to sequence")
-                break
+        self.send_response_sync(comp)
 
     def create_component(self, element: str, *args, **props) -> MUIComponent:
         """Create a Material UI component with the given properties and children"""
+        # Give up early when a newer event has superseded this rerun
+        event_base.checkpoint()
+
         # Process props and children
         processed_props = self._process_props(props)
         processed_children = self._process_args(args)
@@ -429,14 +421,7 @@ class MUIBuilder:
 
         # Update parent's children
         if current_parent_id and self._stack:
-            parent_info = next(
-                (
-                    item
-                    for item in self._component_sequence
-                    if item["component"] == self._stack[-1].name
-                ),
-                None,
-            )
+            parent_info = self._sequence_by_name.get(self._stack[-1].name)
             if parent_info:
                 if "children" not in parent_info:
                     parent_info["children"] = []
@@ -466,22 +451,125 @@ class MUIBuilder:
         component.add_child = self._create_wrapped_add_child(component)
 
         # Check for unupdated props before appending
-        if not [item for item in self._component_sequence if not item["props_updated"]]:
-            self._components.append(component_dict)
+        if not self._pending_count:
+            self._components.add(component_dict)
 
             self.send_response_sync(component_dict)
 
         return component
 
     def send_response_sync(self, component: dict) -> None:
-        event_base.send_response_sync(
-            {
-                "type": "component_update",
-                "payload": {
-                    "component": component,
-                },
-            }
-        )
+        for sink in self._recorders:
+            sink.append(dict(component))
+        self._mark_rendered(component)
+        if config.render.incremental:
+            # Skip components the browser already has in this exact form
+            fingerprint = self._fingerprint(component)
+            if self._rendered.get(component["id"]) == fingerprint:
+                return
+            self._rendered[component["id"]] = fingerprint
+            self._changed_ids.add(component["id"])
+        # event_base decides between a direct component_update and a batched send
+        event_base.send_component_update(component, session=self._session)
+
+    def _mark_rendered(self, component: dict) -> None:
+        """Record a sent component and the components embedded in it as rendered"""
+        # Components built while their parent was pending are only sent inside it
+        stack = [component]
+        while stack:
+            node = stack.pop()
+            self._rendered_ids.add(node["id"])
+            for child in node.get("children") or ():
+                if isinstance(child, dict) and "id" in child:
+                    stack.append(child)
+            for value in (node.get("props") or {}).values():
+                if isinstance(value, dict) and "id" in value and "module" in value:
+                    stack.append(value)
+
+    def finish_render(self) -> Optional[List[str]]:
+        """Close an incremental render; returns ids of components that were not re-rendered.
+
+        Returns None when incremental rendering is disabled. The removed ids are
+        dropped from the rendered tree.
+        """
+        for hook in list(self._finish_hooks.values()):
+            try:
+                hook(self._rendered_ids)
+            except Exception as e:
+                logger.error(f"Finish render hook failed: {e}")
+        if not config.render.incremental:
+            return None
+        removed = [component_id for component_id in self._rendered if component_id not in self._rendered_ids]
+        for component_id in removed:
+            del self._rendered[component_id]
+        return removed
+
+    def abort_render(self) -> None:
+        """Forget what an interrupted rerun rendered.
+
+        Its queued updates are discarded, and some may have been sent already,
+        so the components it changed are marked as unknown to the browser:
+        the next rerun re-sends them, or removes them if they are gone.
+        """
+        for component_id in self._changed_ids:
+            self._rendered[component_id] = None
+        self._changed_ids = set()
+        self._rendered_ids = set()
+
+    def on_finish_render(self, name: str, hook: Callable[[Set[str]], None]) -> None:
+        """Call hook with the ids of the components rendered, at the end of every rerun.
+
+        Registering again under the same name replaces the hook, so it is safe
+        to do from code that runs on every rerun.
+        """
+        self._finish_hooks[name] = hook
+
+    def memo(self, func=None, *, max_entries: Optional[int] = None):
+        """Decorator that caches and replays the subtree a function renders"""
+        from aiflow.flow.cache.render_cache import cache_render
+
+        return cache_render(func, max_entries=max_entries)
+
+    def _render_position(self):
+        """Counters and parent that determine the ids the next components get"""
+        parent_id = self._get_component_id(self._stack[-1]) if self._stack else None
+        return self._id_counter, self._order_counter, parent_id
+
+    def _start_recording(self) -> List[dict]:
+        sink: List[dict] = []
+        self._recorders.append(sink)
+        return sink
+
+    def _stop_recording(self, sink: List[dict]) -> None:
+        self._recorders.remove(sink)
+
+    def _replay_render(self, components: List[dict], roots: List[MUIComponent], end_position) -> None:
+        """Re-emit a recorded subtree as if its function had just run"""
+        parent = self._stack[-1] if self._stack else None
+        for root in roots:
+            root._parent = parent
+            if parent is not None and root not in parent.children:
+                parent.children.append(root)
+
+        time_stamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        for component in components:
+            replayed = dict(component)
+            if "time_stamp" in replayed:
+                replayed["time_stamp"] = time_stamp
+            self._components.add(replayed)
+            self.send_response_sync(replayed)
+        self._id_counter, self._order_counter = end_position
+
+    @staticmethod
+    def _fingerprint(component: dict) -> str:
+        content = {key: value for key, value in component.items() if key != "time_stamp"}
+        try:
+            # The message serializer is much faster than json on large props such as grid rows
+            encoded = serializer.dumps(content, sort_keys=True).encode()
+        except TypeError:
+            # Values only str() can represent
+            encoded = json.dumps(content, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
 
     def __getattr__(self, element: str):
         """Dynamic component factory method"""
@@ -492,20 +580,31 @@ class MUIBuilder:
             current_parent = (
                 None if not self._stack else self._get_component_id(self._stack[-1])
             )
-            self._component_sequence.append(
-                {
-                    "id": self._order_counter,
-                    "type": element,
-                    "component": component_name,
-                    "order": self._order_counter,
-                    "props_updated": False,
-                    "props": {},
-                    "parent_id": None if not self._stack else self._stack[-1].unique_id,
-                    "children": [],
-                }
-            )
+            item = {
+                "id": self._order_counter,
+                "type": element,
+                "component": component_name,
+                "order": self._order_counter,
+                "props_updated": False,
+                "props": {},
+                "parent_id": None if not self._stack else self._stack[-1].unique_id,
+                "children": [],
+            }
+            self._component_sequence.append(item)
+            self._pending_by_type.setdefault(element, deque()).append(item)
+            self._sequence_by_name.setdefault(component_name, item)
+            self._pending_count += 1
 
         def component_creator(*args, **props):
             return self.create_component(element, *args, **props)
 
         return component_creator
+
+
+class SessionBuilder:
+    """The module-level `mui`: forwards to the builder of the session being rendered"""
+
+    def __getattr__(self, name: str):
+        from aiflow.flow.events.session import current_session
+
+        return getattr(current_session().builder, name)
@@ -0,0 +1,66 @@
+"""permessage-deflate with a minimum message size, for both relay hops.
+
+RFC 7692 marks each message as compressed or not, but Tornado deflates every
+message once the extension is negotiated. The protocol here reads a
+"min_length" entry next to Tornado's own compression_options and sends shorter
+messages as plain frames. Only Tornado is imported, since ws_server.py runs
+this as a sibling module when it is started as a script.
+"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from tornado import httpclient
+from tornado.escape import utf8
+from tornado.iostream import StreamClosedError
+from tornado.websocket import WebSocketClientConnection, WebSocketClosedError, WebSocketProtocol13
+
+
+def compression_options(enabled: bool, level: int, min_length: int) -> Optional[Dict[str, Any]]:
+    """Tornado compression_options plus the size below which messages are sent uncompressed"""
+    if not enabled:
+        return None
+    return {"compression_level": level, "mem_level": 8, "min_length": min_length}
+
+
+class DeflateProtocol(WebSocketProtocol13):
+    """WebSocketProtocol13 that leaves messages under compression_options["min_length"] uncompressed"""
+
+    @property
+    def min_length(self) -> int:
+        return (self.params.compression_options or {}).get("min_length", 0)
+
+    def write_message(self, message, binary=False):
+        if isinstance(message, dict):
+            return super().write_message(message, binary)
+        # The threshold applies to the encoded bytes, not to the length of a str
+        data = utf8(message)
+        if len(data) >= self.min_length:
+            return super().write_message(data, binary)
+        # Framed as Tornado frames a message without the extension: no RSV1 flag
+        try:
+            future = self._write_frame(True, 0x2 if binary else 0x1, data)
+        except StreamClosedError:
+            raise WebSocketClosedError()
+        return asyncio.ensure_future(_closed_as_websocket_error(future))
+
+
+async def _closed_as_websocket_error(future) -> None:
+    try:
+        await future
+    except StreamClosedError:
+        raise WebSocketClosedError()
+
+
+class DeflateClientConnection(WebSocketClientConnection):
+    def get_websocket_protocol(self) -> DeflateProtocol:
+        return DeflateProtocol(self, mask_outgoing=True, params=self.params)
+
+
+def websocket_connect(url: str, connect_timeout: Optional[float] = None,
+                      compression_options: Optional[Dict[str, Any]] = None):
+    """tornado.websocket.websocket_connect for a connection that writes through DeflateProtocol"""
+    # The defaults websocket_connect fills in, so the handshake behaves the same
+    request = httpclient.HTTPRequest(url, connect_timeout=connect_timeout, request_timeout=connect_timeout,
+                                     follow_redirects=True, max_redirects=5, decompress_response=True,
+                                     validate_cert=True)
+    return DeflateClientConnection(request, compression_options=compression_options).connect_future
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import uuid
+
+from aiflow.flow.logger import setup_logger
+from aiflow.flow.config import config
+from aiflow.flow.network import ws_server
+from aiflow.flow.network.uploads import UploadReceiver, default_budget
+from aiflow.flow.network.ws_client import ChunkTracker, WebSocketClient
+
+logger = setup_logger('EmbeddedClient')
+
+
+def create_server() -> ws_server.WebSocketServer:
+    """The relay's Tornado app, configured from config instead of the launcher's environment"""
+    ws_server.DEFAULT_CONFIG['websocket']['max_connections'] = config.websocket.max_connections
+    ws_server.DEFAULT_CONFIG['compression'] = {
+        'enabled': config.websocket.compression,
+        'level': config.websocket.compression_level,
+        'threshold': config.websocket.compression_threshold,
+    }
+    return ws_server.WebSocketServer()
+
+
+class _Endpoint:
+    """Stands in for the Python client's socket handler in the server's ConnectionManager"""
+
+    ws_connection = None
+
+    def __init__(self, client: "EmbeddedClient"):
+        self._client = client
+
+    async def write_message(self, message, binary=False):
+        # Browser handlers await this, so their messages are handled in order as in relay mode
+        await self._client._handle_message(message)
+
+    def close(self):
+        pass
+
+
+class EmbeddedClient(WebSocketClient):
+    """WebSocket client for embedded mode, where the server runs in this process.
+
+    It registers with the server's ConnectionManager as a connection of its
+    own, so browsers pair with it as they do with the relay client. Outgoing
+    messages are written straight to the browser's handler, skipping the
+    loopback socket, and incoming ones are handed over without a frame in
+    between. Everything runs on the loop the server was started on.
+    """
+
+    def __new__(cls, server, loop):
+        return object.__new__(cls)
+
+    def __init__(self, server: ws_server.WebSocketServer, loop: asyncio.AbstractEventLoop):
+        self._server = server
+        self._loop = loop
+        self.client = None
+        self._running = True
+        self._send_lock = threading.Lock()
+        self._accepting = True
+        self._message_handlers = {}
+        budget = default_budget()
+        self.chunk_tracker = ChunkTracker(budget)
+        self.uploads = UploadReceiver(budget)
+        self._outbound = asyncio.Queue()
+        self._connected = asyncio.Event()
+        self._ready = asyncio.Event()
+        self.client_id = uuid.uuid4().hex
+        if not server.manager.add_client(self.client_id, _Endpoint(self)):
+            raise ConnectionError("Connection limit reached")
+        self._drain_task = asyncio.run_coroutine_threadsafe(self._drain_outbound(), loop)
+        self._sweep_task = asyncio.run_coroutine_threadsafe(self._sweep_reassembly(), loop)
+        loop.call_soon_threadsafe(self._connected.set)
+        loop.call_soon_threadsafe(self._ready.set)
+        logger.info(f"Embedded client {self.client_id} registered")
+
+    async def connect(self, force_reconnect=False):
+        pass
+
+    async def _write(self, target: str, body):
+        # No envelope: the body goes to the target's handler as the relay would forward it
+        await self._server.manager.broadcast(self.client_id, body, target)
+
+    async def close(self):
+        self._running = False
+        self._connected.clear()
+        self._ready.clear()
+        with self._send_lock:
+            self._accepting = False
+        # Cancelling the drain fails what it holds; what is still queued fails here
+        self._drain_task.cancel()
+        self._sweep_task.cancel()
+        await asyncio.sleep(0)
+        self._fail_queued()
+        if self.client_id:
+            self._server.manager.remove_client(self.client_id)
+            self.client_id = None
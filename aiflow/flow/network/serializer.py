@@ -0,0 +1,131 @@
+import datetime
+import decimal
+import json
+from typing import Any, Callable, Dict, Union
+
+from aiflow.flow.logger import setup_logger
+from aiflow.flow.config import config
+
+logger = setup_logger('Serializer')
+
+SERIALIZERS = ("auto", "orjson", "ujson", "json")
+
+
+def default(obj: Any) -> Any:
+    """Values the JSON libraries do not handle themselves: numpy, pandas, datetimes, decimals.
+
+    Every backend passes this as its default hook, and so does msgpack, so
+    all wire formats accept the same values.
+    """
+    if type(obj).__name__ in ("NaTType", "NAType"):
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    dtype = getattr(obj, "dtype", None)
+    if dtype is not None and dtype.kind == "M" and type(obj).__module__ == "numpy":
+        # numpy datetime64 scalars and arrays; tolist() would give nanoseconds since the epoch.
+        # As datetimes (None for NaT) they go out as the datetime module's ISO strings;
+        # pandas objects give Timestamps, which keep their time zone.
+        return obj.astype("datetime64[us]").tolist()
+    tolist = getattr(obj, "tolist", None)
+    if tolist is not None:
+        # numpy scalars and arrays, pandas Series and Index
+        return tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class _Backend:
+    def __init__(self, name: str, dumps: Callable[..., str], loads: Callable[[Union[str, bytes]], Any]):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _stdlib() -> _Backend:
+    def dumps(obj, sort_keys=False):
+        return json.dumps(obj, default=default, separators=(",", ":"), sort_keys=sort_keys)
+
+    return _Backend("json", dumps, json.loads)
+
+
+def _orjson() -> _Backend:
+    import orjson
+
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj, sort_keys=False):
+        option = options | orjson.OPT_SORT_KEYS if sort_keys else options
+        try:
+            return orjson.dumps(obj, default=default, option=option).decode()
+        except orjson.JSONEncodeError:
+            # numpy values orjson rejects without calling default, such as NaT datetime64
+            return json.dumps(obj, default=default, separators=(",", ":"), sort_keys=sort_keys)
+
+    def loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Python peers may send NaN/Infinity, which orjson rejects
+            return json.loads(data)
+
+    return _Backend("orjson", dumps, loads)
+
+
+def _ujson() -> _Backend:
+    import ujson
+
+    def dumps(obj, sort_keys=False):
+        try:
+            return ujson.dumps(obj, default=default, ensure_ascii=False, sort_keys=sort_keys)
+        except (OverflowError, TypeError, ValueError):
+            # NaN/Infinity and numpy values ujson cannot pass to default
+            return json.dumps(obj, default=default, sort_keys=sort_keys)
+
+    def loads(data):
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    return _Backend("ujson", dumps, loads)
+
+
+_LOADERS = {"orjson": _orjson, "ujson": _ujson, "json": _stdlib}
+_backends: Dict[str, _Backend] = {}
+
+
+def _load(name: str) -> _Backend:
+    candidates = ("orjson", "ujson", "json") if name == "auto" else (name, "json")
+    for candidate in candidates:
+        try:
+            return _LOADERS[candidate]()
+        except ImportError:
+            if name != "auto":
+                logger.warning(f"websocket.serializer is '{name}' but it is not installed, using json")
+        except KeyError:
+            logger.warning(f"Unknown websocket.serializer '{name}', expected one of {', '.join(SERIALIZERS)}")
+    return _stdlib()
+
+
+def backend() -> _Backend:
+    """The serializer selected by websocket.serializer, loaded on first use"""
+    name = config.websocket.serializer
+    selected = _backends.get(name)
+    if selected is None:
+        selected = _backends[name] = _load(name)
+        logger.debug(f"Serializing messages with {selected.name}")
+    return selected
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    return backend().dumps(obj, sort_keys=sort_keys)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return backend().loads(data)
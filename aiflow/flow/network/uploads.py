@@ -0,0 +1,376 @@
+import io
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from aiflow.flow.logger import setup_logger
+from aiflow.flow.config import config
+from aiflow.flow.events.scheduler import checkpoint
+
+logger = setup_logger('Uploads')
+
+HEADER_LENGTH_BYTES = 4
+
+
+def parse_upload_frame(frame: bytes) -> Tuple[dict, memoryview]:
+    """Split a binary upload frame into its JSON header and a view of the data.
+
+    Frame layout: 4-byte big-endian header length, UTF-8 JSON header, raw bytes.
+    """
+    view = memoryview(frame)
+    header_length = int.from_bytes(view[:HEADER_LENGTH_BYTES], 'big')
+    header_end = HEADER_LENGTH_BYTES + header_length
+    header = json.loads(bytes(view[HEADER_LENGTH_BYTES:header_end]))
+    return header, view[header_end:]
+
+
+class ByteBudget:
+    """In-flight reassembly bytes, limited globally and per sender"""
+
+    def __init__(self, max_bytes: Optional[int] = None, max_bytes_per_sender: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_bytes_per_sender = max_bytes_per_sender
+        self.in_flight = 0
+        self.by_sender: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, sender_id: Optional[str], size: int) -> bool:
+        with self._lock:
+            sender_bytes = self.by_sender.get(sender_id, 0)
+            if self.max_bytes_per_sender is not None and sender_bytes + size > self.max_bytes_per_sender:
+                return False
+            if self.max_bytes is not None and self.in_flight + size > self.max_bytes:
+                return False
+            self.in_flight += size
+            self.by_sender[sender_id] = sender_bytes + size
+            return True
+
+    def release(self, sender_id: Optional[str], size: int) -> None:
+        with self._lock:
+            self.in_flight -= size
+            remaining = self.by_sender.get(sender_id, 0) - size
+            if remaining > 0:
+                self.by_sender[sender_id] = remaining
+            else:
+                self.by_sender.pop(sender_id, None)
+
+    def over_sender_quota(self, sender_id: Optional[str], size: int) -> bool:
+        return self.max_bytes_per_sender is not None and size > self.max_bytes_per_sender - self.by_sender.get(sender_id, 0)
+
+
+def default_budget() -> ByteBudget:
+    return ByteBudget(config.websocket.reassembly_max_bytes, config.websocket.reassembly_max_bytes_per_sender)
+
+
+class UploadFailed(IOError):
+    """The upload was abandoned before all of its bytes arrived"""
+
+
+class FileUpload:
+    """An uploaded file, stored as it arrives in a preallocated bytearray or a temp file.
+
+    Files above websocket.upload_spool_size go to disk. open() and iter_chunks()
+    stream the contents while the upload is still arriving; memoryview(),
+    read() and path wait for it to complete.
+    """
+
+    def __init__(self, upload_id: str, name: str, mime: str, size: int, key: Optional[str] = None):
+        self.upload_id = upload_id
+        self.name = name
+        self.mime = mime
+        self.size = size
+        self.key = key
+        self.received = 0
+        # Length of the prefix that has fully arrived; chunks past a gap wait in _pending
+        self.available = 0
+        self._pending: Dict[int, int] = {}
+        self._error: Optional[str] = None
+        self._progress = threading.Condition()
+        self._last_progress = time.monotonic()
+        self.path: Optional[str] = None
+        self._buffer: Optional[bytearray] = None
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        if size > config.websocket.upload_spool_size:
+            fd, self.path = tempfile.mkstemp(prefix="aiflow-upload-", suffix=os.path.splitext(name)[1])
+            self._file = os.fdopen(fd, "w+b")
+            self._file.truncate(size)
+            self._finalizer = weakref.finalize(self, _remove_spool, self._file, self.path)
+        else:
+            self._buffer = bytearray(size)
+
+    @property
+    def complete(self) -> bool:
+        return self.available >= self.size
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def write(self, offset: int, data: memoryview) -> None:
+        end = offset + len(data)
+        if offset < 0 or end > self.size:
+            raise ValueError(f"Chunk {offset}:{end} is outside upload {self.upload_id} of {self.size} bytes")
+        if self._buffer is not None:
+            self._buffer[offset:end] = data
+        else:
+            with self._file_lock:
+                self._file.seek(offset)
+                self._file.write(data)
+                self._file.flush()
+        with self._progress:
+            # Chunks sent again are keyed by where their new bytes start, so a repeat
+            # of one already received is dropped rather than kept in _pending
+            start = max(offset, self.available)
+            previous_end = self._pending.get(start, start)
+            if end <= previous_end:
+                return
+            self.received += end - previous_end
+            self._pending[start] = end
+            while self.available in self._pending:
+                self.available = self._pending.pop(self.available)
+            if self._pending:
+                # Repeats that overlapped a chunk keyed elsewhere are covered once the prefix passes them
+                for covered in [key for key, key_end in self._pending.items() if key_end <= self.available]:
+                    del self._pending[covered]
+            self._last_progress = time.monotonic()
+            self._progress.notify_all()
+
+    def fail(self, reason: str) -> None:
+        """Abandon the upload; blocked readers raise UploadFailed"""
+        with self._progress:
+            self._error = reason
+            self._progress.notify_all()
+
+    def wait(self, end: Optional[int] = None) -> None:
+        """Block until the first `end` bytes (default: all of them) have arrived.
+
+        Waiting checks for superseding events, so a newer rerun interrupts a
+        script blocked on a slow upload. Raises UploadFailed if the upload is
+        abandoned or makes no progress for websocket.upload_stall_timeout seconds.
+        """
+        end = self.size if end is None else min(end, self.size)
+        with self._progress:
+            while self.available < end:
+                if self._error is not None:
+                    raise UploadFailed(f"Upload {self.name} failed: {self._error}")
+                if time.monotonic() - self._last_progress > config.websocket.upload_stall_timeout:
+                    raise UploadFailed(f"Upload {self.name} stalled at {self.available}/{self.size} bytes")
+                self._progress.wait(0.1)
+                checkpoint()
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Yield the contents in order as it arrives"""
+        reader = _UploadReader(self)
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def memoryview(self) -> memoryview:
+        """Zero-copy view of the file contents; file-backed uploads are memory-mapped"""
+        self.wait()
+        if self._buffer is not None:
+            return memoryview(self._buffer)
+        if self._map is None:
+            self._map = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_READ) if self.size else b""
+        return memoryview(self._map)
+
+    def open(self) -> io.BufferedReader:
+        """File-like reader that blocks for bytes still in flight, e.g. for pd.read_csv(upload.open(), chunksize=...)"""
+        return io.BufferedReader(_UploadReader(self))
+
+    def read(self) -> bytes:
+        return bytes(self.memoryview())
+
+    def _read_into(self, position: int, target: memoryview) -> int:
+        self.wait(position + 1)
+        count = min(len(target), self.available - position)
+        if count <= 0:
+            return 0
+        if self._buffer is not None:
+            target[:count] = memoryview(self._buffer)[position:position + count]
+            return count
+        with self._file_lock:
+            self._file.seek(position)
+            return self._file.readinto(target[:count])
+
+    def hand_over(self) -> None:
+        """Pass ownership of a spooled file to the process a pickled copy was sent to, e.g. a worker.
+
+        The receiving copy removes the file when it is collected; this one no
+        longer does. Pickling alone leaves ownership here, so copies made for
+        other reasons cannot leak the file.
+        """
+        if self._file is not None:
+            self._file.flush()
+            self._finalizer.detach()
+
+    def __getstate__(self):
+        # The receiving process reopens a spooled file by path; hand_over() decides who removes it
+        return {
+            key: value for key, value in self.__dict__.items()
+            if key not in ("_file", "_file_lock", "_map", "_finalizer", "_progress")
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._map = None
+        if self.path is not None:
+            self._file = open(self.path, "r+b")
+            self._finalizer = weakref.finalize(self, _remove_spool, self._file, self.path)
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"FileUpload(name={self.name!r}, size={self.size}, received={self.received})"
+
+
+def _remove_spool(file, path: str) -> None:
+    try:
+        file.close()
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _UploadReader(io.RawIOBase):
+    def __init__(self, upload: FileUpload):
+        self._upload = upload
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._upload._read_into(self._position, memoryview(buffer).cast('B'))
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._upload.size
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+class UploadReceiver:
+    """Tracks uploads in progress and writes binary frames into them.
+
+    Uploads held in memory count against the byte budget until they complete;
+    spooled uploads only use disk. sweep() aborts uploads that stopped sending.
+    """
+
+    def __init__(self, budget: Optional[ByteBudget] = None):
+        self.budget = budget or default_budget()
+        self._uploads: Dict[str, Tuple[FileUpload, Optional[str], int]] = {}
+        # Later frames of a rejected, completed or aborted upload are dropped without starting it again
+        self._rejected_ids: Deque[str] = deque(maxlen=64)
+        self._finished_ids: Deque[str] = deque(maxlen=64)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def receive(self, frame: bytes) -> Optional[Tuple[FileUpload, dict, bool]]:
+        """Write a frame into its upload; returns the upload, the header and whether it just started.
+
+        Raises UploadFailed for the first frame of an upload that is rejected, and
+        returns None for the frames of a rejected or finished upload that follow.
+        """
+        header, data = parse_upload_frame(frame)
+        upload_id = header["uploadId"]
+        with self._lock:
+            entry = self._uploads.get(upload_id)
+            if entry is None and (upload_id in self._rejected_ids or upload_id in self._finished_ids):
+                return None
+            started = entry is None
+            if started:
+                sender_id, size = header.get("sender_id"), int(header["size"])
+                if not 0 <= size <= config.websocket.upload_max_size:
+                    # The size comes from the browser, so it is checked before the buffer or spool file is sized to it
+                    self._rejected_ids.append(upload_id)
+                    self.rejected += 1
+                    raise UploadFailed(f"Upload {header.get('name', '')} of {size} bytes exceeds websocket.upload_max_size")
+                upload = FileUpload(upload_id, header.get("name", ""), header.get("mime", ""), size, header.get("key"))
+                reserved = 0 if upload.path is not None else size
+                if reserved and not self.budget.reserve(sender_id, reserved):
+                    self._rejected_ids.append(upload_id)
+                    self.rejected += 1
+                    raise UploadFailed(f"Upload {upload.name} of {size} bytes exceeds the reassembly budget")
+                entry = self._uploads[upload_id] = (upload, sender_id, reserved)
+        upload = entry[0]
+        try:
+            upload.write(int(header.get("offset", 0)), data)
+        except ValueError as e:
+            self.abort(upload_id, str(e))
+            raise
+        if upload.complete:
+            self._finish(upload_id)
+            self.completed += 1
+            logger.info(f"Upload {upload.name} complete, {upload.size} bytes")
+        return upload, header, started
+
+    def abort(self, upload_id: str, reason: str) -> None:
+        upload = self._finish(upload_id)
+        if upload is not None:
+            upload.fail(reason)
+
+    def sweep(self, max_age: float) -> int:
+        """Abort uploads that have not received a chunk for max_age seconds"""
+        cutoff = time.monotonic() - max_age
+        with self._lock:
+            stale = [upload_id for upload_id, (upload, _, _) in self._uploads.items() if upload._last_progress < cutoff]
+        for upload_id in stale:
+            logger.warning(f"Abandoning stalled upload {upload_id}")
+            self.abort(upload_id, "no data received")
+            self.evicted += 1
+        return len(stale)
+
+    def _finish(self, upload_id: str) -> Optional[FileUpload]:
+        with self._lock:
+            entry = self._uploads.pop(upload_id, None)
+            if entry is None:
+                return None
+            self._finished_ids.append(upload_id)
+        upload, sender_id, reserved = entry
+        if reserved:
+            self.budget.release(sender_id, reserved)
+        return upload
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            uploads = [upload for upload, _, _ in self._uploads.values()]
+        return {
+            "in_flight_uploads": len(uploads),
+            "in_flight_upload_bytes": sum(upload.received for upload in uploads),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
+
+    def __len__(self):
+        return len(self._uploads)
@@ -0,0 +1,165 @@
+from typing import Any, Dict, List, Optional
+
+from aiflow.flow.logger import setup_logger
+from aiflow.flow.config import config
+from aiflow.flow.network import serializer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = setup_logger('Wire')
+
+# Version 1 sends component dicts as they are; version 2 is the compact encoding below
+PROTOCOL_VERSION = 2
+
+# Positions in an encoded node; trailing empty fields are dropped
+TYPE, ID, MODULE, PROPS, PARENT, CONTENT, TIME_STAMP, CHILDREN, EXTRA = range(9)
+_KNOWN_KEYS = {"type", "id", "module", "props", "parentId", "content", "time_stamp", "children"}
+
+_msgpack_warned = False
+
+
+class _Encoder:
+    """Encodes the components of one message against a shared string table.
+
+    Types, modules, prop keys and parent ids are interned; nested children
+    whose parent is their container leave it out, and a parent sent earlier in
+    the same message is referenced by its index in the node list. An empty
+    list stands for no parent.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.nodes: List[list] = []
+        self._index: Dict[str, int] = {}
+        self._positions: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def node(self, component: Dict[str, Any], container_id: Optional[str] = None) -> list:
+        component_type = component.get("type")
+        component_id = component.get("id")
+        # "<type>_<n>" ids go out as n
+        encoded_id = component_id
+        prefix = f"{component_type}_"
+        if isinstance(component_id, str) and component_id.startswith(prefix):
+            suffix = component_id[len(prefix):]
+            if suffix.isdigit() and str(int(suffix)) == suffix:
+                encoded_id = int(suffix)
+
+        props = component.get("props")
+        encoded_props = None
+        if props is not None:
+            encoded_props = []
+            for key, value in props.items():
+                encoded_props.append(self.intern(key))
+                encoded_props.append(value)
+
+        parent_id = component.get("parentId")
+        if container_id is not None and parent_id == container_id:
+            parent_id = None
+        elif parent_id is not None:
+            position = self._positions.get(parent_id)
+            # Strings name parents outside the message, so they are interned ids wrapped in a list
+            parent_id = position if position is not None else [self.intern(parent_id)]
+        elif container_id is not None:
+            # A nested child without a parent, which would otherwise decode as the container's
+            parent_id = []
+
+        children = component.get("children")
+        encoded_children = [self.node(child, component_id) for child in children] if children is not None else None
+        extra = {key: value for key, value in component.items() if key not in _KNOWN_KEYS} or None
+
+        node = [
+            self.intern(component_type),
+            encoded_id,
+            self.intern(component["module"]) if component.get("module") is not None else None,
+            encoded_props,
+            parent_id,
+            component.get("content"),
+            component.get("time_stamp"),
+            encoded_children,
+            extra,
+        ]
+        while node and node[-1] is None:
+            node.pop()
+        return node
+
+    def add(self, component: Dict[str, Any]) -> None:
+        self.nodes.append(self.node(component))
+        # Only top-level nodes can be referenced by position
+        self._positions[component.get("id")] = len(self.nodes) - 1
+
+
+def encode_components(components: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compact payload for a list of component dicts: {"v", "strings", "nodes"}"""
+    encoder = _Encoder()
+    for component in components:
+        encoder.add(component)
+    return {"v": PROTOCOL_VERSION, "strings": encoder.strings, "nodes": encoder.nodes}
+
+
+def decode_components(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of encode_components, mirroring the browser's decoder"""
+    strings = payload["strings"]
+    decoded: List[Dict[str, Any]] = []
+
+    def node(encoded: list, parent_id: Optional[str]) -> Dict[str, Any]:
+        encoded = encoded + [None] * (EXTRA + 1 - len(encoded))
+        component_type = strings[encoded[TYPE]]
+        component_id = encoded[ID]
+        if isinstance(component_id, int):
+            component_id = f"{component_type}_{component_id}"
+        component: Dict[str, Any] = {"type": component_type, "id": component_id}
+        if encoded[MODULE] is not None:
+            component["module"] = strings[encoded[MODULE]]
+        props = encoded[PROPS]
+        if props is not None:
+            component["props"] = {strings[props[i]]: props[i + 1] for i in range(0, len(props), 2)}
+        parent = encoded[PARENT]
+        if isinstance(parent, int):
+            parent_id = decoded[parent]["id"]
+        elif isinstance(parent, list):
+            parent_id = strings[parent[0]] if parent else None
+        component["parentId"] = parent_id
+        if encoded[CONTENT] is not None:
+            component["content"] = encoded[CONTENT]
+        if encoded[TIME_STAMP] is not None:
+            component["time_stamp"] = encoded[TIME_STAMP]
+        if encoded[CHILDREN] is not None:
+            component["children"] = [node(child, component_id) for child in encoded[CHILDREN]]
+        if encoded[EXTRA]:
+            component.update(encoded[EXTRA])
+        return component
+
+    for encoded in payload["nodes"]:
+        decoded.append(node(encoded, None))
+    return decoded
+
+
+def compact_enabled() -> bool:
+    return config.render.wire_format in ("compact", "msgpack")
+
+
+def msgpack_enabled() -> bool:
+    """Whether component messages go out as msgpack binary frames"""
+    global _msgpack_warned
+    if config.render.wire_format != "msgpack":
+        return False
+    if msgpack is None:
+        if not _msgpack_warned:
+            logger.warning("render.wire_format is 'msgpack' but msgpack is not installed, sending compact JSON")
+            _msgpack_warned = True
+        return False
+    return True
+
+
+def pack(payload: Dict[str, Any]) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True, default=serializer.default)
@@ -1,68 +1,202 @@
-import json
 import asyncio
+import concurrent.futures
 import threading
 import time
+import uuid
+from collections import OrderedDict, deque
 from typing import Optional
-from tornado.websocket import websocket_connect, WebSocketClosedError
+from tornado.websocket import WebSocketClosedError
 from aiflow.flow.logger import setup_logger
 from aiflow.flow.config import config
 from aiflow.flow.events import event_base
+from aiflow.flow.network import serializer, wire
+from aiflow.flow.network.deflate import compression_options, websocket_connect
+from aiflow.flow.network.uploads import UploadReceiver, default_budget
 
 logger = setup_logger('WebSocketClient')
 
+MAX_CHUNKS = 100_000
+
+class PartialMessage:
+    """Chunks of one chunked_message, stored by chunk index"""
+
+    __slots__ = ("template", "parts", "received", "size", "sender_id", "started", "last_activity")
+
+    def __init__(self, total_chunks, sender_id):
+        self.template = None
+        self.parts = [None] * total_chunks
+        self.received = 0
+        self.size = 0
+        self.sender_id = sender_id
+        self.started = self.last_activity = time.monotonic()
+
 class ChunkTracker:
-    def __init__(self):
-        self.chunks = {}  # { message_id: { total_chunks, received_chunks, data, sender_id } }
+    """Reassembles chunked messages within a global byte budget and a per-sender quota.
+
+    Partial messages are kept in least-recently-active order. When the budget is
+    full the stalest ones are evicted to make room, and cleanup_old_chunks(),
+    run periodically by the client, drops messages that stopped receiving chunks.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or default_budget()
+        self.chunks = OrderedDict()  # { message_id: PartialMessage }, least recently active first
         self._cleanup_lock = threading.Lock()
-        self._last_activity = {}  # Track last activity for each chunked message
+        self.completed = 0
+        self.evicted = 0
+        self.rejected = 0
 
     def add_chunk(self, message_id, chunk_index, total_chunks, chunk_data, sender_id):
+        if not (self._is_index(chunk_index) and self._is_index(total_chunks)):
+            logger.error(f"Rejecting chunk of {message_id}: chunk index and count must be integers")
+            self.rejected += 1
+            return False
+        data = self._chunk_data(chunk_data)
+        if data is None:
+            # Only file uploads are reassembled, so nothing else may hold budget
+            logger.error(f"Rejecting chunk of {message_id}: only file-change messages are sent in chunks")
+            self.rejected += 1
+            return False
+        size = len(data)
         with self._cleanup_lock:
-            if message_id not in self.chunks:
+            message = self.chunks.get(message_id)
+            if message is None:
+                if not 0 < total_chunks <= MAX_CHUNKS:
+                    logger.error(f"Rejecting chunked message {message_id} with {total_chunks} chunks")
+                    self.rejected += 1
+                    return False
                 logger.info(f"Starting new chunked message with ID {message_id}, expecting {total_chunks} chunks")
-                self.chunks[message_id] = {'total_chunks': total_chunks,'received_chunks': {},'data': {},'sender_id': sender_id,'timestamp': time.time()}
-            self.chunks[message_id]['received_chunks'][chunk_index] = True
-            self.chunks[message_id]['data'][chunk_index] = chunk_data
-            self._last_activity[message_id] = time.time()
-            return self.is_complete(message_id)
-    
+                message = self.chunks[message_id] = PartialMessage(total_chunks, sender_id)
+            if not 0 <= chunk_index < len(message.parts) or message.parts[chunk_index] is not None:
+                return self._is_complete(message)
+            if not self._reserve(message_id, message.sender_id, size):
+                logger.error(f"Dropping chunked message {message_id}: over the reassembly budget")
+                self._drop(message_id)
+                self.rejected += 1
+                return False
+            if message.template is None:
+                message.template = chunk_data
+            message.parts[chunk_index] = data
+            message.received += 1
+            message.size += size
+            message.last_activity = time.monotonic()
+            self.chunks.move_to_end(message_id)
+            return self._is_complete(message)
+
     def is_complete(self, message_id):
-        if message_id not in self.chunks: 
-            return False
-        message_data = self.chunks[message_id]
-        return len(message_data['received_chunks']) == message_data['total_chunks']
-    
+        message = self.chunks.get(message_id)
+        return message is not None and self._is_complete(message)
+
+    @staticmethod
+    def _is_complete(message):
+        return message.received == len(message.parts)
+
     def get_complete_message(self, message_id):
-        if not self.is_complete(message_id): 
-            return None, None
-        message_data = self.chunks[message_id]
-        sorted_chunks = [message_data['data'][i] for i in range(message_data['total_chunks'])]
-        first_chunk = sorted_chunks[0]
-        if (first_chunk.get('payload').get('type') == 'file-change' and first_chunk.get('payload').get('fileEvent')):
-            combined_base64 = "".join(chunk['payload']['fileEvent']['data'] for chunk in sorted_chunks)
-            # Use a shallow copy instead of json reserialization to avoid evaluation errors
-            complete_message = first_chunk.copy()
-            complete_message['payload']['fileEvent']['data'] = combined_base64
-            with self._cleanup_lock:
-                sender_id = message_data['sender_id']
-                del self.chunks[message_id]
-                if message_id in self._last_activity:
-                    del self._last_activity[message_id]
-            return complete_message, sender_id
+        with self._cleanup_lock:
+            message = self.chunks.get(message_id)
+            if message is None or not self._is_complete(message):
+                return None, None
+            self._drop(message_id)
+        self.completed += 1
+        template = message.template
+        payload = template.get('payload') or {}
+        if payload.get('type') == 'file-change' and payload.get('fileEvent'):
+            # Shallow copies instead of json reserialization to avoid evaluation errors
+            complete_message = dict(template, payload=dict(payload, fileEvent=dict(payload['fileEvent'])))
+            complete_message['payload']['fileEvent']['data'] = "".join(message.parts)
+            return complete_message, message.sender_id
         return None, None
-    
+
     def cleanup_old_chunks(self, max_age_seconds=300):
+        """Drop partial messages that have not received a chunk for max_age_seconds"""
+        cutoff = time.monotonic() - max_age_seconds
+        removed = 0
+        with self._cleanup_lock:
+            while self.chunks:
+                message_id, message = next(iter(self.chunks.items()))
+                if message.last_activity > cutoff:
+                    break
+                logger.warning(f"Removing stale chunked message {message_id}: received {message.received}/{len(message.parts)} chunks")
+                self._drop(message_id)
+                removed += 1
+        self.evicted += removed
+        return removed
+
+    def metrics(self):
         with self._cleanup_lock:
-            current_time = time.time()
-            message_ids = list(self.chunks.keys())
-            for message_id in message_ids:
-                chunk_data = self.chunks[message_id]
-                last_activity = self._last_activity.get(message_id, chunk_data['timestamp'])
-                if current_time - last_activity > max_age_seconds:
-                    logger.warning(f"Removing stale chunked message {message_id}: received {len(chunk_data['received_chunks'])}/{chunk_data['total_chunks']} chunks")
-                    del self.chunks[message_id]
-                    if message_id in self._last_activity:
-                        del self._last_activity[message_id]
+            return {
+                "in_flight_messages": len(self.chunks),
+                "in_flight_bytes": self.budget.in_flight,
+                "in_flight_bytes_by_sender": dict(self.budget.by_sender),
+                "completed": self.completed,
+                "evicted": self.evicted,
+                "rejected": self.rejected,
+            }
+
+    def _reserve(self, message_id, sender_id, size):
+        """Reserve bytes for a chunk, evicting the stalest other messages if the global budget is full"""
+        if self.budget.over_sender_quota(sender_id, size):
+            return False
+        while not self.budget.reserve(sender_id, size):
+            victim = next((other for other in self.chunks if other != message_id), None)
+            if victim is None:
+                return False
+            logger.warning(f"Evicting chunked message {victim} to stay within the reassembly budget")
+            self._drop(victim)
+            self.evicted += 1
+        return True
+
+    def _drop(self, message_id):
+        message = self.chunks.pop(message_id, None)
+        if message is not None and message.size:
+            self.budget.release(message.sender_id, message.size)
+
+    @staticmethod
+    def _is_index(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    @staticmethod
+    def _chunk_data(chunk):
+        """The part of a chunk that differs between chunks: the base64 slice of a file upload.
+
+        None for anything else, which get_complete_message() would discard.
+        """
+        payload = chunk.get('payload') if isinstance(chunk, dict) else None
+        if not isinstance(payload, dict) or payload.get('type') != 'file-change':
+            return None
+        file_event = payload.get('fileEvent')
+        if isinstance(file_event, dict) and isinstance(file_event.get('data'), str):
+            return file_event['data']
+        return None
+
+class OutboundStream:
+    """A large message going out as a series of chunked_message frames"""
+
+    def __init__(self, target, body, future=None):
+        self.target = target
+        self.body = body
+        self.future = future
+        self.message_id = uuid.uuid4().hex
+        self.chunk_size = config.websocket.chunk_size
+        self.total_chunks = -(-len(body) // self.chunk_size)
+        self.index = 0
+
+    @property
+    def done(self):
+        return self.index >= self.total_chunks
+
+    def next_chunk(self):
+        start = self.index * self.chunk_size
+        chunk = {
+            "type": "chunked_message",
+            "client_id": self.target,
+            "messageId": self.message_id,
+            "chunkIndex": self.index,
+            "totalChunks": self.total_chunks,
+            "data": self.body[start:start + self.chunk_size],
+        }
+        self.index += 1
+        return serializer.dumps(chunk)
 
 class WebSocketClient:
     _instance = None
@@ -81,8 +215,14 @@ class WebSocketClient:
         self._connected = asyncio.Event()
         self._ready = asyncio.Event()
         self._running = True
+        # Guards scheduling onto the loop against its shutdown, so no message is left unresolved
+        self._send_lock = threading.Lock()
+        self._accepting = True
         self._message_handlers = {}
-        self.chunk_tracker = ChunkTracker()  # New instance of ChunkTracker
+        # JSON chunks and binary uploads draw on one reassembly budget
+        budget = default_budget()
+        self.chunk_tracker = ChunkTracker(budget)
+        self.uploads = UploadReceiver(budget)
         self._init_thread = threading.Thread(target=self._start_asyncio_loop, name="Client", daemon=True)
         self._init_thread.start()
         
@@ -96,8 +236,13 @@ class WebSocketClient:
 
     def _start_asyncio_loop(self):
         loop = asyncio.new_event_loop()
-        self._loop = loop  # store reference to the loop for shutdown control
         asyncio.set_event_loop(loop)
+        self._connect_lock = asyncio.Lock()
+        # Outbound queue drained by this loop; sync callers only enqueue into it
+        self._outbound = asyncio.Queue()
+        self._drain_task = loop.create_task(self._drain_outbound())
+        self._sweep_task = loop.create_task(self._sweep_reassembly())
+        self._loop = loop  # store reference to the loop for shutdown control
         try:
             loop.run_until_complete(self.connect())
             loop.run_until_complete(self._run_event_loop())
@@ -105,7 +250,31 @@ class WebSocketClient:
             # logger.error(f"WebSocket client loop failed: {e}")
             pass
         finally:
-            loop.close()
+            self._running = False
+            try:
+                loop.run_until_complete(self._fail_pending())
+            finally:
+                loop.close()
+
+    async def _fail_pending(self):
+        """Fail every message still queued or streaming once the loop shuts down"""
+        with self._send_lock:
+            self._accepting = False
+        # Run the enqueue callbacks scheduled before sends were refused
+        await asyncio.sleep(0)
+        self._drain_task.cancel()
+        try:
+            await self._drain_task
+        except BaseException:
+            pass
+        self._fail_queued()
+
+    def _fail_queued(self):
+        error = ConnectionError("WebSocket client loop stopped")
+        while not self._outbound.empty():
+            _, _, future = self._outbound.get_nowait()
+            if not future.done():
+                future.set_exception(error)
 
     async def _run_event_loop(self):
         while self._running:
@@ -117,20 +286,108 @@ class WebSocketClient:
                     await asyncio.sleep(2)  # Prevent rapid reconnection attempts
             await asyncio.sleep(1)
 
+    async def _drain_outbound(self):
+        # Large messages go out a chunk at a time, round-robin, so one browser's
+        # stream does not hold up the others. A target's later messages wait behind
+        # its stream: the browser must not see stream_end or a newer update first.
+        streams = deque()
+        held = {}  # { target: deque of queued items }, for targets with a stream in flight
+        try:
+            await self._drain_streams(streams, held)
+        finally:
+            error = ConnectionError("WebSocket client loop stopped")
+            pending = [stream.future for stream in streams]
+            pending += [future for queued in held.values() for _, _, future in queued]
+            for future in pending:
+                if not future.done():
+                    future.set_exception(error)
+
+    async def _drain_streams(self, streams, held):
+        while self._running:
+            if not streams:
+                await self._send_queued(await self._outbound.get(), streams, held)
+                continue
+            while not self._outbound.empty():
+                await self._send_queued(self._outbound.get_nowait(), streams, held)
+            stream = streams[0]
+            try:
+                # Awaiting each write keeps at most one chunk in Tornado's write buffer
+                await self._write(stream.target, stream.next_chunk())
+            except Exception as e:
+                streams.popleft()
+                if not stream.future.done():
+                    stream.future.set_exception(e)
+                await self._release_held(stream.target, streams, held)
+                continue
+            if stream.done:
+                streams.popleft()
+                if not stream.future.done():
+                    stream.future.set_result(True)
+                await self._release_held(stream.target, streams, held)
+            else:
+                streams.rotate(-1)
+
+    async def _send_queued(self, item, streams, held):
+        body, target, future = item
+        if target in held:
+            held[target].append(item)
+            return
+        try:
+            if self._should_chunk(body):
+                streams.append(OutboundStream(target, body, future))
+                held[target] = deque()
+                return
+            await self._write(target, body)
+        except Exception as e:
+            # Logged by the sender, which holds the future
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(True)
+
+    async def _release_held(self, target, streams, held):
+        """Send what a target queued behind its finished stream, up to its next large message"""
+        queued = held.pop(target, None)
+        while queued:
+            await self._send_queued(queued.popleft(), streams, held)
+            if target in held:
+                # Another stream started; the rest wait behind it
+                held[target].extend(queued)
+                return
+
+    async def _sweep_reassembly(self):
+        """Periodically drop partial messages and uploads that stopped receiving data"""
+        while self._running:
+            await asyncio.sleep(config.websocket.reassembly_sweep_interval)
+            try:
+                self.chunk_tracker.cleanup_old_chunks(config.websocket.reassembly_max_age)
+                self.uploads.sweep(config.websocket.reassembly_max_age)
+            except Exception as e:
+                logger.error(f"Reassembly sweep failed: {e}")
+
+    def reassembly_metrics(self):
+        """In-flight bytes and counters of chunked messages and binary uploads"""
+        return {"chunks": self.chunk_tracker.metrics(), "uploads": self.uploads.metrics()}
+
     def register_handler(self, message_type: str, callback):
         self._message_handlers[message_type] = callback
 
     async def _handle_message(self, message):
         try:
+            if isinstance(message, bytes):
+                await self._handle_upload_frame(message)
+                return
             if isinstance(message, str):
-                message = json.loads(message)
+                message = serializer.loads(message)
             if message.get('type') == 'chunked_message':
                 message_id = message.get('messageId')
                 # Ensure chunk_index, total_chunks, and payload are present
                 chunk_index = message.get('chunkIndex')
                 total_chunks = message.get('totalChunks')
                 payload = message.get('payload')
-                sender_id = message.get('client_id')  # Assume sender identity is passed in the message
+                # The browser's id is inside the wrapped message; client_id is the target
+                sender_id = (payload.get('sender_id') if isinstance(payload, dict) else None) or message.get('client_id')
                 if message_id and chunk_index is not None and total_chunks and payload:
                     is_complete = self.chunk_tracker.add_chunk(message_id, chunk_index, total_chunks, payload, sender_id)
                     if is_complete:
@@ -144,10 +401,39 @@ class WebSocketClient:
         except Exception as e:
             logger.error(f"Error processing message: {e}")
 
+    async def _handle_upload_frame(self, frame):
+        """Write a binary upload chunk and fire the file event.
+
+        With websocket.stream_uploads the event fires on the first chunk so the
+        script can read the upload while it arrives; otherwise once it is complete.
+        Worker processes receive a copy of the upload, so they always get it complete.
+        """
+        received = self.uploads.receive(frame)
+        if received is None:
+            # Rejected uploads were logged on their first frame; finished ones already fired their event
+            return
+        upload, header, started = received
+        streaming = config.websocket.stream_uploads and config.execution.workers == 0
+        if not (started and streaming) and not (upload.complete and not streaming):
+            return
+        await event_base.handle_message({
+            "type": "events",
+            "sender_id": header.get("sender_id"),
+            "client_id": header.get("client_id"),
+            "payload": {
+                "key": upload.key,
+                "type": "file-change",
+                "value": None,
+                "fileEvent": upload,
+                "timestamp": header.get("timestamp"),
+            },
+        })
+
     async def _listen_messages(self):
-        while self._connected.is_set():
+        client = self.client
+        while self._connected.is_set() and self.client is client:
             try:
-                message = await self.client.read_message()
+                message = await client.read_message()
                 if message:
                     await self._handle_message(message)
                 else:
@@ -155,17 +441,17 @@ class WebSocketClient:
             except Exception as e:
                 logger.error(f"Error reading message: {e}")
                 break
-                
-        # Connection lost: shut down the client properly
-        logger.warning("Connection lost, shutting down client")
-        await self.close()
+
+        # Connection lost: drop it and let _run_event_loop reconnect, unless a new one replaced it
+        if self.client is client:
+            logger.warning("Connection lost, reconnecting")
+            await self._disconnect()
 
     async def connect(self, force_reconnect=False):
-        # Add lock to prevent multiple simultaneous connection attempts
-        connect_lock = asyncio.Lock()
-        async with connect_lock:
+        # Prevent multiple simultaneous connection attempts
+        async with self._connect_lock:
             if force_reconnect:
-                await self.close()
+                await self._disconnect()
             
             if self._connected.is_set() and self.client and not self.client.close_code:
                 return
@@ -180,10 +466,11 @@ class WebSocketClient:
 
                     self.client = await websocket_connect(
                         f"ws://{config.websocket.host}:{config.websocket.port}/ws",
-                        connect_timeout=config.websocket.connection_timeout
+                        connect_timeout=config.websocket.connection_timeout,
+                        compression_options=self._compression_options(),
                     )
                     
-                    data = json.loads(await self.client.read_message())
+                    data = serializer.loads(await self.client.read_message())
                     self.client_id = data['client_id']
                     
                     self._connected.set()
@@ -202,43 +489,102 @@ class WebSocketClient:
 
     async def send(self, payload: dict, target: str):
         try:
-            await self.connect()
-            payload['client_id'] = target
-            message_str = json.dumps(payload)
+            body = self._encode(payload, target)
+            if self._should_chunk(body):
+                stream = OutboundStream(target, body)
+                while not stream.done:
+                    await self._write(target, stream.next_chunk())
+                return
             THRESHOLD = 1_000_000
-            if len(message_str) > THRESHOLD:
-                logger.warning("Large message detected, which may trigger Tornado write issues. Consider using chunked messages.")
-                # ...optionally implement chunked sending logic here...
-            await self.client.write_message(message_str)
-        except WebSocketClosedError:
-            await self.connect(force_reconnect=True)
-            await self.send(payload, target)
+            if len(body) > THRESHOLD:
+                logger.warning("Large message detected, which may trigger Tornado write issues. Consider enabling websocket.chunk_outbound.")
+            await self._write(target, body)
         except Exception as e:
             logger.error(f"Failed to send message: {str(e)}")
             raise
 
-    def send_sync(self, payload: dict, target: str):
+    @staticmethod
+    def _encode(payload: dict, target: str):
+        payload['client_id'] = target
+        # Protocol 2 component messages can go out as msgpack binary frames
+        if isinstance(payload.get('payload'), dict) and payload['payload'].get('v') == wire.PROTOCOL_VERSION and wire.msgpack_enabled():
+            return wire.pack(payload)
+        return serializer.dumps(payload)
+
+    @staticmethod
+    def _should_chunk(body) -> bool:
+        # Chunks carry slices of JSON text, so binary frames are always sent whole
+        return config.websocket.chunk_outbound and isinstance(body, str) and len(body) > config.websocket.chunk_size
+
+    async def _write(self, target: str, body):
+        await self.connect()
+        # The relay routes on the envelope and never parses the JSON body
+        envelope = f"@{target or ''}\n"
+        message = envelope.encode() + body if isinstance(body, bytes) else envelope + body
         try:
-            loop = asyncio.get_running_loop()
-            return asyncio.run_coroutine_threadsafe(self.send(payload, target), loop).result()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(self.send(payload, target))
-            finally:
-                loop.close()
+            await self._write_frame(message)
+        except WebSocketClosedError:
+            await self.connect(force_reconnect=True)
+            await self._write_frame(message)
+
+    def _write_frame(self, message):
+        return self.client.write_message(message, binary=isinstance(message, bytes))
+
+    @staticmethod
+    def _compression_options():
+        return compression_options(config.websocket.compression, config.websocket.compression_level,
+                                   config.websocket.compression_threshold)
+
+    def send_sync(self, payload: dict, target: str, wait: bool = False):
+        """Queue a message for the client loop from any thread.
+
+        Returns a concurrent.futures.Future resolved once the message is written,
+        or failed if the client shuts down first; pass wait=True to block until
+        then, which is not possible on the client's own loop. The payload is
+        encoded before this returns, so the caller may go on changing it.
+        """
+        future = concurrent.futures.Future()
+        loop = getattr(self, "_loop", None)
+        if wait and loop is not None and self._on_loop(loop):
+            raise RuntimeError("send_sync(wait=True) would block the client loop it waits for; await send() instead")
+        try:
+            # The builder keeps mutating the component dicts it sends, so they cannot cross to the loop thread
+            body = self._encode(payload, target)
         except Exception as e:
-            logger.error(f"Failed to send message synchronously: {str(e)}")
-            raise
-            
-    async def close(self):
-        self._running = False
+            logger.error(f"Failed to encode message: {e}")
+            future.set_exception(e)
+            if wait:
+                return future.result()
+            return future
+        with self._send_lock:
+            if loop is None or loop.is_closed() or not self._accepting:
+                future.set_exception(ConnectionError("WebSocket client loop is not running"))
+            else:
+                loop.call_soon_threadsafe(self._outbound.put_nowait, (body, target, future))
+        if wait:
+            return future.result()
+        return future
+
+    async def _disconnect(self):
+        """Drop the current connection, leaving the loop running to reconnect"""
         self._connected.clear()
         self._ready.clear()
         if self.client:
             self.client.close()
             self.client = None
             self.client_id = None
+
+    @staticmethod
+    def _on_loop(loop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    async def close(self):
+        """Shut the client down; messages not yet written fail with ConnectionError"""
+        self._running = False
+        await self._disconnect()
         # Signal the loop to stop if it's running
         if hasattr(self, "_loop") and self._loop.is_running():
             self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,11 +1,32 @@
 import os, asyncio, json, logging, time, uuid, ssl, threading
 from tornado.web import Application, RequestHandler, StaticFileHandler
 from tornado.websocket import WebSocketHandler
+# Run as a script by the launcher, next to deflate.py; imported from the package in embedded mode
+if __package__: from .deflate import DeflateProtocol, compression_options
+else: from deflate import DeflateProtocol, compression_options
 
 DEFAULT_CONFIG = {'websocket':{'host':'0.0.0.0','port':8888,'max_connections':100},'security':{'ssl_cert_path':None,'ssl_key_path':None}}
+# permessage-deflate settings come from the launcher through the environment
+DEFAULT_CONFIG['compression'] = {'enabled': os.environ.get('AIFLOW_WS_COMPRESSION') == '1','level': int(os.environ.get('AIFLOW_WS_COMPRESSION_LEVEL', 6)),'threshold': int(os.environ.get('AIFLOW_WS_COMPRESSION_THRESHOLD', 128))}
+# Legacy frames without an envelope are parsed with the serializer the launcher selected
+loads, dumps = json.loads, json.dumps
+if os.environ.get('AIFLOW_WS_SERIALIZER', 'auto') in ('auto', 'orjson'):
+	try: import orjson; loads, dumps = orjson.loads, lambda data: orjson.dumps(data).decode()
+	except ImportError: pass
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'); logger = logging.getLogger('Server')
 for log_name in ["tornado.access", "tornado.application", "tornado.general"]: logging.getLogger(log_name).setLevel(logging.WARNING)
 
+# Routing envelope: "@<target>\n" ahead of the body, in text and binary frames. The relay routes
+# on it and forwards the body untouched; an empty target broadcasts.
+def split_envelope(message):
+	prefix = b'@' if isinstance(message, bytes) else '@'
+	if not message.startswith(prefix): return None, None
+	end = message.find(b'\n' if isinstance(message, bytes) else '\n', 1, 257)
+	if end < 0: return None, None
+	target = message[1:end]
+	if isinstance(target, bytes): target = target.decode('ascii')
+	return target or None, message[end + 1:]
+
 class BaseHandler(RequestHandler):
 	def set_default_headers(self): 
 		self.set_header("Access-Control-Allow-Origin", "*"); self.set_header("Access-Control-Allow-Headers", "Content-Type"); self.set_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS"); self.set_header("Content-Type", "application/json")
@@ -36,7 +57,7 @@ class ConnectionManager:
 	async def send_to_client(self, client_id: str, message: str) -> bool:
 		if client_id in self.clients:
 			try:
-				await self.clients[client_id].write_message(message)
+				await self.clients[client_id].write_message(message, binary=isinstance(message, bytes))
 				return True
 			except Exception as e:
 				logger.error(f"Send failed to {client_id}: {str(e)}")
@@ -51,7 +72,7 @@ class ConnectionManager:
 				if cid != sender_id:
 					try:
 						if not client.ws_connection or not client.ws_connection.client_terminated:
-							await client.write_message(message)
+							await client.write_message(message, binary=isinstance(message, bytes))
 						else: dead_clients.append(cid)
 					except Exception: dead_clients.append(cid)
 		for cid in dead_clients: self.remove_client(cid)
@@ -75,6 +96,15 @@ class SecureWebSocketHandler(WebSocketHandler):
 
 	def check_origin(self, origin): return True
 
+	def get_compression_options(self):
+		compression = DEFAULT_CONFIG['compression']
+		return compression_options(compression['enabled'], compression['level'], compression['threshold'])
+
+	def get_websocket_protocol(self):
+		# Messages under the threshold go out as plain frames; deflating them costs more than it saves
+		protocol = super().get_websocket_protocol()
+		return protocol and DeflateProtocol(self, False, protocol.params)
+
 	async def open(self):
 		try:
 			self.client_id = str(uuid.uuid4().hex)
@@ -91,13 +121,17 @@ class SecureWebSocketHandler(WebSocketHandler):
 	async def send_connection_info(self):
 		if not self.connection_ready or self.is_closed: return
 		try:
-			await self.write_message(json.dumps({"type": "connection","client_id": self.client_id}))
+			await self.write_message(dumps({"type": "connection","client_id": self.client_id}))
 		except Exception: await self.close()
 
 	async def on_message(self, message):
 		try:
-			data = json.loads(message)
-			await self.manager.broadcast(self.client_id, message, data.get('client_id'))
+			target, body = split_envelope(message)
+			if body is None:
+				# Legacy frame without an envelope: the target is only known after parsing it
+				data = loads(message)
+				target, body = data.get('client_id'), message
+			await self.manager.broadcast(self.client_id, body, target)
 		except json.JSONDecodeError: logger.error("Invalid JSON message received")
 		except Exception as e:
 			logger.error(f"Message handling error: {str(e)}")
@@ -108,7 +142,10 @@ class SecureWebSocketHandler(WebSocketHandler):
 		if not self.is_closed:
 			self.is_closed = True
 			self.connection_ready = False
-			if self.client_id: self.manager.remove_client(self.client_id)
+			if self.client_id:
+				self.manager.remove_client(self.client_id)
+				# Lets the Python side drop the session it keeps for this browser
+				asyncio.ensure_future(self.manager.broadcast(self.client_id, dumps({"type": "client_disconnected", "client_id": self.client_id})))
 
 class WebSocketServer:
 	def __init__(self):
@@ -0,0 +1,71 @@
+"""
+MUIBuilder tree-building micro-benchmark.
+
+Builds flat and nested trees of up to 10k components with sends going to a
+no-op client, so only the builder's bookkeeping is measured. Time per node
+should stay flat as the tree grows.
+
+Usage: python benchmarks/bench_builder_index.py
+"""
+import sys
+import os
+import time
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from aiflow import mui, logger
+from aiflow.flow.events import event_base
+
+
+class NullClient:
+    """Accepts sends without touching the network"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_sync(self, payload, target, wait=False):
+        self.sent += 1
+
+
+def build_flat(size):
+    with mui.Box():
+        for i in range(size - 1):
+            mui.Typography(f"item {i}", variant="body2")
+
+
+def build_nested(size, fanout=100):
+    with mui.Box():
+        remaining = size - 1
+        while remaining > 0:
+            with mui.Stack(spacing=1):
+                remaining -= 1
+                for i in range(min(fanout, remaining)):
+                    mui.Typography(f"item {i}", variant="body2")
+                remaining -= min(fanout, remaining)
+
+
+def measure(build, size, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        mui.reset()
+        start = time.perf_counter()
+        build(size)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    client = NullClient()
+    event_base.set_ws_client(client)
+    for name, build in (("flat", build_flat), ("nested", build_nested)):
+        for size in (1_000, 2_500, 5_000, 10_000):
+            elapsed = measure(build, size)
+            logger.info(
+                f"{name:>6} {size:>6} nodes: {elapsed * 1000:8.1f} ms "
+                f"({elapsed / size * 1e6:6.1f} us/node)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-component sends vs. batched component_batch messages.
+
+Renders examples/dashboard.py through the live WebSocket client and reports
+frames sent and wall time for both transports.
+
+Usage: python benchmarks/bench_component_batch.py [rounds]
+"""
+import sys
+import os
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'examples'))
+
+from aiflow import mui, logger
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+
+import dashboard as dashboard_example
+
+
+def render(batched, rounds):
+    config.websocket.batch_updates = batched
+    client = event_base._ws_client
+    original_send_sync = client.send_sync
+    frames = {"count": 0, "components": 0}
+
+    def counting_send_sync(payload, target, *args, **kwargs):
+        frames["count"] += 1
+        if payload.get("type") == "component_batch":
+            frames["components"] += len(payload["payload"]["components"])
+        elif payload.get("type") == "component_update":
+            frames["components"] += 1
+        return original_send_sync(payload, target, *args, **kwargs)
+
+    client.send_sync = counting_send_sync
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            mui.reset()
+            dashboard_example.dashboard()
+            event_base.flush_component_updates()
+        elapsed = time.perf_counter() - start
+    finally:
+        client.send_sync = original_send_sync
+    return elapsed, frames["count"], frames["components"]
+
+
+def main(rounds=20):
+    for label, batched in (("per-component", False), ("batched", True)):
+        elapsed, frame_count, components = render(batched, rounds)
+        logger.info(
+            f"{label:>14}: {elapsed / rounds * 1000:8.2f} ms/render, "
+            f"{frame_count / rounds:7.1f} frames/render, "
+            f"{components / rounds:7.1f} components/render"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
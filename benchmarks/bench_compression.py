@@ -0,0 +1,76 @@
+"""
+permessage-deflate trade-offs on the example dashboards.
+
+Renders each example headless, records the frames the client would send, and
+compresses them the way Tornado's permessage-deflate does (raw deflate with
+context takeover, sync flush per message). Reports bytes on the wire and
+compression CPU time per level and size threshold.
+
+Usage: python benchmarks/bench_compression.py [example ...]
+"""
+import sys
+import os
+import json
+import time
+import zlib
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from aiflow import mui, logger
+from aiflow.flow.events import event_base
+from aiflow.flow.events.run import run_module_importlib
+
+EXAMPLES = ("dashboard", "card", "form", "datagrid")
+LEVELS = (1, 6, 9)
+THRESHOLDS = (0, 128, 512, 1024)
+
+
+class RecordingClient:
+    def __init__(self):
+        self.frames = []
+
+    def send_sync(self, payload, target, wait=False):
+        payload['client_id'] = target
+        self.frames.append(f"@{target or ''}\n{json.dumps(payload)}".encode())
+
+
+def record(example):
+    client = RecordingClient()
+    event_base.set_ws_client(client)
+    mui.reset()
+    run_module_importlib(os.path.join(ROOT, "examples", f"{example}.py"))
+    return client.frames
+
+
+def deflate(frames, level, threshold):
+    """Bytes on the wire and seconds spent compressing, as one connection would see them"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, 8)
+    wire = 0
+    start = time.perf_counter()
+    for frame in frames:
+        if len(frame) < threshold:
+            wire += len(frame)
+            continue
+        data = compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        wire += len(data) - 4  # permessage-deflate drops the trailing 00 00 ff ff
+    return wire, time.perf_counter() - start
+
+
+def main(examples):
+    for example in examples:
+        frames = record(example)
+        raw = sum(len(frame) for frame in frames)
+        logger.info(f"{example}: {len(frames)} frames, {raw / 1024:.1f} KB uncompressed")
+        for level in LEVELS:
+            for threshold in THRESHOLDS:
+                wire, elapsed = deflate(frames, level, threshold)
+                logger.info(
+                    f"  level {level} threshold {threshold:>5}: {wire / 1024:8.1f} KB "
+                    f"({wire / raw:6.1%}), {elapsed * 1000:6.2f} ms compress"
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or EXAMPLES)
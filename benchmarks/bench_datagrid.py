@@ -0,0 +1,125 @@
+"""
+datagrid() cost per grid event on large frames.
+
+Renders a grid headless over a synthetic frame, then replays filter, sort
+and pagination events, repeating some so cached indexes are exercised.
+Reports wall time and peak memory allocated during each rerun, next to the
+size of the frame itself. Then renders several grids over the frame and
+reports the per-grid state they keep between reruns, and finally times
+reruns over a wide frame, where per-column work dominates.
+
+Usage: python benchmarks/bench_datagrid.py [rows]
+"""
+import sys
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from aiflow import mui, logger, events_store, state
+from aiflow.flow.events import event_base
+from aiflow.flow.mui.custom_components.data_grid import datagrid
+
+GRID_ID = "bench-grid"
+DASHBOARD_GRIDS = 6
+WIDE_COLUMNS = 300
+
+EVENTS = (
+    ("initial render", None),
+    ("filter contains", {"type": "filter-change", "value": {"items": [{"field": "name", "operator": "contains", "value": "7"}]}}),
+    ("sort asc", {"type": "sort-change", "value": [{"field": "price", "sort": "asc"}]}),
+    ("next page", {"type": "pagination-change", "value": {"page": 1, "pageSize": 25}}),
+    ("sort desc", {"type": "sort-change", "value": [{"field": "quantity", "sort": "desc"}]}),
+    ("sort asc again", {"type": "sort-change", "value": [{"field": "price", "sort": "asc"}]}),
+    ("clear filter", {"type": "filter-change", "value": {"items": []}}),
+    ("filter again", {"type": "filter-change", "value": {"items": [{"field": "name", "operator": "contains", "value": "42"}]}}),
+    ("sort desc again", {"type": "sort-change", "value": [{"field": "quantity", "sort": "desc"}]}),
+    ("last page", {"type": "pagination-change", "value": {"page": 1000, "pageSize": 25}}),
+    ("rerun", None),
+)
+
+
+class NullClient:
+    def send_sync(self, payload, target, wait=False):
+        pass
+
+
+def frame(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "quantity": rng.integers(0, 1_000, rows),
+        "price": rng.normal(100, 20, rows),
+        "name": pd.Series(rng.integers(0, 100_000, rows)).map("item {}".format),
+        "created": pd.date_range("2024-01-01", periods=rows, freq="s"),
+    })
+    df.loc[df.index[::7], "price"] = np.nan
+    return df
+
+
+def wide_frame(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(rows, WIDE_COLUMNS)), columns=[f"metric_{i}" for i in range(WIDE_COLUMNS)])
+    df["label"] = pd.Series(rng.integers(0, 100, rows)).map("label {}".format)
+    return df
+
+
+def rerun(df, event):
+    if event is not None:
+        events_store["payload"] = dict(event, key=GRID_ID)
+    mui.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    datagrid(df, grid_id=GRID_ID)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def state_bytes(grid):
+    """Bytes of row positions and index arrays a grid keeps between reruns"""
+    arrays = [grid.filtered, grid.positions]
+    if grid.index is not None:
+        arrays += [codes for codes, _ in grid.index._codes.values()] + list(grid.index._orders.values())
+        arrays += [mask for mask in grid.index._masks.values()]
+    return sum(array.nbytes for array in arrays if array is not None)
+
+
+def dashboard(df):
+    """One rerun rendering several sorted, filtered grids over the same frame"""
+    mui.reset()
+    for number in range(DASHBOARD_GRIDS):
+        grid_id = f"{GRID_ID}-{number}"
+        for event in EVENTS[1:3]:
+            events_store["payload"] = dict(event[1], key=grid_id)
+            datagrid(df, grid_id=grid_id)
+    grids = [state["__grids"][f"{GRID_ID}-{number}"] for number in range(DASHBOARD_GRIDS)]
+    return [state_bytes(grid) for grid in grids]
+
+
+def main(rows):
+    event_base.set_ws_client(NullClient())
+    df = frame(rows)
+    size = df.memory_usage(deep=True).sum()
+    logger.info(f"{rows} rows, {size / 1e6:.0f} MB frame")
+    for label, event in EVENTS:
+        elapsed, peak = rerun(df, event)
+        logger.info(f"  {label:>16}: {elapsed * 1000:9.1f} ms, peak {peak / 1e6:8.1f} MB ({peak / size:6.1%} of frame)")
+    per_grid = dashboard(df)
+    total = sum(per_grid)
+    logger.info(f"  {DASHBOARD_GRIDS} grids keep {total / 1e6:.1f} MB of state ({total / size:.1%} of frame), "
+                f"{max(per_grid) / 1e6:.1f} MB at most per grid")
+    wide = wide_frame(min(rows, 100_000))
+    rerun(wide, None)
+    elapsed = min(rerun(wide, None)[0] for _ in range(10))
+    logger.info(f"  {WIDE_COLUMNS} column rerun: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,96 @@
+"""
+Relay vs. embedded server mode, Python to browser.
+
+Starts the server in-process on a free port and connects a stand-in browser.
+In relay mode a second socket writes enveloped frames through the server, as
+WebSocketClient does; in embedded mode an EmbeddedClient writes to the
+browser's handler directly. Reports messages/s and mean one-way latency.
+The real relay also runs in its own process, which this does not count.
+
+Usage: python benchmarks/bench_embedded.py [messages per size]
+"""
+import sys
+import os
+import json
+import time
+import socket
+import asyncio
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tornado.websocket import websocket_connect
+
+from aiflow.flow.network import serializer
+from aiflow.flow.network.embedded import EmbeddedClient, create_server
+
+SIZES = (200, 10_000, 500_000)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+async def connect(port):
+    client = await websocket_connect(f"ws://localhost:{port}/ws", max_message_size=1 << 30)
+    info = json.loads(await client.read_message())
+    return client, info["client_id"]
+
+
+def message(size):
+    return {"type": "component_update", "payload": {"component": {"type": "Typography", "id": "Typography_1", "content": "x" * size}}}
+
+
+async def measure(send, browser, size, count):
+    latencies = []
+
+    async def receive():
+        for _ in range(count):
+            await browser.read_message()
+            latencies.append(time.perf_counter())
+
+    start = time.perf_counter()
+    reader = asyncio.ensure_future(receive())
+    sent = []
+    for _ in range(count):
+        sent.append(time.perf_counter())
+        await send(message(size))
+    await reader
+    elapsed = time.perf_counter() - start
+    latency = sum(received - at for received, at in zip(latencies, sent)) / count
+    return count / elapsed, latency * 1000
+
+
+async def main(count):
+    port = free_port()
+    server = create_server()
+    await server.start(port)
+    browser, browser_id = await connect(port)
+    relay, _ = await connect(port)
+    embedded = EmbeddedClient(server, asyncio.get_running_loop())
+
+    async def send_relay(payload):
+        payload["client_id"] = browser_id
+        await relay.write_message(f"@{browser_id}\n" + serializer.dumps(payload))
+
+    async def send_embedded(payload):
+        await embedded.send(payload, browser_id)
+
+    try:
+        for size in SIZES:
+            rounds = max(10, count * 1_000 // size) if size > 1_000 else count
+            for label, send in (("relay", send_relay), ("embedded", send_embedded)):
+                rate, latency = await measure(send, browser, size, rounds)
+                print(f"{size:>9} B {label:>8}: {rate:9.0f} msg/s {latency:8.3f} ms latency")
+    finally:
+        await embedded.close()
+        browser.close()
+        relay.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
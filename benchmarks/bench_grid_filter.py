@@ -0,0 +1,70 @@
+"""
+Filter model evaluation on large frames.
+
+Applies a sequence of MUI filter models to a synthetic frame the way the
+datagrid does as the user edits its filter panel: adding items, changing
+one of them, switching between AND and OR, and typing into the quick
+filter. Unchanged items reuse their cached masks, so only the edited item
+costs a pass over its column.
+
+Usage: python benchmarks/bench_grid_filter.py [rows]
+"""
+import sys
+import os
+import time
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from aiflow import logger
+from aiflow.flow.mui.custom_components.grid_filter import filter_positions
+from aiflow.flow.mui.custom_components.grid_index import GridIndex
+
+QUANTITY = {"field": "quantity", "operator": ">", "value": 500}
+PRICE = {"field": "price", "operator": "<=", "value": 90}
+CREATED = {"field": "created", "operator": "onOrAfter", "value": "2024-01-20"}
+NAME = {"field": "name", "operator": "contains", "value": "42"}
+
+MODELS = (
+    ("one numeric item", {"items": [QUANTITY]}),
+    ("add price item", {"items": [QUANTITY, PRICE]}),
+    ("add date item", {"items": [QUANTITY, PRICE, CREATED]}),
+    ("add text item", {"items": [QUANTITY, PRICE, CREATED, NAME]}),
+    ("change one value", {"items": [QUANTITY, dict(PRICE, value=110), CREATED, NAME]}),
+    ("switch to OR", {"items": [QUANTITY, dict(PRICE, value=110), CREATED, NAME], "logicOperator": "or"}),
+    ("change back", {"items": [QUANTITY, PRICE, CREATED, NAME]}),
+    ("quick filter", {"items": [], "quickFilterValues": ["item", "77"]}),
+    ("quick filter OR", {"items": [], "quickFilterValues": ["item", "77"], "quickFilterLogicOperator": "or"}),
+)
+
+
+def frame(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "quantity": rng.integers(0, 1_000, rows),
+        "price": rng.normal(100, 20, rows),
+        "name": pd.Series(rng.integers(0, 100_000, rows)).map("item {}".format),
+        "created": pd.date_range("2024-01-01", periods=rows, freq="s"),
+    })
+    df.loc[df.index[::7], "price"] = np.nan
+    return df
+
+
+def main(rows):
+    df = frame(rows)
+    index = GridIndex(df)
+    logger.info(f"{rows} rows")
+    for label, model in MODELS:
+        start = time.perf_counter()
+        positions = filter_positions(df, index, model)
+        elapsed = time.perf_counter() - start
+        matched = rows if positions is None else len(positions)
+        logger.info(f"  {label:>16}: {elapsed * 1000:9.1f} ms, {matched:>9} rows match")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
@@ -0,0 +1,74 @@
+"""
+Encoding one DataGrid page: columnar vs. to_dict('records').
+
+Takes pages of a sorted synthetic frame with integer, float (with NaN),
+text and datetime (with NaT) columns, and times building the rows, the
+message serializer on them, and the fingerprint incremental rendering
+takes of every component. Also reports the encoded size.
+
+Usage: python benchmarks/bench_grid_rows.py [rows]
+"""
+import sys
+import os
+import time
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from aiflow import logger
+from aiflow.flow.mui.custom_components.grid_rows import encode_page
+from aiflow.flow.mui.mui_builder import MUIBuilder
+from aiflow.flow.network import serializer
+
+PAGE_SIZES = (25, 1_000, 10_000)
+REPEAT = 20
+
+
+def frame(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "quantity": rng.integers(0, 1_000, rows),
+        "price": rng.normal(100, 20, rows),
+        "name": pd.Series(rng.integers(0, 100_000, rows)).map("item {}".format),
+        "created": pd.date_range("2024-01-01", periods=rows, freq="s"),
+    })
+    df.loc[df.index[::7], "price"] = np.nan
+    df.loc[df.index[::11], "created"] = pd.NaT
+    return df
+
+
+def records(df, positions, start, end):
+    """How datagrid built rows before"""
+    rows = df.iloc[positions[start:end]].to_dict('records')
+    for i, row in enumerate(rows):
+        row['id'] = i + start
+    return rows
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main(rows):
+    df = frame(rows)
+    positions = np.argsort(df["price"].to_numpy(), kind="stable")
+    logger.info(f"{rows} rows, pages from a sorted frame")
+    for page_size in PAGE_SIZES:
+        start = rows // 3
+        for label, encode in (("records", records), ("columnar", encode_page)):
+            page, build = timed(encode, df, positions, start, start + page_size)
+            text, dumps = timed(serializer.dumps, page)
+            _, fingerprint = timed(MUIBuilder._fingerprint, {"props": {"rows": page}})
+            logger.info(f"  {page_size:>6} rows {label:>8}: build {build:7.2f} ms, {serializer.backend().name} {dumps:7.2f} ms, "
+                        f"fingerprint {fingerprint:7.2f} ms, {len(text) / 1e3:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,83 @@
+"""
+Relay throughput: legacy JSON frames vs. frames with a routing envelope.
+
+Starts ws_server in-process on a free port, connects a sender and a receiver,
+and pushes messages of several sizes from one to the other. Reports messages/s
+and MB/s through the relay for both framings.
+
+Usage: python benchmarks/bench_relay.py [messages per size]
+"""
+import sys
+import os
+import json
+import time
+import socket
+import asyncio
+import importlib.util
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+from tornado.websocket import websocket_connect
+
+SIZES = (1_000, 100_000, 5_000_000)
+
+
+def load_server():
+    """ws_server is a standalone script, so load it by path rather than through the aiflow package"""
+    path = os.path.join(ROOT, "aiflow", "flow", "network", "ws_server.py")
+    spec = importlib.util.spec_from_file_location("ws_server", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+async def connect(port):
+    client = await websocket_connect(f"ws://localhost:{port}/ws", max_message_size=1 << 30)
+    info = json.loads(await client.read_message())
+    return client, info["client_id"]
+
+
+async def measure(sender, receiver, receiver_id, size, count, envelope):
+    body = json.dumps({"type": "component_update", "client_id": receiver_id, "payload": {"data": "x" * size}})
+    message = f"@{receiver_id}\n{body}" if envelope else body
+
+    async def receive():
+        for _ in range(count):
+            await receiver.read_message()
+
+    start = time.perf_counter()
+    reader = asyncio.ensure_future(receive())
+    for _ in range(count):
+        await sender.write_message(message)
+    await reader
+    elapsed = time.perf_counter() - start
+    return count / elapsed, count * len(body) / elapsed / 1e6
+
+
+async def main(count):
+    ws_server = load_server()
+    port = free_port()
+    server = ws_server.WebSocketServer()
+    await server.start(port)
+    sender, _ = await connect(port)
+    receiver, receiver_id = await connect(port)
+    try:
+        for size in SIZES:
+            rounds = max(4, count * 1_000 // size) if size > 1_000 else count
+            for label, envelope in (("json", False), ("envelope", True)):
+                rate, throughput = await measure(sender, receiver, receiver_id, size, rounds, envelope)
+                print(f"{size:>9} B {label:>8}: {rate:9.0f} msg/s {throughput:8.1f} MB/s")
+    finally:
+        sender.close()
+        receiver.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
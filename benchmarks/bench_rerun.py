@@ -0,0 +1,61 @@
+"""
+Rerun latency: spec.loader.exec_module on every event vs. the cached code object.
+
+Re-executes a script as __main__ the way EventBase does on each event, with
+sends going to a no-op client, and reports per-rerun latency for both paths.
+
+Usage: python benchmarks/bench_rerun.py [script] [rounds]
+"""
+import sys
+import os
+import time
+import importlib.util
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from aiflow import mui, logger
+from aiflow.flow.events import event_base
+from aiflow.flow.events.run import run_module_importlib
+
+
+class NullClient:
+    def send_sync(self, payload, target, wait=False):
+        pass
+
+
+def exec_module_rerun(file_path):
+    """The previous rerun path: new spec and loader.exec_module per event"""
+    original_main = sys.modules.get('__main__')
+    try:
+        spec = importlib.util.spec_from_file_location('__main__', file_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['__main__'] = module
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules['__main__'] = original_main
+
+
+def measure(rerun, script, rounds):
+    timings = []
+    for _ in range(rounds):
+        mui.reset()
+        start = time.perf_counter()
+        rerun(script)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[0]
+
+
+def main(script, rounds):
+    event_base.set_ws_client(NullClient())
+    for label, rerun in (("exec_module", exec_module_rerun), ("cached code", run_module_importlib)):
+        median, best = measure(rerun, script, rounds)
+        logger.info(f"{label:>12}: median {median * 1000:7.2f} ms, best {best * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    script = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "examples", "dashboard.py")
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(os.path.abspath(script), rounds)
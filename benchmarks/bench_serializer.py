@@ -0,0 +1,102 @@
+"""
+Serializer backends on DataGrid payloads.
+
+Builds component_update messages the way datagrid() does, from a DataFrame
+with int, float (with NaN), string, bool and datetime columns, and times
+dumps/loads for each installed backend. The "json + convert" row converts
+every value to a Python primitive first, which plain json.dumps needed for
+numpy and pandas values.
+
+Usage: python benchmarks/bench_serializer.py [rows ...]
+"""
+import sys
+import os
+import json
+import math
+import time
+import importlib.util
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from aiflow import logger
+from aiflow.flow.network import serializer
+
+ROWS = (25, 1_000, 10_000)
+ROUNDS = 20
+
+
+def frame(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "quantity": rng.integers(0, 1_000, rows),
+        "price": rng.normal(100, 20, rows),
+        "name": [f"item {i}" for i in range(rows)],
+        "active": rng.random(rows) > 0.5,
+        "created": pd.date_range("2024-01-01", periods=rows, freq="min"),
+    })
+    df.loc[df.index[::7], "price"] = np.nan
+    return df
+
+
+def payload(df):
+    rows = df.to_dict("records")
+    for i, row in enumerate(rows):
+        row["id"] = i
+    return {
+        "type": "component_update",
+        "client_id": "browser",
+        "payload": {"component": {"type": "DataGrid", "id": "DataGrid_1", "module": "muiElements", "props": {"rows": rows}}},
+    }
+
+
+def convert(message):
+    """Row-by-row conversion to primitives, as plain json.dumps requires"""
+    rows = []
+    for row in message["payload"]["component"]["props"]["rows"]:
+        converted = {}
+        for key, value in row.items():
+            if isinstance(value, pd.Timestamp):
+                value = value.isoformat()
+            elif isinstance(value, np.generic):
+                value = value.item()
+            elif isinstance(value, float) and math.isnan(value):
+                value = None
+            converted[key] = value
+        rows.append(converted)
+    return dict(message, payload={"component": dict(message["payload"]["component"], props={"rows": rows})})
+
+
+def timed(function, argument):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = function(argument)
+    return result, (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main(sizes):
+    backends = []
+    for name in ("json", "ujson", "orjson"):
+        if name == "json" or importlib.util.find_spec(name):
+            backends.append(serializer._load(name))
+        else:
+            logger.info(f"{name} is not installed, skipping it")
+
+    for rows in sizes:
+        message = payload(frame(rows))
+        logger.info(f"DataGrid page of {rows} rows")
+        text, elapsed = timed(lambda message: json.dumps(convert(message)), message)
+        _, parse = timed(json.loads, text)
+        logger.info(f"  {'json + convert':>14}: {elapsed:8.2f} ms dumps {parse:8.2f} ms loads {len(text) / 1024:8.1f} KB")
+        for backend in backends:
+            text, elapsed = timed(backend.dumps, message)
+            _, parse = timed(backend.loads, text)
+            logger.info(f"  {backend.name:>14}: {elapsed:8.2f} ms dumps {parse:8.2f} ms loads {len(text) / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or ROWS)
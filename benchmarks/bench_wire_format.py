@@ -0,0 +1,102 @@
+"""
+Component message size: protocol 1 JSON vs. the compact protocol 2 encoding.
+
+Renders a synthetic tree of N components headless, groups them into
+component_batch messages of websocket.batch_max_size, and reports bytes,
+deflated bytes and encode time for verbose JSON, compact JSON and compact
+msgpack (when msgpack is installed). Each compact message is decoded again
+and checked against the original components.
+
+Usage: python benchmarks/bench_wire_format.py [nodes ...]
+"""
+import sys
+import os
+import json
+import time
+import zlib
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from aiflow import mui, logger
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+from aiflow.flow.network import wire
+
+NODES = (1_000, 5_000)
+
+
+class RecordingClient:
+    def __init__(self):
+        self.components = []
+
+    def send_sync(self, payload, target, wait=False):
+        self.components.append(payload["payload"]["component"])
+
+
+def render(nodes):
+    """A grid of cards, six nodes each counting text children, like a large dashboard"""
+    client = RecordingClient()
+    event_base.set_ws_client(client)
+    config.websocket.batch_updates = False
+    config.render.wire_format = "json"
+    mui.reset()
+    with mui.Grid(container=True, spacing=2):
+        for i in range(nodes // 6):
+            with mui.Grid(item=True, xs=12, md=4):
+                with mui.Card(sx={"borderRadius": 3}, elevation=1):
+                    mui.Typography(f"Card {i}", variant="h6", color="text.primary")
+                    mui.Button("Open", variant="outlined", size="small", id=f"open_{i}")
+    return client.components
+
+
+def measure(label, batches, encode, raw_size):
+    start = time.perf_counter()
+    frames = [encode(batch) for batch in batches]
+    elapsed = time.perf_counter() - start
+    size = sum(len(frame) for frame in frames)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS, 8)
+    deflated = sum(len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4 for frame in frames)
+    logger.info(
+        f"  {label:>14}: {size / 1024:8.1f} KB ({size / raw_size:6.1%}), "
+        f"{deflated / 1024:7.1f} KB deflated, {elapsed * 1000:7.2f} ms encode"
+    )
+
+
+def count_nodes(component):
+    return 1 + sum(count_nodes(child) for child in component.get("children") or ())
+
+
+def check_round_trip(batches):
+    for batch in batches:
+        payload = json.loads(json.dumps(wire.encode_components(batch)))
+        assert wire.decode_components(payload) == batch, "compact encoding did not round-trip"
+
+
+def main(sizes):
+    for nodes in sizes:
+        components = render(nodes)
+        step = config.websocket.batch_max_size
+        batches = [components[i:i + step] for i in range(0, len(components), step)]
+        check_round_trip(batches)
+
+        def verbose(batch):
+            return json.dumps({"type": "component_batch", "payload": {"components": batch}}).encode()
+
+        def compact(batch):
+            return json.dumps({"type": "component_batch", "payload": wire.encode_components(batch)}).encode()
+
+        raw_size = sum(len(verbose(batch)) for batch in batches)
+        total = sum(count_nodes(component) for component in components)
+        logger.info(f"{total} nodes, {len(components)} components in {len(batches)} messages")
+        measure("json", batches, verbose, raw_size)
+        measure("compact", batches, compact, raw_size)
+        if wire.msgpack is not None:
+            measure("compact msgpack", batches, lambda batch: wire.pack({"type": "component_batch", "payload": wire.encode_components(batch)}), raw_size)
+        else:
+            logger.info("  msgpack is not installed, skipping the binary encoding")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or NODES)
@@ -5,6 +5,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 import pandas as pd
 from aiflow import mui, logger, events, state
 from aiflow.flow.mui.custom_components.data_grid import datagrid
+from aiflow.flow.network.uploads import FileUpload
 
 import io
 
@@ -15,12 +16,13 @@ def datagridcard():
     # Handle file upload event
     if file_event:
         try:
-            # Get the file content from the event
-            file_content = file_event.get('data', None)
-            if file_content:
-                # Convert base64 to bytes and create DataFrame
+            if isinstance(file_event, FileUpload):
+                # Binary uploads are read in place, without base64 or extra copies
+                state['df'] = pd.read_csv(file_event.open())
+            elif file_event.get('data', None):
+                # Convert base64 from older frontends to bytes and create DataFrame
                 import base64
-                content = base64.b64decode(file_content.split(',')[1])
+                content = base64.b64decode(file_event['data'].split(',')[1])
                 df = pd.read_csv(io.BytesIO(content))
                 state['df'] = df
                 
@@ -0,0 +1,45 @@
+import os
+
+os.environ.setdefault("AIFLOW_HEADLESS", "1")
+
+import pytest
+
+from aiflow.flow.events import event_base
+from aiflow.flow.events.session import current_session
+
+
+class RecordingClient:
+    """Stands in for the WebSocket client, keeping what would have been sent"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_sync(self, payload, target, wait=False):
+        self.sent.append((payload, target))
+
+
+@pytest.fixture
+def client():
+    """A recording client attached to event_base for the test"""
+    client = RecordingClient()
+    event_base.set_ws_client(client)
+    yield client
+    event_base.set_ws_client(None)
+
+
+@pytest.fixture
+def session(client):
+    """The default session, cleared before and after the test"""
+    session = current_session()
+
+    def clear():
+        session.state.clear()
+        session.events.clear()
+        session.events_store.clear()
+        session.builder.reset()
+        session.builder._rendered.clear()
+        session.builder._finish_hooks.clear()
+
+    clear()
+    yield session
+    clear()
@@ -0,0 +1,196 @@
+import threading
+import types
+
+from aiflow.flow.cache import data_cache
+from aiflow.flow.cache.data_cache import DataCache, cache_data
+from aiflow.flow.cache.render_cache import cache_render
+
+
+def define(source, name):
+    """Run source as if it were a script file, as hot reload does after an edit"""
+    namespace = {}
+    exec(compile(source, "edited_script.py", "exec"), namespace)
+    return namespace[name]
+
+
+def test_cache_data_misses_after_constant_edit():
+    before = cache_data(define("def scale(x):\n    return x * 2\n", "scale"))
+    after = cache_data(define("def scale(x):\n    return x * 3\n", "scale"))
+    assert before(5) == 10
+    assert after(5) == 15
+
+
+def test_cache_data_misses_after_nested_constant_edit():
+    source = "def query(x):\n    def build():\n        return 'select {}'\n    return build().format(x)\n"
+    before = cache_data(define(source, "query"))
+    after = cache_data(define(source.replace("select", "delete"), "query"))
+    assert before(1) == "select 1"
+    assert after(1) == "delete 1"
+
+
+def test_cache_data_misses_after_default_edit():
+    before = cache_data(define("def scale(x, by=2):\n    return x * by\n", "scale"))
+    after = cache_data(define("def scale(x, by=4):\n    return x * by\n", "scale"))
+    assert before(5) == 10
+    assert after(5) == 20
+
+
+def test_cache_data_separate_per_closure():
+    def make(x):
+        @cache_data
+        def read():
+            return x
+        return read
+
+    assert make("a")() == "a"
+    assert make("b")() == "b"
+
+
+def test_cache_data_shared_while_unchanged():
+    source = "calls = []\ndef scale(x):\n    calls.append(x)\n    return x * 2\n"
+    namespace = {}
+    exec(compile(source, "unchanged_script.py", "exec"), namespace)
+    first = cache_data(namespace["scale"])
+    exec(compile(source, "unchanged_script.py", "exec"), namespace)
+    second = cache_data(namespace["scale"])
+    assert first(5) == second(5) == 10
+    assert len(namespace["calls"]) == 1
+
+
+def test_cache_data_skipped_for_unpicklable_arguments():
+    calls = []
+
+    @cache_data
+    def describe(lock):
+        calls.append(None)
+        return len(calls)
+
+    # Each lock is freed before the next is made, so they tend to share an id
+    assert [describe(threading.Lock()) for _ in range(3)] == [1, 2, 3]
+
+
+def test_cache_data_with_unpicklable_default():
+    scale = cache_data(define("import threading\ndef scale(x, lock=threading.Lock()):\n    return x * 2\n", "scale"))
+    assert scale(5) == 10
+
+
+def rendered_texts(client):
+    texts = []
+    for payload, _ in client.sent:
+        inner = payload.get("payload", {})
+        for component in list(inner.get("components") or ()) + [inner.get("component")]:
+            if component and component.get("type") == "Typography":
+                texts.append(component["children"][0]["content"] if component.get("children") else component.get("content"))
+    return texts
+
+
+def test_cache_data_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(data_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    calls = []
+
+    @cache_data(ttl=10)
+    def load(x):
+        calls.append(x)
+        return x
+
+    load(1)
+    now[0] += 9
+    load(1)
+    now[0] += 2
+    load(1)
+    assert calls == [1, 1]
+    assert load.cache_info()["entries"] == 1
+
+
+def test_cache_data_evicts_least_recently_used_entry():
+    calls = []
+
+    @cache_data(max_entries=2)
+    def load(x):
+        calls.append(x)
+        return x
+
+    load(1), load(2), load(1), load(3)
+    # 2 was the least recently used when 3 arrived
+    load(1), load(2)
+    assert calls == [1, 2, 3, 2]
+    assert load.cache_info()["evictions"] == 2
+
+
+def test_data_cache_keeps_within_byte_budget():
+    # Room for three values of about 1 KB each
+    cache = DataCache(max_bytes=3200)
+    for key in "abc":
+        cache.put(key, b"x" * 1000)
+    cache.get("a")
+    cache.put("d", b"x" * 1000)
+    assert [cache.get(key)[0] for key in "abcd"] == [True, False, True, True]
+    assert cache.info()["bytes"] <= 3200
+    # A value over the whole budget is not cached at all
+    cache.put("huge", b"x" * 4000)
+    assert cache.get("huge") == (False, None)
+
+
+def test_cache_data_counts_hits_and_misses():
+    @cache_data
+    def load(x):
+        return x
+
+    load(1), load(1), load(2), load(1)
+    info = load.cache_info()
+    assert (info["hits"], info["misses"], info["entries"]) == (2, 2, 2)
+    load.cache_clear()
+    assert load.cache_info()["entries"] == load.cache_info()["bytes"] == 0
+
+
+def test_cache_render_misses_after_constant_edit(session, client):
+    source = "from aiflow import mui\ndef header():\n    mui.Typography('Revenue')\n"
+    for text in ("Revenue", "Profit"):
+        header = cache_render(define(source.replace("Revenue", text), "header"))
+        session.builder.reset()
+        header()
+        session.batcher.flush()
+    texts = rendered_texts(client)
+    assert texts[-1] == "Profit", texts
+
+
+def test_cache_render_skipped_for_unpicklable_arguments(session, client):
+    @cache_render
+    def header(lock, text):
+        from aiflow import mui
+        mui.Typography(text)
+
+    for text in ("Revenue", "Profit"):
+        session.builder.reset()
+        header(threading.Lock(), text)
+        session.batcher.flush()
+    assert rendered_texts(client)[-1] == "Profit"
+    assert header.cache_info()["entries"] == 0
+
+
+def test_cache_render_misses_after_global_change(session, client):
+    namespace = {}
+    exec(compile("from aiflow import mui\nTITLE = 'Revenue'\ndef header():\n    mui.Typography(TITLE)\n", "global_script.py", "exec"), namespace)
+    header = cache_render(namespace["header"])
+    for text in ("Revenue", "Profit"):
+        namespace["TITLE"] = text
+        session.builder.reset()
+        header()
+        session.batcher.flush()
+    assert rendered_texts(client)[-1] == "Profit"
+
+
+def test_cache_render_separate_per_closure(session, client):
+    def make(text):
+        @cache_render
+        def header():
+            from aiflow import mui
+            mui.Typography(text)
+        return header
+
+    for text in ("Revenue", "Profit"):
+        session.builder.reset()
+        make(text)()
+        session.batcher.flush()
+    assert rendered_texts(client)[-1] == "Profit"
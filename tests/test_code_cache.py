@@ -0,0 +1,57 @@
+import os
+
+from aiflow.flow.events.code_cache import CodeCache
+
+
+def run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace["value"]
+
+
+def edit(path, source):
+    # Bump the mtime explicitly, as an edit within the filesystem's timestamp resolution keeps it
+    mtime = os.stat(path).st_mtime_ns
+    path.write_text(source)
+    os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+
+
+def test_reused_until_the_script_changes(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("value = 1\n")
+    cache = CodeCache()
+
+    first = cache.get(str(path))
+    assert cache.get(str(path)) is first
+    assert cache.compiles == 1
+
+    edit(path, "value = 2\n")
+    assert run(cache.get(str(path))) == 2
+    assert cache.compiles == 2
+
+
+def test_watched_script_recompiled_on_poll(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("value = 1\n")
+    cache = CodeCache()
+    cache._watched[os.path.abspath(path)] = None
+    cache._poll(os.path.abspath(path))
+    assert run(cache.get(str(path))) == 1
+
+    edit(path, "value = 2\n")
+    # Watched scripts are not stat'ed on lookup, so the edit shows only after a poll
+    assert run(cache.get(str(path))) == 1
+    cache._poll(os.path.abspath(path))
+    assert run(cache.get(str(path))) == 2
+
+
+def test_syntax_error_leaves_no_stale_code(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("value = 1\n")
+    cache = CodeCache()
+    cache._watched[os.path.abspath(path)] = None
+    cache._poll(os.path.abspath(path))
+
+    edit(path, "value = (\n")
+    cache._poll(os.path.abspath(path))
+    assert os.path.abspath(path) not in cache._entries
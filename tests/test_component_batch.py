@@ -0,0 +1,38 @@
+import threading
+
+from aiflow.flow.events.event_base import ComponentBatcher
+
+
+def test_flushes_when_full():
+    batches = []
+    batcher = ComponentBatcher(batches.append, max_size=3, flush_interval=0)
+    for number in range(7):
+        batcher.add({"id": number})
+    assert [[component["id"] for component in batch] for batch in batches] == [[0, 1, 2], [3, 4, 5]]
+    assert len(batcher) == 1
+
+
+def test_flushes_on_timer():
+    batches = []
+    flushed = threading.Event()
+
+    def send(components):
+        batches.append(components)
+        flushed.set()
+
+    batcher = ComponentBatcher(send, max_size=100, flush_interval=0.01)
+    batcher.add({"id": "a"})
+    batcher.add({"id": "b"})
+    assert flushed.wait(2)
+    assert batches == [[{"id": "a"}, {"id": "b"}]]
+    assert batcher._timer is None
+
+
+def test_failed_send_does_not_keep_components():
+    def send(components):
+        raise ConnectionError("relay gone")
+
+    batcher = ComponentBatcher(send, max_size=2, flush_interval=0)
+    batcher.add({"id": "a"})
+    batcher.add({"id": "b"})
+    assert len(batcher) == 0
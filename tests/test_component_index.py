@@ -0,0 +1,34 @@
+from aiflow.flow.mui.component_index import ComponentIndex
+
+
+def node(node_id, parent_id=None, children=()):
+    return {"id": node_id, "parentId": parent_id, "children": list(children)}
+
+
+def test_relinking_moves_a_node_and_its_nested_copies():
+    index = ComponentIndex()
+    index.add(node("box"))
+    index.add(node("card"))
+    text = node("text", "box")
+    index.add(text)
+    embedded = node("text", "box")
+    index.add(node("box", children=[embedded]))
+
+    assert index.set_parent("text", "card", nested=True)
+    assert index.parent("text") == "card"
+    assert index.children("box") == []
+    assert index.children("card") == ["text"]
+    assert text["parentId"] == embedded["parentId"] == "card"
+
+
+def test_readding_a_node_replaces_its_nested_copies():
+    index = ComponentIndex()
+    for _ in range(3):
+        index.add(node("box", children=[node("text", "box")]))
+    assert len(index._nested["text"]) == 1
+
+    index.add(node("box"))
+    assert index._nested == {}
+    index.add(node("box", children=[node("text", "box")]))
+    index.clear()
+    assert index._nested == {} and index._nested_in == {}
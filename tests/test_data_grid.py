@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aiflow import mui
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+from aiflow.flow.mui.custom_components import grid_filter, grid_index
+from aiflow.flow.mui.custom_components.data_grid import datagrid
+from aiflow.flow.mui.custom_components.grid_filter import filter_positions
+from aiflow.flow.mui.custom_components.grid_index import GridIndex
+
+FRAME = pd.DataFrame({"quantity": np.arange(100), "name": [f"item {i}" for i in range(100)]})
+TYPED = pd.DataFrame({
+    "quantity": [5, 10, 15, 20],
+    "kind": pd.Categorical(["xx", "yy", "xx", "zz"]),
+    "active": [True, False, True, False],
+    "when": pd.to_datetime(["2024-01-01 10:00", "2024-01-02 09:30", "2024-01-02 18:00", "2024-01-03 00:00"]),
+})
+
+
+def matching(filter_model, df=TYPED):
+    positions = filter_positions(df, GridIndex(df), filter_model)
+    return None if positions is None else positions.tolist()
+
+
+def rerun(session, render, event=None, grid_id="grid"):
+    if event is not None:
+        session.events_store["payload"] = dict(event, key=grid_id)
+    session.builder.reset()
+    component = render()
+    session.builder.finish_render()
+    session.batcher.flush()
+    return component
+
+
+def page_ids(client):
+    for payload, _ in reversed(client.sent):
+        inner = payload.get("payload", {})
+        stack = list(inner.get("components") or ())
+        if inner.get("component"):
+            stack.append(inner["component"])
+        while stack:
+            node = stack.pop()
+            if node.get("type") == "DataGrid":
+                props = node["props"]
+                if "columnarRows" in props:
+                    return props["columnarRows"]["ids"]
+                return [row["id"] for row in props["rows"]]
+            stack.extend(node.get("children") or ())
+    return None
+
+
+@pytest.mark.parametrize("nested", [False, True])
+def test_sort_and_page_survive_reruns(session, client, nested):
+    def render():
+        if nested:
+            # As in examples/datagrid.py: the Box is pending while the grid is built as its argument
+            return mui.Box(datagrid(FRAME, grid_id="grid"))
+        return datagrid(FRAME, grid_id="grid")
+
+    rerun(session, render, {"type": "sort-change", "value": [{"field": "quantity", "sort": "desc"}]})
+    rerun(session, render, {"type": "pagination-change", "value": {"page": 2, "pageSize": 5}})
+
+    grid = session.state["__grids"]["grid"]
+    assert grid.sort_dir == "desc"
+    assert grid.page == 2
+    assert page_ids(client) == [89, 88, 87, 86, 85]
+
+
+def test_in_place_edit_with_new_version_refilters_and_resorts(session, client):
+    frame = pd.DataFrame({"x": np.arange(10_000), "status": ["open"] * 10_000})
+    version = 0
+    render = lambda: datagrid(frame, grid_id="grid", version=version)
+    rerun(session, render, {"type": "filter-change", "value": {"items": [{"field": "status", "operator": "equals", "value": "closed"}]}})
+    assert page_ids(client) == []
+
+    frame.loc[5, "status"] = "closed"
+    version += 1
+    rerun(session, render)
+    assert page_ids(client) == [5]
+
+    rerun(session, render, {"type": "filter-change", "value": {"items": []}})
+    rerun(session, render, {"type": "sort-change", "value": [{"field": "x", "sort": "asc"}]})
+    frame.loc[5, "x"] = -1
+    version += 1
+    rerun(session, render)
+    assert page_ids(client)[:3] == [5, 0, 1]
+
+
+def test_frame_hashed_once_per_object(session, client, monkeypatch):
+    hashed = []
+    fingerprint = grid_index.frame_fingerprint
+
+    def counting(df):
+        hashed.append(len(df))
+        return fingerprint(df)
+
+    monkeypatch.setattr(grid_index, "frame_fingerprint", counting)
+    render = lambda: datagrid(FRAME, grid_id="grid")
+    rerun(session, render)
+    for page in range(3):
+        rerun(session, render, {"type": "pagination-change", "value": {"page": page, "pageSize": 5}})
+    rerun(session, render, {"type": "sort-change", "value": [{"field": "quantity", "sort": "desc"}]})
+    assert len(hashed) == 1
+
+    # An equal frame built again is hashed once, and keeps the sort
+    rerun(session, lambda: datagrid(FRAME.copy(), grid_id="grid"))
+    assert len(hashed) == 2
+    assert page_ids(client)[0] == 99
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_rows_prop_follows_config(session, client, monkeypatch, columnar):
+    monkeypatch.setattr(config.render, "grid_columnar_rows", columnar)
+    frame = pd.DataFrame({"price": [1.5, np.nan], "when": pd.to_datetime(["2024-01-02 03:04", None])})
+    grid = rerun(session, lambda: datagrid(frame, grid_id="grid"))
+
+    assert page_ids(client) == [0, 1]
+    if columnar:
+        assert "rows" not in grid.props
+    else:
+        assert "columnarRows" not in grid.props
+        assert grid.props["rows"] == [
+            {"price": 1.5, "when": "2024-01-02T03:04:00", "id": 0},
+            {"price": None, "when": None, "id": 1},
+        ]
+
+
+def test_state_released_when_grid_leaves_tree(session):
+    rerun(session, lambda: mui.Box(datagrid(FRAME, grid_id="a"), datagrid(FRAME, grid_id="b")))
+    assert set(session.state["__grids"]) == {"a", "b"}
+
+    rerun(session, lambda: mui.Box(datagrid(FRAME, grid_id="a")))
+    assert set(session.state["__grids"]) == {"a"}
+
+
+SCRIPT = """
+import numpy as np
+import pandas as pd
+from aiflow.flow.mui.custom_components.data_grid import datagrid
+
+frame = pd.DataFrame({"quantity": np.arange(10)})
+datagrid(frame, grid_id="a")
+if FAIL:
+    raise ValueError("transient")
+datagrid(frame, grid_id="b")
+"""
+
+
+def test_script_error_keeps_later_grids(session, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(config.render, "incremental", True)
+
+    def run_script(fail):
+        path = tmp_path / f"script_{fail}.py"
+        path.write_text(SCRIPT.replace("FAIL", str(fail)))
+        monkeypatch.setattr(event_base, "caller_file", str(path))
+        event_base._rerun(session)
+
+    run_script(False)
+    session.state["__grids"]["b"].page = 1
+    client.sent.clear()
+
+    run_script(True)
+    assert session.state["__grids"]["b"].page == 1
+    assert not [payload for payload, _ in client.sent if payload["type"] == "component_patch"]
+
+
+def test_quick_filter_searches_categorical_columns():
+    assert matching({"quickFilterValues": ["YY"]}) == [1]
+
+
+def test_quick_filter_values_combine_with_logic_operator():
+    assert matching({"quickFilterValues": ["xx", "15"]}) == [2]
+    assert matching({"quickFilterValues": ["yy", "20"], "quickFilterLogicOperator": "or"}) == [1, 3]
+
+
+def test_items_combine_with_logic_operator_and_quick_filter():
+    items = [
+        {"field": "quantity", "operator": ">", "value": 5},
+        {"field": "kind", "operator": "equals", "value": "xx"},
+    ]
+    assert matching({"items": items}) == [2]
+    assert matching({"items": items, "logicOperator": "or"}) == [0, 1, 2, 3]
+    assert matching({"items": items, "logicOperator": "or", "quickFilterValues": ["zz"]}) == [3]
+
+
+@pytest.mark.parametrize("alias, operator", [("=", "equals"), ("is", "equals"), ("not", "doesNotEqual"), ("after", ">")])
+def test_operator_aliases(alias, operator):
+    item = {"field": "quantity", "value": 10}
+    assert matching({"items": [dict(item, operator=alias)]}) == matching({"items": [dict(item, operator=operator)]})
+
+
+def test_values_coerced_to_column_type():
+    assert matching({"items": [{"field": "quantity", "operator": ">=", "value": "15"}]}) == [2, 3]
+    assert matching({"items": [{"field": "active", "operator": "is", "value": "true"}]}) == [0, 2]
+    # A date matches the whole day, a time to the minute
+    assert matching({"items": [{"field": "when", "operator": "is", "value": "2024-01-02"}]}) == [1, 2]
+    assert matching({"items": [{"field": "when", "operator": "onOrAfter", "value": "2024-01-02T18:00"}]}) == [2, 3]
+    # Values that do not parse leave the item out
+    assert matching({"items": [{"field": "quantity", "operator": ">", "value": "many"}]}) is None
+
+
+def test_masks_reused_when_another_item_changes(monkeypatch):
+    evaluated = []
+    item_mask = grid_filter._item_mask
+
+    def counting(df, index, field, operator, value):
+        evaluated.append(field)
+        return item_mask(df, index, field, operator, value)
+
+    monkeypatch.setattr(grid_filter, "_item_mask", counting)
+    index = GridIndex(TYPED)
+    for limit in (5, 10):
+        items = [{"field": "kind", "operator": "equals", "value": "xx"}, {"field": "quantity", "operator": ">", "value": limit}]
+        filter_positions(TYPED, index, {"items": items})
+    assert evaluated == ["kind", "quantity", "quantity"]
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+from aiflow.flow.network import ws_server
+from aiflow.flow.network.deflate import compression_options, websocket_connect
+from test_embedded import free_port
+
+RSV1 = 0x40
+
+SMALL = '{"type":"ping"}'
+# 100 characters, but 200 bytes once encoded, so over the threshold
+WIDE = json.dumps({"text": "é" * 93}, ensure_ascii=False)
+LARGE = json.dumps({"components": [{"type": "Typography", "sx": {"margin": 1}}] * 50})
+
+
+def recording(monkeypatch, stream):
+    frames = []
+    write = stream.write
+
+    def record(data):
+        frames.append(data)
+        return write(data)
+
+    monkeypatch.setattr(stream, "write", record)
+    return frames
+
+
+@pytest.mark.parametrize("direction", ["to browser", "to relay"])
+def test_small_frames_go_out_uncompressed(monkeypatch, direction):
+    monkeypatch.setitem(ws_server.DEFAULT_CONFIG, "compression", {"enabled": True, "level": 6, "threshold": 128})
+
+    async def run():
+        port = free_port()
+        server = ws_server.WebSocketServer()
+        await server.start(port)
+        client = await websocket_connect(f"ws://localhost:{port}/ws", compression_options=compression_options(True, 6, 128))
+        client_id = json.loads(await client.read_message())["client_id"]
+        try:
+            handler = server.manager.clients[client_id]
+            if direction == "to browser":
+                sender, receive = handler, client.read_message
+            else:
+                received = asyncio.Queue()
+                monkeypatch.setattr(handler, "on_message", received.put)
+                sender, receive = client, received.get
+            frames = recording(monkeypatch, sender.ws_connection.stream if sender is handler else sender.protocol.stream)
+            messages = []
+            for message in (SMALL, WIDE, LARGE):
+                await sender.write_message(message)
+                messages.append(await asyncio.wait_for(receive(), 5))
+        finally:
+            client.close()
+            await server.stop()
+        return frames, messages
+
+    frames, messages = asyncio.run(run())
+    assert messages == [SMALL, WIDE, LARGE]
+    # Past these, only the close frame
+    assert [bool(frame[0] & RSV1) for frame in frames[:3]] == [False, True, True]
+    # The large frame went out deflated
+    assert len(frames[2]) < len(LARGE) / 4
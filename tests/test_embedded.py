@@ -0,0 +1,99 @@
+import asyncio
+import json
+import socket
+
+import pytest
+from tornado.websocket import websocket_connect
+
+from aiflow.flow.network import ws_client
+from aiflow.flow.network.embedded import EmbeddedClient, create_server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+async def started():
+    port = free_port()
+    server = create_server()
+    await server.start(port)
+    browser = await websocket_connect(f"ws://localhost:{port}/ws")
+    browser_id = json.loads(await browser.read_message())["client_id"]
+    return server, browser, browser_id
+
+
+def test_messages_routed_both_ways_without_the_relay(monkeypatch):
+    handled = []
+
+    async def handle_message(message):
+        handled.append(message)
+
+    monkeypatch.setattr(ws_client.event_base, "handle_message", handle_message)
+
+    async def run():
+        server, browser, browser_id = await started()
+        client = EmbeddedClient(server, asyncio.get_running_loop())
+        try:
+            # Python to browser: the body arrives without an envelope, addressed to the browser
+            await asyncio.wrap_future(client.send_sync({"type": "component_update", "payload": {"id": "a"}}, browser_id))
+            received = json.loads(await asyncio.wait_for(browser.read_message(), 5))
+
+            # Browser to Python: enveloped frames reach the client's handler in order
+            for number in range(3):
+                await browser.write_message(f"@{client.client_id}\n" + json.dumps({"type": "events", "n": number}))
+            for _ in range(50):
+                if len(handled) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            client_id = client.client_id
+            await client.close()
+            browser.close()
+            await server.stop()
+        return received, browser_id, client_id, server
+
+    received, browser_id, client_id, server = asyncio.run(run())
+    assert received == {"type": "component_update", "payload": {"id": "a"}, "client_id": browser_id}
+    assert [message["n"] for message in handled] == [0, 1, 2]
+    assert client_id not in server.manager.clients
+
+
+def test_sends_fail_once_closed():
+    async def run():
+        server, browser, browser_id = await started()
+        client = EmbeddedClient(server, asyncio.get_running_loop())
+        await client.close()
+        browser.close()
+        await server.stop()
+        return client.send_sync({"type": "component_update"}, browser_id)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run()).result(timeout=1)
+
+
+def test_closed_browser_is_reported_to_python(monkeypatch):
+    handled = []
+
+    async def handle_message(message):
+        handled.append(message)
+
+    monkeypatch.setattr(ws_client.event_base, "handle_message", handle_message)
+
+    async def run():
+        server, browser, browser_id = await started()
+        client = EmbeddedClient(server, asyncio.get_running_loop())
+        try:
+            browser.close()
+            for _ in range(50):
+                if handled:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+            await server.stop()
+        return browser_id
+
+    browser_id = asyncio.run(run())
+    assert handled == [{"type": "client_disconnected", "client_id": browser_id}]
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from aiflow.flow.mui.custom_components.grid_columns import column_defs, schema_key
+
+FRAME = pd.DataFrame({
+    "quantity": [1, 2],
+    "price": [1.5, 2.5],
+    "active": [True, False],
+    "when": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+    "name": ["a", "b"],
+})
+
+
+def by_field(columns):
+    return {column["field"]: column for column in columns}
+
+
+def test_types_from_dtypes():
+    columns = by_field(column_defs(FRAME))
+    assert [column.get("type") for column in columns.values()] == ["number", "number", "number", "boolean", "dateTime", None]
+
+
+def test_overrides_merged_by_field():
+    columns = column_defs(FRAME, {"price": {"width": 200, "type": "string"}, "actions": {"type": "actions"}})
+    fields = [column["field"] for column in columns]
+    assert fields == ["id", "quantity", "price", "active", "when", "name", "actions"]
+    price = by_field(columns)["price"]
+    assert price == {"field": "price", "headerName": "Price", "width": 200, "type": "string"}
+    assert by_field(columns)["actions"] == {"field": "actions", "type": "actions"}
+
+
+def test_overrides_as_a_list_of_col_defs():
+    columns = column_defs(FRAME, [{"field": "name", "headerName": "Item"}, {"headerName": "no field"}])
+    assert by_field(columns)["name"]["headerName"] == "Item"
+    assert len(columns) == len(FRAME.columns) + 1
+
+
+def test_overrides_do_not_leak_into_later_defs():
+    column_defs(FRAME, {"price": {"width": 200}})
+    assert by_field(column_defs(FRAME))["price"]["width"] == 100
+
+
+def test_schema_key_tracks_index_uniqueness():
+    unique = FRAME.set_index(pd.Index([1, 2]))
+    repeated = FRAME.set_index(pd.Index([1, 1]))
+    assert schema_key(unique) != schema_key(repeated)
+    assert by_field(column_defs(unique))["id"].get("type") == "number"
+    assert by_field(column_defs(repeated))["id"].get("type") is None
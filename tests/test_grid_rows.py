@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from aiflow.flow.mui.custom_components.grid_rows import encode_page, page_records
+
+FRAME = pd.DataFrame({
+    "price": [1.5, np.nan, np.inf],
+    "count": [1, 2, 3],
+    "name": ["a", None, "c"],
+    "naive": pd.to_datetime(["2024-01-02 03:04", None, "2024-01-03 00:00"]),
+    "aware": pd.to_datetime(["2024-01-02 03:04", "2024-01-03 00:00", None]).tz_localize("Europe/Paris"),
+})
+
+
+def column(page, field):
+    return page["values"][page["fields"].index(field)]
+
+
+def test_missing_values_are_none():
+    page = encode_page(FRAME, None, 0, 3)
+    assert column(page, "price") == [1.5, None, None]
+    assert column(page, "count") == [1, 2, 3]
+    assert column(page, "name") == ["a", None, "c"]
+    assert column(page, "naive")[1] is None
+    assert column(page, "aware")[2] is None
+
+
+def test_datetimes_as_epoch_milliseconds():
+    page = encode_page(FRAME, None, 0, 3)
+    assert page["dates"] == {"naive": "local", "aware": "utc"}
+    # Naive values keep their wall time; aware ones are the instant in UTC
+    assert column(page, "naive")[0] == pd.Timestamp("2024-01-02 03:04", tz="UTC").value // 1_000_000
+    assert column(page, "aware")[0] == pd.Timestamp("2024-01-02 02:04", tz="UTC").value // 1_000_000
+
+
+def test_page_follows_positions():
+    page = encode_page(FRAME, np.array([2, 0, 1]), 0, 2)
+    assert page["ids"] == [2, 0]
+    assert column(page, "count") == [3, 1]
+
+
+def test_ids_from_index_with_position_fallback():
+    labelled = FRAME.set_index(pd.Index(["x", "y", "z"]))
+    assert encode_page(labelled, np.array([1, 2]), 0, 2)["ids"] == ["y", "z"]
+    stepped = FRAME.set_index(pd.RangeIndex(10, 40, 10))
+    assert encode_page(stepped, None, 1, 3)["ids"] == [20, 30]
+    duplicated = FRAME.set_index(pd.Index([7, 7, 8]))
+    assert encode_page(duplicated, np.array([1, 2]), 0, 2)["ids"] == [1, 2]
+
+
+def test_records_as_the_rows_prop():
+    rows = page_records(encode_page(FRAME, None, 0, 3))
+    assert rows[0] == {
+        "price": 1.5, "count": 1, "name": "a",
+        "naive": "2024-01-02T03:04:00", "aware": "2024-01-02T02:04:00+00:00", "id": 0,
+    }
+    assert rows[1]["price"] is None and rows[1]["naive"] is None
@@ -0,0 +1,55 @@
+import pytest
+
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+
+
+@pytest.fixture
+def rerun(session, client, tmp_path, monkeypatch):
+    """Reruns the session on a script rendering one Typography per text, unbatched"""
+    monkeypatch.setattr(config.websocket, "batch_updates", False)
+    monkeypatch.setattr(config.render, "incremental", True)
+    path = tmp_path / "script.py"
+    monkeypatch.setattr(event_base, "caller_file", str(path))
+
+    def run(*texts):
+        path.write_text("from aiflow import mui\n" + "".join(f"mui.Typography({text!r})\n" for text in texts))
+        start = len(client.sent)
+        event_base._rerun(session)
+        return [payload for payload, _ in client.sent[start:]]
+
+    return run
+
+
+def updated_ids(sent):
+    return [payload["payload"]["component"]["id"] for payload in sent if payload["type"] == "component_update"]
+
+
+def removed_ids(sent):
+    return [component_id for payload in sent if payload["type"] == "component_patch" for component_id in payload["payload"]["remove"]]
+
+
+def test_unchanged_components_are_not_resent(rerun):
+    first = rerun("a", "b")
+    assert len(updated_ids(first)) == 2
+
+    second = rerun("a", "b")
+    assert updated_ids(second) == [] and removed_ids(second) == []
+    # The browser is told not to prune what was not re-sent
+    assert second[-1]["payload"]["incremental"] is True
+
+
+def test_only_changed_components_are_resent(rerun):
+    first = updated_ids(rerun("a", "b"))
+    assert updated_ids(rerun("a", "changed")) == first[1:]
+
+
+def test_removed_components_produce_a_removal_patch(rerun):
+    first = updated_ids(rerun("a", "b", "c"))
+    second = rerun("a")
+    assert updated_ids(second) == []
+    assert sorted(removed_ids(second)) == sorted(first[1:])
+    # The patch goes out ahead of stream_end
+    assert [payload["type"] for payload in second] == ["component_patch", "paired"]
+    # A removed component that comes back is sent again
+    assert updated_ids(rerun("a", "b")) == first[1:2]
@@ -0,0 +1,21 @@
+import pytest
+
+from aiflow.flow.network.ws_server import split_envelope
+
+
+@pytest.mark.parametrize("frame, expected", [
+    ('@browser\n{"type":"update"}', ("browser", '{"type":"update"}')),
+    (b'@browser\n\x93\x01\x02', ("browser", b'\x93\x01\x02')),
+    # An empty target broadcasts
+    ('@\n{}', (None, '{}')),
+    # The body is forwarded untouched, newlines included
+    ('@a\n{"text":"x\\ny"}\n', ("a", '{"text":"x\\ny"}\n')),
+])
+def test_envelope_split_from_body(frame, expected):
+    assert split_envelope(frame) == expected
+
+
+@pytest.mark.parametrize("frame", ['{"type":"update"}', b'\x93\x01', '@' + 'a' * 300 + '\n{}', '@browser'])
+def test_frames_without_an_envelope(frame):
+    # Legacy JSON frames, and targets too long or never terminated
+    assert split_envelope(frame) == (None, None)
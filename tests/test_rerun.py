@@ -0,0 +1,110 @@
+import asyncio
+import concurrent.futures
+import importlib
+
+import pytest
+from conftest import RecordingClient
+
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+from aiflow.flow.events.scheduler import RerunInterrupted
+
+COMPLETE = "from aiflow import mui\nmui.Typography('{}')\n"
+# As if a newer event arrived and the checkpoint after the render raised
+INTERRUPTED = COMPLETE + "from aiflow.flow.events.scheduler import RerunInterrupted\nraise RerunInterrupted()\n"
+
+
+@pytest.fixture
+def run_script(session, tmp_path, monkeypatch):
+    """Reruns the session on a script, with batched and incremental rendering"""
+    monkeypatch.setattr(config.websocket, "batch_updates", True)
+    monkeypatch.setattr(config.render, "incremental", True)
+    # Only an explicit flush sends, so nothing leaves early on its own
+    monkeypatch.setattr(session.batcher, "flush_interval", 60)
+
+    def run(source, name):
+        path = tmp_path / f"{name}.py"
+        path.write_text(source)
+        monkeypatch.setattr(event_base, "caller_file", str(path))
+        event_base._rerun(session)
+
+    return run
+
+
+def sent_texts(client):
+    texts = []
+    for payload, _ in client.sent:
+        for component in payload.get("payload", {}).get("components") or ():
+            if component.get("type") == "Typography":
+                texts.append(component["children"][0]["content"] if component.get("children") else component.get("content"))
+    return texts
+
+
+def test_interrupted_rerun_sends_nothing(session, client, run_script):
+    run_script(COMPLETE.format("first"), "first")
+    with pytest.raises(RerunInterrupted):
+        run_script(INTERRUPTED.format("second"), "interrupted")
+    assert len(session.batcher) == 0
+    assert session.batcher._timer is None
+    assert sent_texts(client) == ["first"]
+
+
+def test_interrupted_rerun_does_not_count_as_rendered(session, client, run_script):
+    run_script(COMPLETE.format("first"), "first")
+    with pytest.raises(RerunInterrupted):
+        run_script(INTERRUPTED.format("second"), "interrupted")
+    # The follow-up rerun renders what the interrupted one discarded
+    run_script(COMPLETE.format("second"), "second")
+    assert sent_texts(client) == ["first", "second"]
+
+
+def test_failed_send_is_logged(monkeypatch):
+    class QueueingClient:
+        """Fails the way the WebSocket client does: on the future, after send_sync returned"""
+
+        def send_sync(self, payload, target, wait=False):
+            future = concurrent.futures.Future()
+            future.set_exception(ValueError("cannot encode"))
+            return future
+
+    errors = []
+    module = importlib.import_module("aiflow.flow.events.event_base")
+    monkeypatch.setattr(event_base, "_ws_client", QueueingClient())
+    monkeypatch.setattr(module.logger, "error", errors.append)
+    event_base.send_response_sync({"type": "paired"}, "browser")
+    assert any("cannot encode" in error for error in errors)
+
+
+def test_dropped_pending_messages_are_logged(monkeypatch):
+    warnings = []
+    module = importlib.import_module("aiflow.flow.events.event_base")
+    monkeypatch.setattr(event_base, "_ws_client", None)
+    monkeypatch.setattr(event_base, "_pending_messages", module.deque(maxlen=2))
+    monkeypatch.setattr(module.logger, "warning", warnings.append)
+    for number in range(5):
+        event_base.send_response_sync({"type": "paired", "number": number}, "browser")
+    assert len(warnings) == 1
+
+    client = RecordingClient()
+    event_base.set_ws_client(client)
+    try:
+        assert [payload["number"] for payload, _ in client.sent] == [3, 4]
+        assert "3 messages were dropped" in warnings[-1]
+    finally:
+        event_base.set_ws_client(None)
+
+
+def test_reading_does_not_wait_for_writes(session, monkeypatch):
+    class StreamingClient(RecordingClient):
+        """Holds every write, as behind a large outbound stream to the same browser"""
+
+        def send_sync(self, payload, target, wait=False):
+            super().send_sync(payload, target)
+            return concurrent.futures.Future()
+
+    client = StreamingClient()
+    monkeypatch.setattr(event_base, "_ws_client", client)
+    monkeypatch.setattr(event_base, "_sessions", {})
+    message = {"type": "events", "sender_id": "browser-a", "client_id": "python", "payload": {"key": "a"}}
+    asyncio.run(asyncio.wait_for(event_base.handle_message(message), 1))
+    assert client.sent[0][0]["payload"]["message"] == "stream_start"
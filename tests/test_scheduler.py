@@ -0,0 +1,57 @@
+import threading
+import time
+
+from aiflow.flow.events.scheduler import RerunScheduler, checkpoint
+
+
+def wait_until_idle(scheduler):
+    for _ in range(500):
+        if not scheduler.running:
+            return
+        time.sleep(0.01)
+    raise AssertionError("scheduler still running")
+
+
+def test_events_during_a_rerun_collapse_into_one_follow_up():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def run(received_at):
+        calls.append(received_at)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+
+    scheduler = RerunScheduler(run)
+    scheduler.request_rerun(1.0)
+    assert started.wait(5)
+    for received_at in (2.0, 3.0, 4.0):
+        scheduler.request_rerun(received_at)
+    release.set()
+    wait_until_idle(scheduler)
+
+    # The follow-up rerun serves the newest event
+    assert calls == [1.0, 4.0]
+    assert (scheduler.runs, scheduler.coalesced) == (2, 2)
+
+
+def test_interrupted_rerun_keeps_side_effects_made_before_its_checkpoint():
+    started = threading.Event()
+    state = {"count": 0}
+
+    def run(received_at):
+        state["count"] += 1
+        if received_at == 1.0:
+            started.set()
+            while True:
+                checkpoint()
+                time.sleep(0.01)
+
+    scheduler = RerunScheduler(run)
+    scheduler.request_rerun(1.0)
+    assert started.wait(5)
+    scheduler.request_rerun(2.0)
+    wait_until_idle(scheduler)
+
+    assert scheduler.interrupted == 1
+    assert state["count"] == 2
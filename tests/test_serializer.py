@@ -0,0 +1,78 @@
+import datetime
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aiflow.flow.network import serializer
+
+
+def available(name):
+    try:
+        return serializer._LOADERS[name]()
+    except ImportError:
+        return None
+
+
+BACKENDS = [backend for backend in map(available, ("orjson", "ujson", "json")) if backend is not None]
+
+
+def browser_parse(text):
+    # The browser reads NaN, which the json backend emits, as null
+    return json.loads(text, parse_constant=lambda constant: None)
+
+
+VALUES = {
+    "nan": float("nan"),
+    "numpy_nan": np.float64("nan"),
+    "count": np.int64(3),
+    "ratio": np.float32(0.5),
+    "flags": np.array([True, False]),
+    "series": pd.Series([1.5, 2.5]),
+    "when": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    "day": datetime.date(2024, 1, 2),
+    "stamp": pd.Timestamp("2024-01-02 03:04:05", tz="UTC"),
+    "numpy_when": np.datetime64("2024-01-02T03:04"),
+    "numpy_dates": np.array(["2024-01-02", "NaT"], dtype="datetime64[ns]"),
+    "numpy_nat": np.datetime64("NaT"),
+    "nat": pd.NaT,
+    "na": pd.NA,
+}
+
+EXPECTED = {
+    "nan": None,
+    "numpy_nan": None,
+    "count": 3,
+    "ratio": 0.5,
+    "flags": [True, False],
+    "series": [1.5, 2.5],
+    "when": "2024-01-02T03:04:05",
+    "day": "2024-01-02",
+    "stamp": "2024-01-02T03:04:05+00:00",
+    "numpy_when": "2024-01-02T03:04:00",
+    "numpy_dates": ["2024-01-02T00:00:00", None],
+    "numpy_nat": None,
+    "nat": None,
+    "na": None,
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.name)
+def test_backends_encode_the_same_values(backend):
+    assert browser_parse(backend.dumps(VALUES)) == EXPECTED
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.name)
+def test_loads_accepts_nan_from_python_peers(backend):
+    assert math.isnan(backend.loads('{"value": NaN}')["value"])
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.name)
+def test_sort_keys(backend):
+    assert backend.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a":2,"b":1}'
+
+
+def test_unknown_serializer_falls_back_to_json():
+    assert serializer._load("simdjson").name == "json"
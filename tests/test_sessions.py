@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from aiflow.flow.cache import render_cache
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+
+SCRIPT = (
+    "from aiflow import mui, events, state\n"
+    "state['runs'] = state.get('runs', 0) + 1\n"
+    "mui.Typography(f\"{events.get('name')} {state['runs']}\")\n"
+)
+
+
+@pytest.fixture
+def sessions(session, monkeypatch):
+    """No browser sessions yet, with the default session already adopted"""
+    monkeypatch.setattr(event_base, "_sessions", {})
+    monkeypatch.setattr(event_base.default_session, "sender_id", "default")
+    return event_base
+
+
+def texts_sent_to(client, target):
+    texts = []
+    for payload, sent_to in client.sent:
+        component = payload.get("payload", {}).get("component") or {}
+        if sent_to == target and component.get("type") == "Typography":
+            texts.append(component["children"][0]["content"] if component.get("children") else component.get("content"))
+    return texts
+
+
+def test_sessions_keep_their_own_state_events_and_builder(sessions, session, client, tmp_path, monkeypatch):
+    path = tmp_path / "counter.py"
+    path.write_text(SCRIPT)
+    monkeypatch.setattr(event_base, "caller_file", str(path))
+    first, second = sessions.get_session("browser-a"), sessions.get_session("browser-b")
+    first.events["name"], second.events["name"] = "a", "b"
+
+    event_base._rerun(first)
+    event_base._rerun(second)
+    event_base._rerun(first)
+
+    assert (first.state, second.state) == ({"runs": 2}, {"runs": 1})
+    assert (first.events, second.events) == ({"name": "a"}, {"name": "b"})
+    assert first.builder is not second.builder
+    assert texts_sent_to(client, "browser-a") == ["a 1", "a 2"]
+    assert texts_sent_to(client, "browser-b") == ["b 1"]
+    # Nothing leaked into the session that serves code outside reruns
+    assert "runs" not in session.state
+
+
+def test_disconnected_browser_releases_its_session(sessions, monkeypatch):
+    forgotten = []
+    monkeypatch.setattr(render_cache, "forget_session", forgotten.append)
+    sessions.get_session("browser-a")
+    sessions.get_session("browser-b")
+
+    asyncio.run(event_base.handle_message({"type": "client_disconnected", "client_id": "browser-a"}))
+
+    assert list(event_base.sessions) == ["browser-b"]
+    assert forgotten == ["browser-a"]
+
+
+def test_idle_sessions_expire(sessions, monkeypatch):
+    monkeypatch.setattr(config.execution, "session_idle_ttl", 60)
+    sessions.get_session("browser-a").last_active = time.monotonic() - 61
+    sessions.get_session("browser-b").last_active = time.monotonic() - 59
+
+    sessions.get_session("browser-c")
+
+    assert set(event_base.sessions) == {"browser-b", "browser-c"}
+
+
+def test_only_the_first_pairing_browser_adopts_the_default_session(session, monkeypatch):
+    processed = []
+    monkeypatch.setattr(event_base, "_sessions", {})
+    monkeypatch.setattr(event_base.default_session, "sender_id", None)
+    monkeypatch.setattr(event_base.default_session, "paired", False)
+    monkeypatch.setattr(event_base, "process_message", lambda session, message, received_at: processed.append(session))
+
+    def receive(message_type, sender_id):
+        message = {"type": message_type, "sender_id": sender_id, "client_id": "python", "payload": {}}
+        asyncio.run(event_base.handle_message(message))
+
+    # Events from a browser that has not paired get a session of their own, and are handled
+    receive("events", "browser-a")
+    assert processed == [event_base.sessions["browser-a"]] and processed[0] is not session
+    # The script renders the adopted session itself, so its pairing does not rerun
+    receive("pair", "browser-b")
+    assert event_base.sessions["browser-b"] is session and len(processed) == 1
+    # A later browser gets its first render from a rerun of its own session
+    receive("pair", "browser-c")
+    assert processed[-1] is event_base.sessions["browser-c"] is not session
@@ -0,0 +1,137 @@
+import gc
+import json
+import os
+import pickle
+import threading
+
+import pytest
+
+from aiflow.flow.cache.data_cache import cache_data
+from aiflow.flow.cache.hashing import fingerprint
+from aiflow.flow.config import config
+from aiflow.flow.network.uploads import ByteBudget, FileUpload, UploadFailed, UploadReceiver
+
+
+@pytest.fixture
+def make_spooled(monkeypatch):
+    """Builds complete uploads that are spooled to disk; the test holds the only reference"""
+    monkeypatch.setattr(config.websocket, "upload_spool_size", 16)
+
+    def make():
+        upload = FileUpload("upload-1", "data.csv", "text/csv", 64)
+        upload.write(0, memoryview(b"x" * 64))
+        return upload
+
+    return make
+
+
+def test_fingerprint_does_not_take_over_spooled_file(make_spooled):
+    spooled = make_spooled()
+    path = spooled.path
+
+    @cache_data
+    def size(upload):
+        return upload.size
+
+    assert size(spooled) == 64
+    fingerprint(spooled)
+    del spooled
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_fingerprint_follows_progress(monkeypatch):
+    monkeypatch.setattr(config.websocket, "upload_spool_size", 1024)
+    upload = FileUpload("upload-2", "data.csv", "text/csv", 8)
+    before = fingerprint(upload)
+    upload.write(0, memoryview(b"abcd"))
+    assert fingerprint(upload) != before
+    assert fingerprint(upload) != fingerprint(FileUpload("upload-3", "data.csv", "text/csv", 8))
+
+
+def test_pickling_keeps_ownership(make_spooled):
+    spooled = make_spooled()
+    path = spooled.path
+    pickle.dumps(spooled)
+    assert spooled._finalizer.alive
+    del spooled
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_hand_over_passes_ownership_to_copy(make_spooled):
+    spooled = make_spooled()
+    path = spooled.path
+    copy = pickle.loads(pickle.dumps(spooled))
+    spooled.hand_over()
+    del spooled
+    gc.collect()
+    assert copy.read() == b"x" * 64
+    del copy
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def upload_frame(header, data=b""):
+    encoded = json.dumps(header).encode()
+    return len(encoded).to_bytes(4, "big") + encoded + data
+
+
+def test_oversized_upload_rejected_before_allocation(monkeypatch):
+    monkeypatch.setattr(config.websocket, "upload_max_size", 1024)
+    receiver = UploadReceiver(ByteBudget())
+    header = {"uploadId": "big", "name": "big.bin", "size": 1 << 40, "offset": 0}
+    with pytest.raises(UploadFailed):
+        receiver.receive(upload_frame(header, b"x"))
+    # Later frames of the upload are dropped quietly, so the rejection is reported once
+    assert receiver.receive(upload_frame(dict(header, offset=1), b"x")) is None
+    assert len(receiver) == 0
+    assert receiver.rejected == 1
+
+    upload, _, started = receiver.receive(upload_frame({"uploadId": "small", "size": 1024}, b"x" * 1024))
+    assert started and upload.complete
+
+
+def test_repeated_chunks_are_not_kept():
+    upload = FileUpload("upload-4", "data.csv", "text/csv", 8)
+    upload.write(4, memoryview(b"efgh"))
+    upload.write(4, memoryview(b"efgh"))
+    upload.write(6, memoryview(b"gh"))
+    upload.write(0, memoryview(b"abcd"))
+    upload.write(0, memoryview(b"abcd"))
+    upload.write(2, memoryview(b"cd"))
+    assert upload.complete
+    assert upload._pending == {}
+    assert upload.read() == b"abcdefgh"
+
+
+def test_chunks_are_read_before_the_upload_completes():
+    receiver = UploadReceiver(ByteBudget())
+    header = {"uploadId": "streamed", "size": 8}
+    upload, _, _ = receiver.receive(upload_frame(dict(header, offset=0), b"abcd"))
+    chunks, first_read = [], threading.Event()
+
+    def consume():
+        for chunk in upload.iter_chunks(chunk_size=4):
+            chunks.append(chunk)
+            first_read.set()
+
+    reader = threading.Thread(target=consume)
+    reader.start()
+    # The first chunk is consumed while the last frame is still to come
+    assert first_read.wait(5)
+    assert chunks == [b"abcd"] and not upload.complete
+    receiver.receive(upload_frame(dict(header, offset=4), b"efgh"))
+    reader.join(5)
+    assert chunks == [b"abcd", b"efgh"]
+    assert upload.open().read() == b"abcdefgh"
+
+
+def test_frames_after_completion_are_dropped():
+    receiver = UploadReceiver(ByteBudget())
+    header = {"uploadId": "done", "size": 4, "offset": 0}
+    upload, _, started = receiver.receive(upload_frame(header, b"abcd"))
+    assert started and upload.complete
+    # A repeated frame neither starts the upload again nor fires its event a second time
+    assert receiver.receive(upload_frame(header, b"abcd")) is None
+    assert len(receiver) == 0 and receiver.completed == 1
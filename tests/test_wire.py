@@ -0,0 +1,59 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aiflow.flow.network import serializer, wire
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def component(props):
+    return {"type": "Typography", "id": "Typography_1", "module": "muiElements", "props": props, "parentId": None}
+
+
+PROPS = {
+    "count": np.int64(3),
+    "ratio": np.float32(0.5),
+    "flags": np.array([True, False]),
+    "when": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    "day": datetime.date(2024, 1, 2),
+    "stamp": pd.Timestamp("2024-01-02 03:04:05", tz="UTC"),
+    "missing": pd.NaT,
+}
+
+
+def test_compact_round_trip():
+    encoded = wire.encode_components([component({"label": "a", "size": 2})])
+    assert wire.decode_components(encoded) == [component({"label": "a", "size": 2})]
+
+
+def test_nested_parent_ids_round_trip():
+    def child(number, parent_id):
+        return {"type": "Typography", "id": f"Typography_{number}", "module": "muiElements", "parentId": parent_id}
+
+    container = {
+        "type": "Box", "id": "Box_1", "module": "muiElements", "parentId": None,
+        # A child of the container, one moved under another component, and one without a parent
+        "children": [child(2, "Box_1"), child(3, "Stack_9"), child(4, None)],
+    }
+    encoded = wire.encode_components([container])
+    assert wire.decode_components(encoded) == [container]
+    # Only the parent that differs from the container is spelled out
+    children = encoded["nodes"][0][wire.CHILDREN]
+    assert [node[wire.PARENT] if len(node) > wire.PARENT else None for node in children] == [
+        None, [encoded["strings"].index("Stack_9")], []]
+
+
+def test_msgpack_packs_what_json_accepts():
+    payload = wire.encode_components([component(PROPS)])
+    unpacked = msgpack.unpackb(wire.pack(payload), raw=False)
+    as_json = serializer.loads(serializer.dumps(payload))
+    assert unpacked["v"] == wire.PROTOCOL_VERSION
+    decoded = wire.decode_components(unpacked)[0]["props"]
+    assert decoded == wire.decode_components(as_json)[0]["props"]
+    assert decoded["count"] == 3
+    assert decoded["flags"] == [True, False]
+    assert decoded["missing"] is None
+    assert decoded["when"] == "2024-01-02T03:04:05"
@@ -0,0 +1,97 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from aiflow.flow.config import config
+from aiflow.flow.events import event_base
+from aiflow.flow.events import worker_pool
+from aiflow.flow.events.worker_pool import WorkerPool, _Worker
+
+
+class RunningProcess:
+    def poll(self):
+        return None
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def make_pool(size):
+    pool = WorkerPool("script.py", size, relay=None)
+    pool._workers = [_Worker(index, RunningProcess(), RecordingConnection()) for index in range(size)]
+    pool._ready.set()
+    return pool
+
+
+def test_evicted_sessions_leave_their_worker(monkeypatch):
+    pool = make_pool(2)
+    monkeypatch.setattr(event_base, "_worker_pool", pool)
+    monkeypatch.setattr(event_base, "_sessions", {})
+    monkeypatch.setattr(event_base.default_session, "sender_id", "default")
+    monkeypatch.setattr(config.execution, "max_sessions", 2)
+
+    for number in range(10):
+        sender_id = f"browser-{number}"
+        event_base.get_session(sender_id)
+        assert pool.dispatch({"sender_id": sender_id, "payload": {}})
+
+    assert set(pool._assigned) == set(event_base._sessions)
+    assert sum(worker.sessions for worker in pool._workers) == 2
+
+
+def test_moved_session_counts_once(monkeypatch):
+    pool = make_pool(2)
+    assert pool.dispatch({"sender_id": "browser", "payload": {}})
+    first = pool._assigned["browser"]
+    first.conn = None
+    assert pool.dispatch({"sender_id": "browser", "payload": {}})
+    assert first.sessions == 0
+    assert pool._assigned["browser"].sessions == 1
+
+
+@pytest.mark.parametrize("code", ["raise SystemExit(3)", "import time; time.sleep(60)"])
+def test_worker_that_never_connects_is_skipped(monkeypatch, code):
+    popen = subprocess.Popen
+    monkeypatch.setattr(worker_pool.subprocess, "Popen", lambda args, env: popen([sys.executable, "-c", code]))
+    monkeypatch.setattr(config.execution, "worker_start_timeout", 0.5)
+    pool = WorkerPool("script.py", 2, relay=None)
+    pool.start()
+    try:
+        assert pool.wait_until_ready(10)
+        assert pool._workers == []
+    finally:
+        pool.stop()
+
+
+def test_worker_connects_and_relays(monkeypatch):
+    code = (
+        "import os, sys\n"
+        "from multiprocessing.connection import Client\n"
+        "conn = Client((sys.argv[1], int(sys.argv[2])), authkey=bytes.fromhex(os.environ['AIFLOW_WORKER_AUTHKEY']))\n"
+        "conn.send(({'type': 'component_update'}, 'browser'))\n"
+        "try: conn.recv()\n"
+        "except EOFError: pass\n"
+    )
+    popen = subprocess.Popen
+    # args are [python, -m, module, host, port, script]
+    monkeypatch.setattr(worker_pool.subprocess, "Popen", lambda args, env: popen([sys.executable, "-c", code, *args[3:5]], env=env))
+    relayed = []
+    pool = WorkerPool("script.py", 1, relay=lambda payload, target: relayed.append((payload, target)))
+    pool.start()
+    try:
+        assert pool.wait_until_ready(10)
+        assert len(pool._workers) == 1
+        for _ in range(100):
+            if relayed:
+                break
+            time.sleep(0.01)
+    finally:
+        pool.stop()
+    assert relayed == [({"type": "component_update"}, "browser")]
@@ -0,0 +1,195 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+
+import pytest
+from tornado.websocket import WebSocketClosedError
+
+from aiflow.flow.config import config
+from aiflow.flow.network import ws_client
+from aiflow.flow.network.ws_client import ChunkTracker, WebSocketClient
+
+
+def drain(items):
+    """Frames the outbound queue writes for (payload, target) items, as (target, body)"""
+    client = object.__new__(WebSocketClient)
+    client._running = True
+    written = []
+
+    async def write(target, body):
+        written.append((target, body))
+        # Let other work in, as a real write does
+        await asyncio.sleep(0)
+
+    client._write = write
+
+    async def run():
+        client._outbound = asyncio.Queue()
+        futures = []
+        for payload, target in items:
+            future = concurrent.futures.Future()
+            futures.append(future)
+            client._outbound.put_nowait((WebSocketClient._encode(payload, target), target, future))
+        task = asyncio.create_task(client._drain_outbound())
+        await asyncio.wait_for(asyncio.gather(*(asyncio.wrap_future(future) for future in futures)), 5)
+        task.cancel()
+
+    asyncio.run(run())
+    return written
+
+
+def test_small_message_waits_for_its_targets_stream(monkeypatch):
+    monkeypatch.setattr(config.websocket, "chunk_outbound", True)
+    monkeypatch.setattr(config.websocket, "chunk_size", 256)
+    large = {"type": "component_update", "payload": {"component": {"id": "grid", "rows": "x" * 1000}}}
+    end = {"type": "paired", "payload": {"message": "stream_end"}}
+    other = {"type": "component_update", "payload": {"component": {"id": "text"}}}
+
+    written = drain([(large, "a"), (end, "a"), (other, "b")])
+
+    to_a = [body for target, body in written if target == "a"]
+    assert '"chunked_message"' in to_a[0]
+    assert all('"chunked_message"' in body for body in to_a[:-1])
+    assert '"stream_end"' in to_a[-1]
+    # Other browsers do not wait for the stream
+    position_b = next(number for number, (target, _) in enumerate(written) if target == "b")
+    assert position_b < len(written) - 1
+
+
+def bare_client():
+    client = object.__new__(WebSocketClient)
+    client._running = True
+    client._connected = asyncio.Event()
+    client._ready = asyncio.Event()
+    client._connect_lock = asyncio.Lock()
+    client.client = None
+    client.client_id = None
+    return client
+
+
+class FakeConnection:
+    """A relay connection that hands out a client id and then stays silent"""
+
+    def __init__(self, number):
+        self.number = number
+        self.close_code = None
+        self._handshake = True
+
+    async def read_message(self):
+        if self._handshake:
+            self._handshake = False
+            return '{"client_id": "python"}'
+        await asyncio.Event().wait()
+
+    def close(self):
+        self.close_code = 1000
+
+
+def test_closed_connection_reconnects_and_keeps_running(monkeypatch):
+    connections = []
+
+    async def websocket_connect(url, **options):
+        connections.append(FakeConnection(len(connections)))
+        return connections[-1]
+
+    monkeypatch.setattr(ws_client, "websocket_connect", websocket_connect)
+
+    async def run():
+        client = bare_client()
+        frames = []
+
+        def write_frame(message):
+            if client.client.number == 0:
+                raise WebSocketClosedError()
+            frames.append(message)
+            return asyncio.sleep(0)
+
+        client._write_frame = write_frame
+        await client._write("browser", "{}")
+        return client, frames
+
+    client, frames = asyncio.run(run())
+    assert frames == ["@browser\n{}"]
+    assert len(connections) == 2 and connections[0].close_code is not None
+    assert client._running and client._connected.is_set()
+
+
+def test_queued_messages_fail_when_the_loop_stops():
+    client = bare_client()
+    client._send_lock = threading.Lock()
+    client._accepting = True
+    loop = asyncio.new_event_loop()
+    client._loop = loop
+    client._outbound = asyncio.Queue()
+    client._drain_task = loop.create_task(asyncio.sleep(0))
+    future = client.send_sync({"type": "update"}, "browser")
+    loop.run_until_complete(client._fail_pending())
+    loop.close()
+
+    with pytest.raises(ConnectionError):
+        future.result(timeout=1)
+    with pytest.raises(ConnectionError):
+        client.send_sync({"type": "update"}, "browser").result(timeout=1)
+
+
+def test_payload_encoded_when_queued():
+    client = bare_client()
+    client._send_lock = threading.Lock()
+    client._accepting = True
+    loop = asyncio.new_event_loop()
+    client._loop = loop
+    client._outbound = asyncio.Queue()
+    component = {"id": "Box_1", "parentId": None, "children": []}
+    client.send_sync({"type": "component_update", "payload": {"component": component}}, "browser")
+    # The builder goes on relinking the dict it sent
+    component["parentId"] = "Card_2"
+    component["children"].append({"id": "Typography_3"})
+    loop.run_until_complete(asyncio.sleep(0))
+    body, target, _ = client._outbound.get_nowait()
+    loop.close()
+    assert target == "browser"
+    assert json.loads(body)["payload"]["component"] == {"id": "Box_1", "parentId": None, "children": []}
+
+
+def test_waiting_send_on_the_client_loop_raises():
+    async def send():
+        client = bare_client()
+        client._send_lock = threading.Lock()
+        client._accepting = True
+        client._loop = asyncio.get_running_loop()
+        client._outbound = asyncio.Queue()
+        client.send_sync({"type": "update"}, "browser", wait=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(send())
+
+
+def file_chunk(data):
+    return {"type": "events", "payload": {"type": "file-change", "key": "upload", "fileEvent": {"name": "a.txt", "data": data}}}
+
+
+def test_chunks_other_than_uploads_are_rejected():
+    tracker = ChunkTracker()
+    assert not tracker.add_chunk("message", 0, 2, {"type": "events", "payload": {"type": "click", "value": "x" * 1000}}, "browser")
+    assert tracker.chunks == {}
+    assert tracker.budget.in_flight == 0
+    assert tracker.rejected == 1
+
+
+def test_chunk_indexes_must_be_integers():
+    tracker = ChunkTracker()
+    assert not tracker.add_chunk("message", "0", 2, file_chunk("abcd"), "browser")
+    assert not tracker.add_chunk("message", 0, "2", file_chunk("abcd"), "browser")
+    assert tracker.chunks == {}
+
+
+def test_upload_chunks_are_charged_and_reassembled():
+    tracker = ChunkTracker()
+    assert not tracker.add_chunk("message", 1, 2, file_chunk("efgh"), "browser")
+    assert tracker.budget.in_flight == 4
+    assert tracker.add_chunk("message", 0, 2, file_chunk("abcd"), "browser")
+    message, sender_id = tracker.get_complete_message("message")
+    assert message["payload"]["fileEvent"]["data"] == "abcdefgh"
+    assert sender_id == "browser"
+    assert tracker.budget.in_flight == 0